@@ -1,18 +1,57 @@
 """This  command-line reads in all FDO outputs into a single dataframe and does light processing
 > python3 [path/to/this/file] --config [path/to/compile.yml]
+To read and process the csvs with several processes at once, add --jobs [N]
 """
 
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Tuple, Union
 
 import click
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 
 from utils.io import yaml_to_dict
 from utils.strings import similar_strings, similarity_score
 
 logging.basicConfig(level=logging.INFO)
 
+# every column of an FDO output csv is read as text (EINs keep their leading zeros), except the
+# results page number
+GRANT_TYPES = {
+    "Grantmaker": pa.string(),
+    "Recipient": pa.string(),
+    "Recipient City": pa.string(),
+    "Recipient State": pa.string(),
+    "Recipient Country": pa.string(),
+    "Primary Subject": pa.string(),
+    "Year": pa.string(),
+    "Grant Amount": pa.string(),
+    "ein": pa.string(),
+    "search_result_page": pa.int64(),
+}
+
+OUTPUT_COLUMNS = [
+    "grantmaker",
+    "recipient_original",
+    "recipient",
+    # "carnegie",
+    # "similarity",
+    "recipient_city",
+    "recipient_state",
+    "recipient_country",
+    "primary_subject",
+    "year",
+    "grant_amount",
+    "ein",
+    "search_result_page",
+]
+
+# settings of this worker process (see start_worker)
+_WORKER = {"config_info": None, "grantmaker_terms": None}
+
 
 def replace_terms(s, term_dict):
     """replaces a list of terms in string s according to term dictionary"""
@@ -22,6 +61,101 @@ def replace_terms(s, term_dict):
     return s
 
 
+def grantmaker_terms(ein_df: pd.DataFrame) -> Dict[str, Tuple[str, str]]:
+    """Search term and alternative name of each EIN's grantmaker (the first listed for the EIN)"""
+    first = ein_df.drop_duplicates(subset="ein")
+    return {
+        ein: (search_term, alternative_name)
+        for ein, search_term, alternative_name in zip(
+            first["ein"], first["search_term"], first["alternative_name"]
+        )
+    }
+
+
+def start_worker(config_info: dict, terms: Dict[str, Tuple[str, str]]):
+    """Hand a worker process the settings every file needs, once"""
+    _WORKER.update(config_info=config_info, grantmaker_terms=terms)
+
+
+def read_grant_csv(csv: str, engine: str = "pyarrow") -> pd.DataFrame:
+    """Read an FDO output csv with the column types in GRANT_TYPES
+    Args:
+        csv: path to the csv
+        engine: 'pyarrow' to parse with pyarrow's csv reader, or a pd.read_csv engine ('c')
+    Returns:
+        dataframe of the csv; text columns hold str (missing if empty), search_result_page is Int64
+    """
+    if engine != "pyarrow":
+        return pd.read_csv(
+            csv,
+            dtype={
+                column: "Int64" if pa.types.is_integer(arrow_type) else str
+                for column, arrow_type in GRANT_TYPES.items()
+            },
+            engine=engine,
+        )
+    # pd.read_csv(engine="pyarrow") only applies dtypes after pyarrow has inferred its own (which
+    # drops EINs' leading zeros), so the types go to pyarrow's reader directly
+    table = pa_csv.read_csv(
+        csv,
+        convert_options=pa_csv.ConvertOptions(
+            column_types=GRANT_TYPES, strings_can_be_null=True
+        ),
+    )
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def read_grant_file(csv: str) -> Union[pd.DataFrame, None]:
+    """Read one FDO output csv and keep only the grants made by its EIN's grantmaker
+    Args:
+        csv: path to the csv (columns GRANT_TYPES)
+    Returns:
+        dataframe with OUTPUT_COLUMNS, or None if the file can't be attributed to a grantmaker
+    """
+    config_info = _WORKER["config_info"]
+    logging.info(f" --- reading file {csv}")
+    df = read_grant_csv(csv, config_info.get("csv_engine", "pyarrow"))
+    df.columns = [x.lower().replace(" ", "_") for x in df.columns.values]
+
+    # the FDO search hack (in fd_search.py) doesn't separate out whether an EIN is
+    # the grantmaker or the grant recipient. So we have to go through and adjust
+    # the raw grant search data to only select records in which the EIN is the
+    # grantmaker.
+    if len(df) == 0:
+        return None
+    this_ein = df.ein.iloc[0]
+    if this_ein not in _WORKER["grantmaker_terms"]:
+        logging.info(f"could not find search term data for {this_ein}; skipping {csv}")
+        return None
+    grantmaker_search_term, alternative_name = _WORKER["grantmaker_terms"][this_ein]
+    grantmakers = df.grantmaker.str.lower()
+    df = df.loc[
+        grantmakers.str.contains(grantmaker_search_term.lower(), regex=False, na=False)
+        | grantmakers.str.contains(alternative_name.lower(), regex=False, na=False)
+    ]
+
+    # save original value
+    df = df.assign(recipient_original=df["recipient"])
+
+    df["recipient"] = [
+        replace_terms(s, config_info["replacements"]).strip() for s in df.recipient
+    ]
+
+    df["recipient_state"] = df["recipient_state"].fillna(
+        config_info["missing_state_string"]
+    )
+
+    # df["carnegie"] = [
+    #    similar_strings(recipient, state_college_dict[state], 1)[0]
+    #    for recipient, state in zip(df.recipient, df.recipient_state)
+    # ]
+    # df["similarity"] = [
+    #    similarity_score(r.lower(), c.lower())
+    #    for r, c in zip(df.recipient, df.carnegie)
+    # ]
+    return df[OUTPUT_COLUMNS]
+
+
 # Function below is what is executed at the command line
 @click.command()
 @click.option(
@@ -29,86 +163,38 @@ def replace_terms(s, term_dict):
     type=click.Path(exists=True, file_okay=True, dir_okay=False),
     required=True,
 )
-def compile(config: str):
+@click.option("--jobs", type=click.IntRange(min=1), required=False, default=1)
+def compile(config: str, jobs: int):
     # Read in carnegie data; transform to dict with states as keys and university list as values
 
     config_info = yaml_to_dict(config)
 
-    csv_paths = [str(file) for file in Path(config_info["data_dir"]).glob("*.csv")]
+    # sorted, so the output is in the same order however many jobs read the files
+    csv_paths = sorted(
+        str(file) for file in Path(config_info["data_dir"]).glob("*.csv")
+    )
 
     # get ein list and associated names to separate out grants where organization is recipient
     ein_df = pd.read_csv(config_info["ein_data_file"], dtype={"ein": str})
-
-    df_list = []
-
-    for csv in csv_paths:
-        logging.info(f" --- reading file {csv}")
-        df = pd.read_csv(csv, dtype={"ein": str})
-        df.columns = [x.lower().replace(" ", "_") for x in df.columns.values]
-
-        # the FDO search hack (in fd_search.py) doesn't separate out whether an EIN is
-        # the grantmaker or the grant recipient. So we have to go through and adjust
-        # the raw grant search data to only select records in which the EIN is the
-        # grantmaker.
-        this_ein = list(df.ein.unique())[0]
-        try:
-            grantmaker_search_term = list(
-                ein_df.loc[ein_df["ein"] == this_ein].search_term.unique()
-            )[0]
-            alternative_name = list(
-                ein_df.loc[ein_df["ein"] == this_ein].alternative_name.unique()
-            )[0]
-        except:
-            logging.info(f"could not earh term find data for {this_ein}")
-        print(grantmaker_search_term)
-        print(alternative_name)
-        df = df.loc[
-            [
-                (grantmaker_search_term.lower() in g.lower())
-                | (alternative_name.lower() in g.lower())
-                for g in df.grantmaker
-            ]
-        ]
-
-        # save original value
-        df["recipient_original"] = df["recipient"].copy()
-
-        df.recipient = [
-            replace_terms(s, config_info["replacements"]).strip() for s in df.recipient
-        ]
-
-        df["recipient_state"] = df["recipient_state"].fillna(
-            config_info["missing_state_string"]
-        )
-
-        # df["carnegie"] = [
-        #    similar_strings(recipient, state_college_dict[state], 1)[0]
-        #    for recipient, state in zip(df.recipient, df.recipient_state)
-        # ]
-        # df["similarity"] = [
-        #    similarity_score(r.lower(), c.lower())
-        #    for r, c in zip(df.recipient, df.carnegie)
-        # ]
-        df = df[
-            [
-                "grantmaker",
-                "recipient_original",
-                "recipient",
-                # "carnegie",
-                # "similarity",
-                "recipient_city",
-                "recipient_state",
-                "recipient_country",
-                "primary_subject",
-                "year",
-                "grant_amount",
-                "ein",
-                "search_result_page",
-            ]
-        ]
-        df_list.append(df.copy())
-
-    all_df = pd.concat(df_list)
+    terms = grantmaker_terms(ein_df)
+
+    if jobs == 1:
+        start_worker(config_info, terms)
+        df_list = [read_grant_file(csv) for csv in csv_paths]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=start_worker, initargs=(config_info, terms)
+        ) as executor:
+            # map hands back results in csv_paths order
+            df_list = list(
+                executor.map(
+                    read_grant_file,
+                    csv_paths,
+                    chunksize=max(1, len(csv_paths) // (4 * jobs)),
+                )
+            )
+
+    all_df = pd.concat([df for df in df_list if df is not None])
 
     output_file = config_info["output_file"]
     all_df.to_csv(output_file, index=False)
@@ -0,0 +1,144 @@
+"""Batching of small grantmakers into combined Foundation Directory searches
+Most EINs in a long list return only a page or two of grants, yet each costs a full search round
+trip. With batch_size set in fd_config.yml (batching is off by default), EINs whose results fit on
+one page (by the fd_count_pages.py manifest, which records the grantmaker names on that page) are
+searched several at a time, with their EINs joined into one ein parameter (batch_ein_separator,
+',' by default). The combined results are split back into per-EIN csvs by the Grantmaker column.
+A batch whose results can't all be attributed, or don't match the manifest, is scraped one EIN at
+a time instead (see fd_scrape_utils.scrape_batch).
+"""
+
+import re
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from projects.foundation.fd_parse_utils import RESULTS_PER_PAGE
+from projects.foundation.fd_schedule_utils import EinItem
+
+
+def grantmaker_key(name: str) -> str:
+    """Grantmaker name as compared when splitting batches (case, spacing and punctuation ignored)"""
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def batch_ein_param(eins: List[str], config_info: dict) -> str:
+    """Value of the ein search parameter that searches several EINs at once"""
+    return config_info.get("batch_ein_separator", ",").join(str(ein) for ein in eins)
+
+
+def batch_items(
+    items: List[EinItem],
+    page_counts: Dict[str, int],
+    grantmakers: Dict[str, List[str]],
+    config_info: dict,
+) -> List[Union[EinItem, List[EinItem]]]:
+    """Group small EINs into batches that are searched together
+    An EIN can be batched if the manifest has its page count, its results fit on one page (the
+    manifest's grantmaker names come from the first page, so they are complete), and (if it has
+    grants) no other batchable EIN shares its grantmaker names, so its rows can be told apart from
+    the rest of the batch's.
+    Args:
+        items: (ein number, ein, company name) of each EIN, in scraping order
+        page_counts: ein -> number of results pages (see fd_schedule_utils.read_manifest)
+        grantmakers: ein -> grantmaker names in its results (see fd_schedule_utils.read_grantmakers)
+        config_info: configuration settings read in from fd_config.yml; batch_size is the most EINs
+            per search (batching is off unless it is more than 1)
+    Returns:
+        items in scraping order, with batched EINs replaced by lists of items (each batch takes
+        the place of its first EIN)
+    """
+    batch_size = config_info.get("batch_size", 1)
+    if batch_size < 2:
+        return list(items)
+    page_limit = config_info.get("page_limit", 100)
+
+    small = [
+        item
+        for item in items
+        if str(item[1]) in page_counts and page_counts[str(item[1])] <= 1
+    ]
+
+    # a grantmaker name found under two EINs can't say which of them a row belongs to
+    owners = {}
+    for item in small:
+        for name in set(grantmaker_key(n) for n in grantmakers.get(str(item[1]), [])):
+            owners.setdefault(name, []).append(item[1])
+    batchable = set()
+    for item in small:
+        names = set(grantmaker_key(n) for n in grantmakers.get(str(item[1]), []))
+        if page_counts[str(item[1])] == 0 or (
+            len(names) > 0 and all(len(owners[name]) == 1 for name in names)
+        ):
+            batchable.add(item[1])
+
+    # fill each batch in scraping order, keeping its combined results within FD's page limit
+    batches = []
+    for item in items:
+        if item[1] not in batchable:
+            continue
+        pages = page_counts[str(item[1])]
+        if (
+            len(batches) == 0
+            or len(batches[-1]) == batch_size
+            or sum(page_counts[str(b[1])] for b in batches[-1]) + pages > page_limit
+        ):
+            batches.append([])
+        batches[-1].append(item)
+
+    first_of_batch = {batch[0][1]: batch for batch in batches if len(batch) > 1}
+    batched = set(item[1] for batch in first_of_batch.values() for item in batch)
+    return [
+        first_of_batch.get(item[1], item)
+        for item in items
+        if item[1] not in batched or item[1] in first_of_batch
+    ]
+
+
+def split_batch(
+    batch_df: pd.DataFrame,
+    batch: List[EinItem],
+    grantmakers: Dict[str, List[str]],
+) -> Dict[str, pd.DataFrame]:
+    """Split the combined results of a batch search into each EIN's results
+    Args:
+        batch_df: results of the batch search (RESULT_COLUMNS), in the order FD listed them
+        batch: (ein number, ein, company name) of each EIN in the batch
+        grantmakers: ein -> grantmaker names in its results (see fd_schedule_utils.read_grantmakers)
+    Returns:
+        ein -> its rows, with ein and search_result_page set as a search for that EIN alone would
+    Raises:
+        ValueError: if rows can't be attributed to the batch's EINs, or an EIN with grantmaker names
+            (so with grants) doesn't get between one row and a page of rows, e.g. because FD
+            didn't search for every EIN in the ein parameter
+    """
+    owner = {
+        grantmaker_key(name): item[1]
+        for item in batch
+        for name in grantmakers.get(str(item[1]), [])
+    }
+    row_eins = [owner.get(grantmaker_key(name)) for name in batch_df["Grantmaker"]]
+    unknown = sorted(
+        set(name for name, ein in zip(batch_df["Grantmaker"], row_eins) if ein is None)
+    )
+    if len(unknown) > 0:
+        raise ValueError(
+            f"Grantmakers {unknown} in the batch's results aren't in the manifest for its EINs"
+        )
+
+    split = {}
+    for item in batch:
+        ein_df = batch_df[[ein == item[1] for ein in row_eins]].reset_index(drop=True)
+        if len(grantmakers.get(str(item[1]), [])) > 0 and not (
+            0 < len(ein_df) <= RESULTS_PER_PAGE
+        ):
+            raise ValueError(
+                f"EIN {item[1]} has {len(ein_df)} rows in the batch's results; the manifest"
+                " lists one page of them"
+            )
+        ein_df["ein"] = item[1]
+        ein_df["search_result_page"] = [
+            n // RESULTS_PER_PAGE + 1 for n in range(len(ein_df))
+        ]
+        split[str(item[1])] = ein_df
+    return split
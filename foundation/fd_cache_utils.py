@@ -0,0 +1,137 @@
+"""On-disk, content-addressed cache of the raw html of Foundation Directory results pages
+Lets fd_reparse.py rebuild per-EIN grant csvs without a browser. Layout of a cache directory:
+ * objects/[first 2 hex digits]/[sha256 of html].html.gz -- gzipped page html, stored once per unique page
+ * refs/[query key]/[ein]/[page].ref -- sha256 of the html last fetched for (query, ein, page)
+ * refs/[query key]/[ein]/searches.json -- the searches an EIN's results came from: its own, the
+   slices of its partitioned search, or the search of a batch of EINs it was searched with
+The query key is a short hash of the config's page_url, so caches of different searches never mix.
+"""
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Union
+
+from utils.io import write_atomically
+
+
+def query_key(page_url: str) -> str:
+    """Short, filename-safe key identifying a search query (page_url without ein and page)"""
+    return hashlib.sha256(page_url.encode("utf-8")).hexdigest()[:16]
+
+
+def _ref_path(cache_dir: Union[str, Path], page_url: str, ein: int, page: int) -> Path:
+    """Location of the reference file for one (query, ein, page)"""
+    return Path(cache_dir) / "refs" / query_key(page_url) / str(ein) / f"{page}.ref"
+
+
+def _object_path(cache_dir: Union[str, Path], digest: str) -> Path:
+    """Location of the compressed html with the given sha256 digest"""
+    return Path(cache_dir) / "objects" / digest[:2] / f"{digest}.html.gz"
+
+
+def cache_page(
+    cache_dir: Union[str, Path], page_url: str, ein: int, page: int, html: str
+) -> str:
+    """Store the html of one results page in the cache
+    Args:
+        cache_dir: directory holding the page cache
+        page_url: search query (config page_url) that the page belongs to
+        ein: EIN of the foundation the page was fetched for
+        page: page number of the results table
+        html: page source
+    Returns:
+        digest: sha256 of the html, under which it is stored
+    """
+    data = html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+
+    # identical pages are only stored once
+    object_path = _object_path(cache_dir, digest)
+    if not object_path.exists():
+        write_atomically(object_path, gzip.compress(data))
+
+    write_atomically(_ref_path(cache_dir, page_url, ein, page), digest.encode("utf-8"))
+    return digest
+
+
+def read_cached_page(
+    cache_dir: Union[str, Path], page_url: str, ein: int, page: int
+) -> Union[str, None]:
+    """Get the cached html of one results page
+    Args:
+        cache_dir: directory holding the page cache
+        page_url: search query (config page_url) that the page belongs to
+        ein: EIN of the foundation the page was fetched for
+        page: page number of the results table
+    Returns:
+        html of the page, or None if it isn't in the cache
+    """
+    ref_path = _ref_path(cache_dir, page_url, ein, page)
+    if not ref_path.exists():
+        return None
+    digest = ref_path.read_text(encoding="utf-8").strip()
+    object_path = _object_path(cache_dir, digest)
+    if not object_path.exists():
+        return None
+    return gzip.decompress(object_path.read_bytes()).decode("utf-8")
+
+
+def cached_pages(cache_dir: Union[str, Path], page_url: str) -> Dict[str, List[int]]:
+    """List the pages in the cache for every EIN searched with a query
+    Args:
+        cache_dir: directory holding the page cache
+        page_url: search query (config page_url)
+    Returns:
+        dictionary of ein -> sorted list of cached page numbers
+    """
+    query_dir = Path(cache_dir) / "refs" / query_key(page_url)
+    if not query_dir.exists():
+        return {}
+    return {
+        ein_dir.name: sorted(int(ref.stem) for ref in ein_dir.glob("*.ref"))
+        for ein_dir in query_dir.iterdir()
+        if ein_dir.is_dir()
+    }
+
+
+def record_searches(
+    cache_dir: Union[str, Path],
+    page_url: str,
+    ein: int,
+    searches: List[dict],
+    batch: List[dict] = None,
+):
+    """Note which cached searches an EIN's results came from, so fd_reparse.py can rebuild them
+    Args:
+        cache_dir: directory holding the page cache
+        page_url: search query (config page_url) of the EIN
+        ein: EIN of the foundation
+        searches: page_url, ein (search parameter), query_slice (None unless partitioned) and
+            exported (True if its grants were downloaded with FD's export, so its pages weren't
+            fetched) of each search, in order
+        batch: if the EIN was searched in a batch, the ein and grantmaker names of each EIN in it
+            (see fd_batch_utils.split_batch)
+    Returns:
+        None
+    """
+    record = {"searches": searches, "batch": batch}
+    write_atomically(
+        _ref_path(cache_dir, page_url, ein, 0).with_name("searches.json"),
+        json.dumps(record).encode("utf-8"),
+    )
+
+
+def read_searches(
+    cache_dir: Union[str, Path], page_url: str, ein: int
+) -> Union[dict, None]:
+    """Get the searches an EIN's results came from (see record_searches)
+    Returns:
+        dictionary with the searches and batch, or None if none were recorded (caches written
+        before searches were recorded hold only the EIN's own search)
+    """
+    searches_path = _ref_path(cache_dir, page_url, ein, 0).with_name("searches.json")
+    if not searches_path.exists():
+        return None
+    return json.loads(searches_path.read_text(encoding="utf-8"))
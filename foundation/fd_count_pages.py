@@ -0,0 +1,111 @@
+"""This command-line script counts the results pages of every EIN in fd_config.yml, without scraping them
+It runs only the initial search for each EIN and records the number of pages in the page-count
+manifest (manifest in the config file), which fd_scrape.py uses to order its work and estimate
+run time, and process_propublica_results.py uses to split EIN lists into balanced shards. The
+grantmaker names on each EIN's first results page are recorded too, so that fd_scrape.py can
+search small EINs together and split their results apart (batch_size in the config file).
+EINs already in the manifest for the config's query are skipped unless --refresh is given.
+To use:
+> python3 [path/to/this/file] --config [path/to/fd_config.yml] --output_dir [path/to/dir/for/csv/outputs]
+"""
+
+import logging
+from pathlib import Path
+
+import click
+
+from projects.foundation.fd_cache_utils import query_key
+from projects.foundation.fd_parse_utils import parse_results_page
+from projects.foundation.fd_rate_utils import start_rate_governor
+from projects.foundation.fd_schedule_utils import append_to_manifest, read_manifest
+from projects.foundation.fd_scrape_utils import (
+    count_table_pages,
+    fetch_initial_search,
+    get_web_driver,
+    perform_initial_search,
+    start_session,
+)
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+@click.option(
+    "--output_dir",
+    type=click.Path(file_okay=False, dir_okay=True),
+    required=False,
+    default=".",
+)
+@click.option("--refresh", is_flag=True, default=False)
+def count_pages(config: str, output_dir: str, refresh: bool):
+    """Record the number of results pages of each EIN's search in the page-count manifest
+    Args:
+        config: Path to configuration yml file
+        output_dir: path to the directory where the manifest is kept
+        refresh: if set, recount EINs that are already in the manifest
+    Returns:
+        None
+    """
+    config_info = yaml_to_dict(config)
+    manifest_path = Path(output_dir) / Path(
+        config_info.get("manifest", "fd_page_manifest.jsonl")
+    )
+    query = query_key(config_info["target_url"])
+    page_counts = {} if refresh else read_manifest(manifest_path, query)
+
+    start_rate_governor(config_info)
+    driver = get_web_driver(config_info)
+    try:
+        session = start_session(driver, config_info)
+
+        for i, nonprofit in enumerate(config_info["eins"]):
+            ein = str(list(nonprofit.values())[0])
+            if ein in page_counts:
+                continue
+
+            # the initial search is all it takes; over http if possible
+            html = None
+            if session is not None:
+                html = fetch_initial_search(config_info, ein, session)
+            if html is None:
+                html = perform_initial_search(driver, config_info, ein).page_source
+            page_counts[ein] = count_table_pages(driver, ein, html=html)
+
+            # the names the EIN's grants are listed under, for splitting batched searches (a
+            # no-results page has no results table to parse)
+            grantmakers = []
+            if page_counts[ein] > 0:
+                first_page_df = parse_results_page(
+                    html, ein, 1, parser=config_info.get("parser", "bs4")
+                )
+                grantmakers = sorted(set(first_page_df["Grantmaker"]))
+
+            append_to_manifest(
+                manifest_path, ein, query, page_counts[ein], grantmakers=grantmakers
+            )
+            logging.info(
+                " EIN number %s (%s) has %s pages",
+                str(i + 1),
+                ein,
+                str(page_counts[ein]),
+            )
+    finally:
+        driver.quit()
+
+    logging.info(
+        " %s EINs, %s results pages in all, recorded in %s",
+        str(len(page_counts)),
+        str(sum(page_counts.values())),
+        str(manifest_path),
+    )
+
+
+if __name__ == "__main__":
+    count_pages()
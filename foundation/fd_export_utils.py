@@ -0,0 +1,175 @@
+"""Bulk export of an EIN's grants through Foundation Directory's download button
+Instead of loading the results table page by page, export mode clicks FD's grant-list download on
+the search results page, waits for Chrome to finish writing the file, and normalizes it into the
+columns that scrape_table_pages produces (RESULT_COLUMNS), so one download replaces up to 100
+page loads. Used by fd_scrape_utils.scrape_ein when export is set in fd_config.yml, which must
+also give the css selector of the download control (export_selector), taken from the live page.
+"""
+
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Union
+
+import pandas as pd
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+
+from projects.foundation.fd_parse_utils import (
+    RESULT_COLUMNS,
+    RESULTS_PER_PAGE,
+    TABLE_COLUMNS,
+)
+
+# suffixes of files Chrome is still writing
+PARTIAL_DOWNLOAD_SUFFIXES = [".crdownload", ".tmp", ".part"]
+
+# names the exported file may give each column (compared lower case, without punctuation)
+EXPORT_COLUMN_ALIASES = {
+    "grantmaker": "Grantmaker",
+    "grantmaker name": "Grantmaker",
+    "funder": "Grantmaker",
+    "funder name": "Grantmaker",
+    "recipient": "Recipient",
+    "recipient name": "Recipient",
+    "recipient city": "Recipient City",
+    "city": "Recipient City",
+    "recipient state": "Recipient State",
+    "state": "Recipient State",
+    "recipient country": "Recipient Country",
+    "country": "Recipient Country",
+    "primary subject": "Primary Subject",
+    "subject": "Primary Subject",
+    "year": "Year",
+    "grant year": "Year",
+    "year authorized": "Year",
+    "grant amount": "Grant Amount",
+    "amount": "Grant Amount",
+}
+
+
+def download_dir(config_info: dict) -> Path:
+    """Directory Chrome saves downloads to (download_dir in the config; ./downloads by default)
+    Chrome and its DevTools protocol only take absolute paths, so the directory is resolved.
+    """
+    return (
+        Path(config_info.get("download_dir", os.path.join(os.getcwd(), "downloads")))
+        .expanduser()
+        .resolve()
+    )
+
+
+def wait_for_download(directory: Path, timeout: float = 120) -> Path:
+    """Wait for Chrome to finish downloading a file into an empty directory
+    Args:
+        directory: directory the download goes to (nothing else should be saved there)
+        timeout: seconds to wait for the download to finish
+    Returns:
+        path of the downloaded file
+    """
+    deadline = time.time() + timeout
+    last_size = None
+    while time.time() < deadline:
+        files = [
+            path
+            for path in directory.iterdir()
+            if path.is_file() and path.suffix not in PARTIAL_DOWNLOAD_SUFFIXES
+        ]
+        partial = [
+            path
+            for path in directory.iterdir()
+            if path.suffix in PARTIAL_DOWNLOAD_SUFFIXES
+        ]
+        if len(files) > 0 and len(partial) == 0:
+            # done once its size holds still between two looks
+            size = files[0].stat().st_size
+            if size == last_size:
+                return files[0]
+            last_size = size
+        time.sleep(0.25)
+    raise TimeoutException(
+        f"No finished download in {directory} after {timeout} seconds"
+    )
+
+
+def format_amount(amount: str) -> str:
+    """Write a grant amount the way the results table shows it, e.g. '25000.00' -> '$25,000'"""
+    digits = re.sub(r"[$,\s]", "", amount)
+    try:
+        return f"${round(float(digits)):,}"
+    except ValueError:
+        return amount  # leave anything unexpected as it is
+
+
+def normalize_export(export_path: Union[str, Path], ein: int) -> pd.DataFrame:
+    """Turn an FD grant-list export into the dataframe the html scraper would have produced
+    Args:
+        export_path: downloaded csv (or xlsx) file
+        ein: EIN of the foundation that was searched
+    Returns:
+        dataframe with RESULT_COLUMNS, one row per grant, in the export's order
+    """
+    export_path = Path(export_path)
+    if export_path.suffix.lower() in [".xlsx", ".xls"]:
+        export_df = pd.read_excel(export_path, dtype=str).fillna("")
+    else:
+        export_df = pd.read_csv(export_path, dtype=str, keep_default_na=False)
+
+    renames = {}
+    for column in export_df.columns:
+        key = re.sub(r"[^a-z ]", "", str(column).lower()).strip()
+        if (
+            key in EXPORT_COLUMN_ALIASES
+            and EXPORT_COLUMN_ALIASES[key] not in renames.values()
+        ):
+            renames[column] = EXPORT_COLUMN_ALIASES[key]
+    export_df = export_df.rename(columns=renames)
+
+    missing = [column for column in TABLE_COLUMNS if column not in export_df.columns]
+    if len(missing) > 0:
+        raise ValueError(
+            f"Export {export_path} has no column for {missing}; columns are {list(export_df.columns)}"
+        )
+
+    export_df = export_df[TABLE_COLUMNS].apply(lambda column: column.str.strip())
+    export_df["Grant Amount"] = [format_amount(a) for a in export_df["Grant Amount"]]
+    export_df["ein"] = ein
+    export_df["search_result_page"] = [
+        n // RESULTS_PER_PAGE + 1 for n in range(len(export_df))
+    ]
+    return export_df[RESULT_COLUMNS].reset_index(drop=True)
+
+
+def export_grants(driver: webdriver, config_info: dict, ein: int) -> pd.DataFrame:
+    """Download the grant list of the search the browser is showing and normalize it
+    Args:
+        driver: webdriver showing the FD search results for the EIN (see perform_initial_search)
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN of the foundation that was searched
+    Returns:
+        dataframe with RESULT_COLUMNS, one row per grant
+    """
+    # a fresh directory for each download, so the watcher can't mistake another file for it
+    base_dir = download_dir(config_info)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    export_dir = Path(tempfile.mkdtemp(prefix=f"{ein}_", dir=base_dir))
+    try:
+        driver.execute_cdp_cmd(
+            "Page.setDownloadBehavior",
+            {"behavior": "allow", "downloadPath": str(export_dir)},
+        )
+        driver.find_element(By.CSS_SELECTOR, config_info["export_selector"]).click()
+        export_path = wait_for_download(
+            export_dir, config_info.get("export_timeout", 120)
+        )
+        export_df = normalize_export(export_path, ein)
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+    logging.info(" ✅ Exported %s grants for EIN %s", str(len(export_df)), str(ein))
+    return export_df
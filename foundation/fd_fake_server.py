@@ -0,0 +1,415 @@
+"""Local stand-in for the Foundation Directory website, for exercising fd_scrape.py offline
+Serves:
+ * /login -- the login form (any username and password are accepted); sets a session cookie
+ * /fdo-search/search/ -- the grants search for an EIN (or several, separated by commas): div#search-results-container with
+   span.showing-number and one page of tbody#search-results-grants, honoring the year_min/year_max
+   and amount_min/amount_max filters (so searches with more than 100 pages can be partitioned)
+ * /fdo-search/export/ -- every grant of a search as a csv download (linked from a.export-grants)
+Grants are synthetic, and the same every time for a given EIN and seed (see synthetic_grants).
+Every response can be delayed (latency), and any results page can be replaced, at random, by a
+Cloudflare-style challenge page that clears itself after a few seconds (challenge_rate).
+To use:
+> python3 [path/to/this/file] --port 8765 --latency 0.5 --challenge_rate 0.01
+then point login_url, target_url and page_url in an fd_config.yml at http://127.0.0.1:8765
+"""
+
+import csv
+import html
+import io
+import logging
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+from projects.foundation.fd_parse_utils import RESULTS_PER_PAGE
+from projects.foundation.fd_query_utils import (
+    DEFAULT_AMOUNT_MAX,
+    dollars_to_int,
+)
+
+logging.basicConfig(level=logging.INFO)
+
+LOGIN_PATH = "/login"
+SEARCH_PATH = "/fdo-search/search/"
+EXPORT_PATH = "/fdo-search/export/"
+SESSION_COOKIE = "fdo_session"
+
+# (grantmaker, recipient, city, state, country, subject, year, amount in dollars)
+Grant = Tuple[str, str, str, str, str, str, int, int]
+
+_PLACES = [
+    ("Boston", "MA"),
+    ("College Station", "TX"),
+    ("Golden", "CO"),
+    ("Houston", "TX"),
+    ("New Haven", "CT"),
+    ("Oakland", "CA"),
+    ("Stanford", "CA"),
+    ("Tulsa", "OK"),
+]
+_RECIPIENTS = [
+    "Colorado School of Mines Foundation",
+    "Harvard University",
+    "Rice University",
+    "Stanford University",
+    "Texas A&M Foundation",
+    "University of California, Berkeley",
+    "University of Tulsa",
+    "Yale University",
+]
+_SUBJECTS = ["Graduate and professional education", "Higher education", "Engineering"]
+
+LOGIN_HTML = """<!DOCTYPE html>
+<html lang="en"><head><title>Log In | Foundation Directory</title></head>
+<body>
+  <form class="form-horizontal gray-box login-form" method="post" action="/login">
+    <input type="text" name="username">
+    <input type="password" name="password">
+    <input type="submit" value="Log In">
+  </form>
+</body></html>
+"""
+
+CHALLENGE_HTML = """<!DOCTYPE html>
+<html lang="en"><head><title>Just a moment...</title>
+<script src="/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1"></script></head>
+<body>
+  <div class="cf-turnstile"><div class="cb-c"><input type="checkbox"> Verify you are human</div></div>
+  <script>setTimeout(function () {{ location.reload(); }}, {clear_ms});</script>
+</body></html>
+"""
+
+RESULTS_HTML = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Grants Search Results | Foundation Directory</title></head>
+<body>
+  <main>
+    <div id="search-results-container" class="search-results">
+      {showing}
+      <a class="export-grants" href="{export_url}">Download grants</a>
+      <table class="table search-results-table">
+        <thead><tr><th></th><th>Grantmaker</th><th>Recipient</th><th>Recipient City</th>
+          <th>Recipient State</th><th>Recipient Country</th><th>Primary Subject</th>
+          <th>Year</th><th>Grant Amount</th></tr></thead>
+        <tbody id="search-results-grants">
+{rows}
+        </tbody>
+      </table>
+    </div>
+  </main>
+</body></html>
+"""
+
+ROW_HTML = """          <tr class="grant-row">
+            <td class="select-cell"><input type="checkbox" name="grant[]"></td>
+            <td class="grantmaker"><a href="#">{0}</a></td>
+            <td class="recipient"><a href="#">{1}</a></td>
+            <td>{2}</td>
+            <td>{3}</td>
+            <td>{4}</td>
+            <td><span class="subject">{5}</span></td>
+            <td>{6}</td>
+            <td class="amount">${7:,}</td>
+          </tr>"""
+
+
+@lru_cache(maxsize=256)
+def synthetic_grants(ein: str, seed: int = 0) -> List[Grant]:
+    """The grants the stand-in server lists for an EIN (the same for every call with the same seed)
+    Most EINs have a few pages of grants, some have none, and a few have more than 100 pages.
+    Args:
+        ein: EIN of the grantmaker
+        seed: changes every EIN's grants
+    Returns:
+        grants, in the order FD lists them (newest, then largest, first)
+    """
+    rng = random.Random(f"{seed}-{ein}")
+    size_class = rng.random()
+    if size_class < 0.15:
+        n_grants = 0
+    elif size_class < 0.8:
+        n_grants = rng.randint(1, 150)
+    elif size_class < 0.97:
+        n_grants = rng.randint(150, 2000)
+    else:
+        n_grants = rng.randint(5001, 8000)
+
+    grantmaker = f"Grantmaker {ein} Foundation"
+    grants = []
+    for _ in range(n_grants):
+        city, state = rng.choice(_PLACES)
+        grants.append(
+            (
+                grantmaker,
+                rng.choice(_RECIPIENTS),
+                city,
+                state,
+                "United States",
+                rng.choice(_SUBJECTS),
+                rng.randint(2003, 2025),
+                # grant amounts are heavily skewed toward small grants
+                int(round(10 ** rng.uniform(3, 7), -3)),
+            )
+        )
+    return sorted(grants, key=lambda grant: (-grant[6], -grant[7], grant[1]))
+
+
+def search_grants(query: dict, seed: int = 0) -> List[Grant]:
+    """Grants matching a search's ein, year and amount filters
+    Several EINs can be searched at once by separating them with commas.
+    Args:
+        query: query-string parameters of the search (name -> value)
+        seed: seed of the synthetic grants (see synthetic_grants)
+    Returns:
+        matching grants, in the order FD lists them
+    """
+    year_min = int(query.get("year_min") or 0)
+    year_max = int(query.get("year_max") or 9999)
+    amount_min = dollars_to_int(query.get("amount_min") or "0")
+    amount_max = dollars_to_int(query.get("amount_max") or str(DEFAULT_AMOUNT_MAX))
+    grants = [
+        grant
+        for ein in query.get("ein", "").split(",")
+        for grant in synthetic_grants(ein.strip(), seed)
+        if year_min <= grant[6] <= year_max and amount_min <= grant[7] <= amount_max
+    ]
+    return sorted(grants, key=lambda grant: (-grant[6], -grant[7], grant[1]))
+
+
+def render_results_page(grants: List[Grant], page: int, query_string: str = "") -> str:
+    """html of one page of the results table for a search's grants"""
+    export_url = html.escape(f"{EXPORT_PATH}?{query_string}")
+    if len(grants) == 0:
+        return RESULTS_HTML.format(showing="", rows="", export_url=export_url)
+
+    first = (page - 1) * RESULTS_PER_PAGE
+    page_grants = grants[first : first + RESULTS_PER_PAGE]
+    showing = (
+        f'<span class="showing-number">Showing {first + 1}-{first + len(page_grants)}'
+        f" of {len(grants):,} Results</span>"
+    )
+    rows = "\n".join(
+        ROW_HTML.format(*[html.escape(str(v)) for v in grant[:7]], grant[7])
+        for grant in page_grants
+    )
+    return RESULTS_HTML.format(showing=showing, rows=rows, export_url=export_url)
+
+
+def render_export(grants: List[Grant]) -> str:
+    """csv of all of a search's grants, with column names like FD's download"""
+    export = io.StringIO()
+    writer = csv.writer(export)
+    writer.writerow(
+        [
+            "Grantmaker Name",
+            "Recipient Name",
+            "Recipient City",
+            "Recipient State",
+            "Recipient Country",
+            "Primary Subject",
+            "Year",
+            "Amount",
+        ]
+    )
+    writer.writerows(grants)
+    return export.getvalue()
+
+
+class FakeFDHandler(BaseHTTPRequestHandler):
+    """Request handler for the stand-in FD server (settings are attributes of the server)"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(" fake FD: " + format, *args)
+
+    def _send(
+        self,
+        status: int,
+        body: str = "",
+        headers: dict = None,
+        content_type: str = "text/html",
+    ):
+        time.sleep(self.server.latency)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _logged_in(self) -> bool:
+        return f"{SESSION_COOKIE}=" in self.headers.get("Cookie", "")
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the login form or a page of search results"""
+        url = urlsplit(self.path)
+        if url.path == LOGIN_PATH:
+            self._send(200, LOGIN_HTML)
+            return
+        if url.path not in [SEARCH_PATH, EXPORT_PATH]:
+            self._send(404, "not found")
+            return
+        if not self._logged_in():
+            self._send(302, headers={"Location": LOGIN_PATH})
+            return
+
+        if self.server.challenge(self.headers.get("Cookie", ""), self.path):
+            self._send(
+                403,
+                CHALLENGE_HTML.format(
+                    clear_ms=int(1000 * self.server.challenge_seconds)
+                ),
+            )
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        grants = search_grants(query, self.server.seed)
+        if url.path == EXPORT_PATH:
+            self.server.count("exports")
+            self._send(
+                200,
+                render_export(grants),
+                headers={"Content-Disposition": 'attachment; filename="grants.csv"'},
+                content_type="text/csv",
+            )
+            return
+
+        page = int(query.get("page") or 1)
+        self.server.count("pages")
+        self._send(200, render_results_page(grants, page, url.query))
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Accept any login and start a session"""
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlsplit(self.path).path != LOGIN_PATH:
+            self._send(404, "not found")
+            return
+        self.server.count("logins")
+        session_id = f"{random.getrandbits(64):016x}"
+        self._send(
+            302,
+            headers={
+                "Location": "/fdo-search/",
+                "Set-Cookie": f"{SESSION_COOKIE}={session_id}; Path=/",
+            },
+        )
+
+
+class FakeFDServer(ThreadingHTTPServer):
+    """Threaded http server with the stand-in's settings, challenge state, and request counts"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.0,
+        challenge_rate: float = 0.0,
+        challenge_seconds: float = 3.0,
+        seed: int = 0,
+    ):
+        super().__init__(address, FakeFDHandler)
+        self.latency = latency
+        self.challenge_rate = challenge_rate
+        self.challenge_seconds = challenge_seconds
+        self.seed = seed
+        self.stats = {"pages": 0, "logins": 0, "challenges": 0, "exports": 0}
+        self._rng = random.Random(seed)
+        self._challenged = {}
+        self._lock = threading.Lock()
+
+    def count(self, stat: str):
+        """Add one to a request count"""
+        with self._lock:
+            self.stats[stat] += 1
+
+    def challenge(self, cookie: str, path: str) -> bool:
+        """Decide whether this request gets a challenge page instead of results
+        A challenged (session, page) keeps getting the challenge until challenge_seconds have passed.
+        """
+        with self._lock:
+            cleared_at = self._challenged.get((cookie, path))
+            if cleared_at is not None:
+                if time.time() < cleared_at:
+                    return True
+                del self._challenged[(cookie, path)]
+                return False
+            if self._rng.random() < self.challenge_rate:
+                self._challenged[(cookie, path)] = time.time() + self.challenge_seconds
+                self.stats["challenges"] += 1
+                return True
+        return False
+
+    @property
+    def base_url(self) -> str:
+        """Address of the server, e.g. http://127.0.0.1:8765"""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+def start_fake_fd_server(
+    host: str = "127.0.0.1", port: int = 0, **settings
+) -> FakeFDServer:
+    """Start the stand-in FD server in a background thread
+    Args:
+        host: address to listen on
+        port: port to listen on (0 picks a free port; see base_url)
+        settings: latency, challenge_rate, challenge_seconds, seed (see FakeFDServer)
+    Returns:
+        the running server; call its shutdown() method to stop it
+    """
+    server = FakeFDServer((host, port), **settings)
+    threading.Thread(
+        target=server.serve_forever, name="fake_fd_server", daemon=True
+    ).start()
+    return server
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option("--host", type=str, required=False, default="127.0.0.1")
+@click.option("--port", type=int, required=False, default=8765)
+@click.option("--latency", type=float, required=False, default=0.0)
+@click.option("--challenge_rate", type=float, required=False, default=0.0)
+@click.option("--challenge_seconds", type=float, required=False, default=3.0)
+@click.option("--seed", type=int, required=False, default=0)
+def fake_fd_server(
+    host: str,
+    port: int,
+    latency: float,
+    challenge_rate: float,
+    challenge_seconds: float,
+    seed: int,
+):
+    """Run the stand-in FD server until interrupted
+    Args:
+        host: address to listen on
+        port: port to listen on
+        latency: seconds added to every response
+        challenge_rate: chance that a results page is replaced by a challenge page
+        challenge_seconds: how long a challenge takes to clear itself
+        seed: seed of the synthetic grants and challenges
+    Returns:
+        None
+    """
+    server = FakeFDServer(
+        (host, port),
+        latency=latency,
+        challenge_rate=challenge_rate,
+        challenge_seconds=challenge_seconds,
+        seed=seed,
+    )
+    logging.info(" Stand-in FD server listening at %s", server.base_url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info(" Served %s", server.stats)
+
+
+if __name__ == "__main__":
+    fake_fd_server()
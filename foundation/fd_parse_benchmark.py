@@ -0,0 +1,72 @@
+"""This command-line script benchmarks the FD results-page parser backends in fd_parse_utils.py
+It parses every saved FD results page (*.html) in a directory with each backend, checks that all
+backends agree with the original BeautifulSoup parser, and reports rows per second for each.
+To use:
+> python3 [path/to/this/file] --fixture_dir [path/to/dir/of/saved/html/pages] --repeat [N]
+"""
+
+import logging
+import time
+from pathlib import Path
+
+import click
+
+from projects.foundation.fd_parse_utils import RESULT_PARSERS, parse_results_page
+
+logging.basicConfig(level=logging.INFO)
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option(
+    "--fixture_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    required=False,
+    default=str(Path(__file__).parent / "fixtures"),
+)
+@click.option("--repeat", type=click.IntRange(min=1), required=False, default=20)
+def parse_benchmark(fixture_dir: str, repeat: int):
+    """Time each parser backend over a directory of saved FD results pages
+    Args:
+        fixture_dir: directory holding saved FD results-page html files
+        repeat: number of times each page is parsed by each backend
+    Returns:
+        None
+    """
+    pages = [
+        path.read_text(encoding="utf-8") for path in Path(fixture_dir).glob("*.html")
+    ]
+    if len(pages) == 0:
+        raise FileNotFoundError(f"No .html files found in {fixture_dir}")
+
+    # every backend has to give exactly the same dataframe as the original parser
+    expected = [parse_results_page(html, 0, 1, parser="bs4") for html in pages]
+    for parser in RESULT_PARSERS:
+        for html, expected_df in zip(pages, expected):
+            if not parse_results_page(html, 0, 1, parser=parser).equals(expected_df):
+                raise ValueError(f"Parser '{parser}' does not match the bs4 parser")
+
+    n_rows = sum(len(df) for df in expected)
+    logging.info(
+        " Parsing %s pages (%s rows) %s times with each backend",
+        str(len(pages)),
+        str(n_rows),
+        str(repeat),
+    )
+    for parser in RESULT_PARSERS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for html in pages:
+                parse_results_page(html, 0, 1, parser=parser)
+        elapsed = time.perf_counter() - start
+
+        logging.info(
+            " %-9s %10.0f rows/s %8.2f ms/page",
+            parser,
+            n_rows * repeat / elapsed,
+            1000 * elapsed / (len(pages) * repeat),
+        )
+
+
+if __name__ == "__main__":
+    parse_benchmark()
@@ -0,0 +1,190 @@
+"""Parsers that turn the html of a Foundation Directory results page into a dataframe of grants
+Used by fd_scrape_utils.py; each parser backend returns identical results:
+ * bs4: builds a full BeautifulSoup tree of the page (original, slowest)
+ * lxml: builds a full lxml tree of the page and pulls the rows out with xpath
+ * targeted: slices out only tbody#search-results-grants and hands just that to lxml
+"""
+
+# pylint: disable = bare-except, raise-missing-from
+import logging
+import math
+import re
+from typing import Callable, Dict, List
+
+import lxml.html
+import pandas as pd
+from bs4 import BeautifulSoup
+
+# columns of the dataframe assembled from each page of the FD results table
+RESULT_COLUMNS = [
+    "Grantmaker",
+    "Recipient",
+    "Recipient City",
+    "Recipient State",
+    "Recipient Country",
+    "Primary Subject",
+    "Year",
+    "Grant Amount",
+    "ein",
+    "search_result_page",
+]
+
+# the first eight columns come, in order, from table cells 1-8 of each row (cell 0 is a checkbox)
+TABLE_COLUMNS = RESULT_COLUMNS[:8]
+
+RESULTS_TBODY_ID = "search-results-grants"
+
+# rows per page of FD's results table
+RESULTS_PER_PAGE = 50
+
+# markup that only appears on Cloudflare's human-verification (challenge) pages
+CHALLENGE_MARKERS = ["challenge-platform", "cf-chl-", 'class="cb-c"', "cf-turnstile"]
+
+# the same markup as a css selector, for finding a challenge in a live browser page
+CHALLENGE_SELECTOR = (
+    ".cb-c, .cf-turnstile, #challenge-form, iframe[src*='challenge-platform']"
+)
+
+
+def is_results_page(html: str) -> bool:
+    """True if html is an FD search-results page (rather than a login or challenge page)"""
+    return re.search(r"id=[\"']?search-results-container", html) is not None
+
+
+def is_challenge_page(html: str) -> bool:
+    """True if html is a Cloudflare human-verification challenge"""
+    return any(marker in html for marker in CHALLENGE_MARKERS)
+
+
+def _rows_bs4(html: str) -> List[List[str]]:
+    """Extract the text of table cells 1-8 from each results row using BeautifulSoup"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # find the results table and get the results row
+    results_table = soup.find("tbody", id=RESULTS_TBODY_ID)
+    if results_table is None:
+        raise ValueError("Could not find the results table in the page html.")
+
+    rows = []
+    for row in results_table.find_all("tr"):
+        cols = row.find_all("td")
+        if len(cols) < 9:
+            continue  # skip malformed rows
+        rows.append([col.get_text(strip=True) for col in cols[1:9]])
+    return rows
+
+
+def _rows_from_lxml_tbody(tbody) -> List[List[str]]:
+    """Extract the text of table cells 1-8 from each row of an lxml tbody element"""
+    rows = []
+    for row in tbody.iterchildren("tr"):
+        cols = row.findall("td")
+        if len(cols) < 9:
+            continue  # skip malformed rows
+        # same text as BeautifulSoup's get_text(strip=True): strip, then join, each text node
+        rows.append(["".join(t.strip() for t in col.itertext()) for col in cols[1:9]])
+    return rows
+
+
+def _rows_lxml(html: str) -> List[List[str]]:
+    """Extract the text of table cells 1-8 from each results row using a full lxml parse"""
+    tbodies = lxml.html.fromstring(html).xpath(f'//tbody[@id="{RESULTS_TBODY_ID}"]')
+    if len(tbodies) == 0:
+        raise ValueError("Could not find the results table in the page html.")
+    return _rows_from_lxml_tbody(tbodies[0])
+
+
+def _rows_targeted(html: str) -> List[List[str]]:
+    """Extract the text of table cells 1-8 from each results row, parsing only the results tbody"""
+    # the id may be double-quoted, single-quoted or bare, as in is_results_page
+    match = re.search(rf"id=[\"']?{RESULTS_TBODY_ID}(?![\w-])", html)
+    if match is None:
+        raise ValueError("Could not find the results table in the page html.")
+    start = html.rfind("<tbody", 0, match.start())
+    end = html.find("</tbody>", start)
+    if start == -1 or end == -1:
+        raise ValueError("Could not find the results table in the page html.")
+
+    # wrap the slice in a table so lxml keeps the rows and cells where they belong
+    table = lxml.html.fragment_fromstring(
+        "<table>" + html[start : end + len("</tbody>")] + "</table>"
+    )
+    return _rows_from_lxml_tbody(table.find("tbody"))
+
+
+def count_pages_in_html(html: str) -> int:
+    """
+    Get the total number of pages based on the number of results and results per page.
+
+    Args:
+        html: page source of the initial search (or the first results page) for an EIN
+    Returns:
+        total_number_of_pages: number pages into which the table is parsed
+    """
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    try:
+        showing_span = soup.select_one("span.showing-number")
+    except:
+        raise ValueError("Could not find html for grant numbers.")
+
+    # If span.showing-number was not in the html, then there aren't any grants for this EIN
+    if showing_span is None:
+        return 0
+
+    # find the three numbers in the showing span text.
+    # Should be of the form Showing [FIRST MATCH]-[SECOND MATCH] of [THIRD MATCH] Results
+    match = re.search(r"Showing\s+(\d+)[–-](\d+)\s+of\s+([\d,]+)", showing_span.text)
+    if not match:
+        raise ValueError(
+            """
+            Structure of text shown on table doesn't match expected structure:\n
+            'Showing [FIRST MATCH]-[SECOND MATCH] of [THIRD MATCH] Results'
+            """
+        )
+    # Convert match results to integers, removing any thousands-separator commas
+    start = int(match.group(1).replace(",", ""))
+    end = int(match.group(2).replace(",", ""))
+    total_results = int(match.group(3).replace(",", ""))
+
+    results_per_page = end - start + 1
+    total_number_of_pages = math.ceil(total_results / results_per_page)
+    logging.debug(
+        " Found %s pages of the results table for this ein.", str(total_number_of_pages)
+    )
+
+    return total_number_of_pages
+
+
+RESULT_PARSERS: Dict[str, Callable[[str], List[List[str]]]] = {
+    "bs4": _rows_bs4,
+    "lxml": _rows_lxml,
+    "targeted": _rows_targeted,
+}
+
+
+def parse_results_page(
+    html: str, ein: int, page: int, parser: str = "bs4"
+) -> pd.DataFrame:
+    """Assemble the rows of the results table on one FD results page into a dataframe
+    Args:
+        html: page source of an FD results page
+        ein: EIN of the foundation that is currently being interrogated
+        page: page number of the results table that html holds
+        parser: name of the parser backend (a key of RESULT_PARSERS)
+    Returns:
+        dataframe with RESULT_COLUMNS, one row per grant on the page
+    """
+    if parser not in RESULT_PARSERS:
+        raise ValueError(
+            f"Unknown parser '{parser}'. Choose one of {list(RESULT_PARSERS.keys())}"
+        )
+    rows = RESULT_PARSERS[parser](html)
+
+    # build the columns directly rather than a dict per row
+    columns = {name: [row[j] for row in rows] for j, name in enumerate(TABLE_COLUMNS)}
+    columns["ein"] = [ein] * len(rows)
+    columns["search_result_page"] = [page] * len(rows)
+
+    return pd.DataFrame(columns, columns=RESULT_COLUMNS)
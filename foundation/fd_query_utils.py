@@ -0,0 +1,160 @@
+"""Utility functions for rewriting Foundation Directory search queries (target_url and page_url)
+Used by fd_scrape_utils.py to split searches whose results table is longer than FD's page limit.
+"""
+
+import datetime as dt
+import math
+import os
+from pathlib import Path
+from typing import List, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+
+from projects.foundation.fd_parse_utils import RESULT_COLUMNS
+
+# (year_min, year_max, amount_min, amount_max) of one slice of a search; all bounds inclusive
+QueryBounds = Tuple[int, int, int, int]
+
+DEFAULT_AMOUNT_MAX = 10_000_000_000
+
+
+def get_query_params(url: str) -> dict:
+    """Query-string parameters of an FD search url as a dictionary (values decoded)"""
+    return dict(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+
+
+def set_query_params(url: str, params: dict) -> str:
+    """Replace (or add) query-string parameters of an FD search url, keeping the order of the rest
+    Args:
+        url: FD search url, e.g. config_info['target_url']
+        params: parameter name -> new (unencoded) value
+    Returns:
+        url with the new parameter values
+    """
+    split_url = urlsplit(url)
+    query = parse_qsl(split_url.query, keep_blank_values=True)
+    query = [(key, params.get(key, value)) for key, value in query]
+    query += [(key, value) for key, value in params.items() if key not in dict(query)]
+    return urlunsplit(split_url._replace(query=urlencode(query)))
+
+
+def dollars_to_int(amount: str) -> int:
+    """Convert an FD amount filter value such as '$10,000,000' to an integer"""
+    return int(amount.replace("$", "").replace(",", "").strip())
+
+
+def query_bounds(config_info: dict) -> QueryBounds:
+    """Year and grant-amount bounds of the search in config_info['target_url']
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+    Returns:
+        (year_min, year_max, amount_min, amount_max); a missing year_max is this year, and missing
+        amount filters are $0 and DEFAULT_AMOUNT_MAX
+    Raises:
+        ValueError: if target_url has no year_min filter (no earliest year can be assumed without
+            losing older grants from partitioned searches)
+    """
+    params = get_query_params(config_info["target_url"])
+    if not params.get("year_min"):
+        raise ValueError(
+            "target_url has no year_min filter, so a search can't be partitioned by year;"
+            " add year_min (e.g. year_min=2003) to target_url and page_url, or set partition: false"
+        )
+    return (
+        int(params["year_min"]),
+        int(params.get("year_max") or dt.date.today().year),
+        dollars_to_int(params.get("amount_min") or "0"),
+        dollars_to_int(params.get("amount_max") or str(DEFAULT_AMOUNT_MAX)),
+    )
+
+
+def split_bounds(bounds: QueryBounds) -> Union[List[QueryBounds], None]:
+    """Bisect a search slice: by year while it spans several years, then by grant amount
+    Args:
+        bounds: (year_min, year_max, amount_min, amount_max) of the slice
+    Returns:
+        two slices that together cover bounds, or None if it can't be split
+    """
+    year_min, year_max, amount_min, amount_max = bounds
+    if year_min < year_max:
+        year_mid = (year_min + year_max) // 2
+        return [
+            (year_min, year_mid, amount_min, amount_max),
+            (year_mid + 1, year_max, amount_min, amount_max),
+        ]
+    if amount_max - amount_min >= 2:
+        # grant amounts are heavily skewed, so split amount bands geometrically. The bands share
+        # their boundary amount so no fractional-dollar grant falls between them (see
+        # merge_slice_csvs for the grants found in both)
+        amount_mid = int(math.sqrt(max(amount_min, 1) * amount_max))
+        amount_mid = min(max(amount_mid, amount_min + 1), amount_max - 1)
+        return [
+            (year_min, year_max, amount_min, amount_mid),
+            (year_min, year_max, amount_mid, amount_max),
+        ]
+    if amount_max - amount_min == 1:
+        return [
+            (year_min, year_max, amount_min, amount_min),
+            (year_min, year_max, amount_max, amount_max),
+        ]
+    return None
+
+
+def query_slice(config_info: dict, bounds: QueryBounds) -> dict:
+    """Copy of config_info whose target_url and page_url search only one slice of years and amounts
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        bounds: (year_min, year_max, amount_min, amount_max) of the slice
+    Returns:
+        configuration dictionary for the slice, with a 'query_slice' label
+    """
+    year_min, year_max, amount_min, amount_max = bounds
+    params = {
+        "year_min": str(year_min),
+        "year_max": str(year_max),
+        "amount_min": f"${amount_min:,}",
+        "amount_max": f"${amount_max:,}",
+    }
+    slice_config = dict(config_info)
+    slice_config["target_url"] = set_query_params(config_info["target_url"], params)
+    slice_config["page_url"] = set_query_params(config_info["page_url"], params)
+    slice_config["query_slice"] = f"y{year_min}-{year_max}_a{amount_min}-{amount_max}"
+    return slice_config
+
+
+def merge_slice_csvs(part_paths: List[Path], output_path: Path, chunksize: int = 10000):
+    """Stream the results csvs of several search slices into one csv, dropping grants found in more
+    than one slice. Identical grants within one slice (e.g., installments) are all kept: a grant
+    listed n times in one slice and n times in another is written n times.
+    Args:
+        part_paths: csv of results for each slice, in order
+        output_path: combined csv; written to a temporary file and moved into place when complete
+        chunksize: number of rows read into memory at a time
+    Returns:
+        None
+    """
+    grant_columns = [c for c in RESULT_COLUMNS if c != "search_result_page"]
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+
+    # most times each grant (by hash of its columns) has been listed in any one slice so far
+    max_copies = {}
+    with open(tmp_path, "w", encoding="utf-8", newline="") as output_file:
+        write_header = True
+        for part_path in part_paths:
+            copies = {}
+            for chunk in pd.read_csv(
+                part_path, dtype=str, keep_default_na=False, chunksize=chunksize
+            ):
+                keep = []
+                for row_hash in pd.util.hash_pandas_object(
+                    chunk[grant_columns], index=False
+                ):
+                    copies[row_hash] = copies.get(row_hash, 0) + 1
+                    keep.append(copies[row_hash] > max_copies.get(row_hash, 0))
+                chunk[keep].to_csv(output_file, header=write_header, index=False)
+                write_header = False
+            for row_hash, n in copies.items():
+                max_copies[row_hash] = max(n, max_copies.get(row_hash, 0))
+
+    os.replace(tmp_path, output_path)
@@ -0,0 +1,148 @@
+"""Token-bucket rate governor for FD page requests, shared by every thread and process on a machine
+The bucket lives in a small json file guarded by an exclusive file lock, so separate fd_scrape.py
+runs (and all of their --workers) draw from one rate, e.g.
+ {"rate": 0.5, "tokens": 0.3, "updated": 1760000000.0, "last_cut": 1759999000.0}
+where rate is in page requests per second. Whenever any request meets a Cloudflare challenge the
+rate is cut (multiplied by RATE_DECREASE, at most once per CUT_COOLDOWN_SECONDS), and every request
+that doesn't meet one raises it a little (by rate_limit_increase), up to rate_limit_max.
+"""
+
+import fcntl
+import json
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+from projects.foundation.fd_telemetry_utils import timed
+
+RATE_DECREASE = 0.5
+CUT_COOLDOWN_SECONDS = 30
+
+# settings of this process's governor; path None turns the governor off
+_GOVERNOR = {"path": None}
+
+
+def start_rate_governor(config_info: dict) -> Union[Path, None]:
+    """Turn on the rate governor if the config sets rate_limit (initial page requests per second)
+    Args:
+        config_info: configuration settings read in from fd_config.yml; also rate_limit_min,
+            rate_limit_max, rate_limit_increase, rate_limit_burst and rate_limit_file (shared by
+            every process that uses the same file; in the system temp directory by default)
+    Returns:
+        path to the shared governor file, or None if the governor is off
+    """
+    if config_info.get("rate_limit") is None:
+        _GOVERNOR["path"] = None
+        return None
+
+    _GOVERNOR.update(
+        {
+            "path": Path(
+                config_info.get(
+                    "rate_limit_file",
+                    Path(tempfile.gettempdir()) / "fd_rate_governor.json",
+                )
+            ),
+            "initial": float(config_info["rate_limit"]),
+            "min": float(config_info.get("rate_limit_min", 0.05)),
+            "max": float(
+                config_info.get("rate_limit_max", 2 * config_info["rate_limit"])
+            ),
+            "increase": float(config_info.get("rate_limit_increase", 0.005)),
+            "burst": float(config_info.get("rate_limit_burst", 1)),
+        }
+    )
+    return _GOVERNOR["path"]
+
+
+@contextmanager
+def _locked_state() -> Iterator[dict]:
+    """Read the shared bucket under an exclusive lock and write it back if it was changed"""
+    with open(_GOVERNOR["path"], "a+", encoding="utf-8") as governor_file:
+        fcntl.flock(governor_file, fcntl.LOCK_EX)
+        try:
+            governor_file.seek(0)
+            try:
+                saved = json.loads(governor_file.read())
+                state = dict(saved)
+            except json.JSONDecodeError:
+                # a new (or damaged) file: start with a full bucket at the configured rate
+                saved = None
+                state = {
+                    "rate": _GOVERNOR["initial"],
+                    "tokens": _GOVERNOR["burst"],
+                    "updated": time.time(),
+                    "last_cut": 0.0,
+                }
+            # another process may run with different limits; stay within this one's
+            state["rate"] = min(max(state["rate"], _GOVERNOR["min"]), _GOVERNOR["max"])
+
+            yield state
+
+            # write back only changes (a success at the max rate changes nothing)
+            if state != saved:
+                governor_file.seek(0)
+                governor_file.truncate()
+                governor_file.write(json.dumps(state))
+                governor_file.flush()
+        finally:
+            fcntl.flock(governor_file, fcntl.LOCK_UN)
+
+
+def acquire_request(**fields):
+    """Wait for the shared bucket to allow one more FD page request (returns at once if it's off)
+    Args:
+        fields: recorded with the time spent waiting in telemetry, e.g. ein, page
+    Returns:
+        None
+    """
+    if _GOVERNOR["path"] is None:
+        return
+
+    with timed("rate_wait", **fields):
+        while True:
+            with _locked_state() as state:
+                now = time.time()
+                state["tokens"] = min(
+                    _GOVERNOR["burst"],
+                    state["tokens"] + (now - state["updated"]) * state["rate"],
+                )
+                state["updated"] = now
+                if state["tokens"] >= 1:
+                    state["tokens"] -= 1
+                    return
+                wait_seconds = (1 - state["tokens"]) / state["rate"]
+            time.sleep(wait_seconds)
+
+
+def report_challenge():
+    """Slow every process down after a request met a Cloudflare challenge"""
+    if _GOVERNOR["path"] is None:
+        return
+
+    with _locked_state() as state:
+        # workers tend to meet challenges together; count a burst of them as one
+        if time.time() - state["last_cut"] > CUT_COOLDOWN_SECONDS:
+            state["rate"] = max(_GOVERNOR["min"], state["rate"] * RATE_DECREASE)
+            state["last_cut"] = time.time()
+            # drop saved-up tokens so the slower rate takes effect at once
+            state["tokens"] = min(state["tokens"], 0.0)
+
+
+def report_success():
+    """Speed every process up a little after a request got through without a challenge"""
+    if _GOVERNOR["path"] is None:
+        return
+
+    with _locked_state() as state:
+        state["rate"] = min(_GOVERNOR["max"], state["rate"] + _GOVERNOR["increase"])
+
+
+def current_rate() -> Union[float, None]:
+    """Page requests per second the shared bucket currently allows (None if the governor is off)"""
+    if _GOVERNOR["path"] is None:
+        return None
+    with _locked_state() as state:
+        return state["rate"]
@@ -0,0 +1,220 @@
+"""This command-line script rebuilds per-EIN grant csvs from the raw results pages that fd_scrape.py
+saved in its page cache (cache_dir in fd_config.yml), without opening a browser. Use it after
+changing the results-table parser or its columns. EINs whose results came from the slices of a
+partitioned search, or from a batch of EINs searched together, are rebuilt from those searches.
+EINs whose grants were downloaded with FD's export (export in the config) have no cached pages,
+and are reported as not rebuilt.
+To use:
+> python3 [path/to/this/file] --config [path/to/fd_config.yml] --output_dir [path/to/dir/for/csv/outputs]
+Add --parser [bs4|lxml|targeted] to override the parser set in the config file.
+"""
+
+import logging
+from pathlib import Path
+from typing import Union
+
+import click
+import pandas as pd
+
+from projects.foundation.fd_batch_utils import split_batch
+from projects.foundation.fd_cache_utils import (
+    cached_pages,
+    read_cached_page,
+    read_searches,
+)
+from projects.foundation.fd_parse_utils import (
+    RESULT_COLUMNS,
+    RESULT_PARSERS,
+    count_pages_in_html,
+    parse_results_page,
+)
+from projects.foundation.fd_query_utils import merge_slice_csvs
+from projects.foundation.fd_scrape_utils import (
+    clean_company_name,
+    grant_csv_path,
+    partial_csv_path,
+)
+from utils.io import yaml_to_dict
+
+logging.basicConfig(level=logging.INFO)
+
+
+def reparse_search(
+    config_info: dict, page_url: str, ein: Union[int, str], parser: str
+) -> Union[pd.DataFrame, None]:
+    """Parse the cached pages of one search into its results
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        page_url: search query the pages were cached under (the config's, or a slice's)
+        ein: ein search parameter (an EIN, or several for a batch)
+        parser: results-table parser backend
+    Returns:
+        results of the search (RESULT_COLUMNS), or None if some of its pages aren't cached
+    """
+    # the first page says how many pages the search's results should have
+    first_page = read_cached_page(config_info["cache_dir"], page_url, ein, 1)
+    if first_page is None:
+        logging.warning(" ⚠️ Page 1 for EIN %s is not cached", ein)
+        return None
+    # pages beyond FD's page limit were never fetched
+    total_number_of_pages = min(
+        count_pages_in_html(first_page), config_info.get("page_limit", 100)
+    )
+    cached = cached_pages(config_info["cache_dir"], page_url).get(str(ein), [])
+    missing_pages = sorted(set(range(1, total_number_of_pages + 1)) - set(cached))
+    if len(missing_pages) > 0:
+        logging.warning(" ⚠️ Pages %s for EIN %s are not cached", missing_pages, ein)
+        return None
+
+    if total_number_of_pages == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(
+        [
+            parse_results_page(
+                read_cached_page(config_info["cache_dir"], page_url, ein, p),
+                ein,
+                p,
+                parser=parser,
+            )
+            for p in range(1, total_number_of_pages + 1)
+        ],
+        ignore_index=True,
+    )
+
+
+def reparse_ein(
+    config_info: dict, ein: int, final_path: Path, parser: str
+) -> Union[bool, None]:
+    """Rebuild one EIN's grant csv from the cached pages of the searches its results came from
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN of the foundation
+        final_path: the EIN's grant csv (see grant_csv_path)
+        parser: results-table parser backend
+    Returns:
+        True if the csv was written, False if the EIN has no grants (no csv, as when scraping),
+        or None if it can't be rebuilt from the cache
+    """
+    record = read_searches(config_info["cache_dir"], config_info["page_url"], ein)
+    if record is None:
+        if str(ein) not in cached_pages(
+            config_info["cache_dir"], config_info["page_url"]
+        ):
+            return None
+        record = {
+            "searches": [
+                {"page_url": config_info["page_url"], "ein": ein, "query_slice": None}
+            ],
+            "batch": None,
+        }
+
+    if any(search.get("exported", False) for search in record["searches"]):
+        logging.warning(
+            " ⚠️ EIN %s was downloaded with FD's export, so its results pages weren't cached",
+            ein,
+        )
+        return None
+
+    search_dfs = []
+    for search in record["searches"]:
+        search_df = reparse_search(
+            config_info, search["page_url"], search["ein"], parser
+        )
+        if search_df is None:
+            return None
+        search_dfs.append((search, search_df))
+
+    if record["batch"] is not None:
+        # a batch search's results are split back into each EIN's, as when scraping
+        batch_df = search_dfs[0][1]
+        split = split_batch(
+            batch_df,
+            [(None, member["ein"], None) for member in record["batch"]],
+            {str(member["ein"]): member["grantmakers"] for member in record["batch"]},
+        )
+        search_dfs = [(record["searches"][0], split[str(ein)])]
+
+    if sum(len(search_df) for _, search_df in search_dfs) == 0:
+        return False
+    if len(search_dfs) == 1:
+        search_dfs[0][1].to_csv(final_path, index=False)
+        return True
+
+    # slices of a partitioned search, de-duplicated as when scraping
+    part_paths = []
+    for search, search_df in search_dfs:
+        part_paths.append(partial_csv_path(final_path, search))
+        search_df.to_csv(part_paths[-1], index=False)
+    merge_slice_csvs(part_paths, final_path)
+    for part_path in part_paths:
+        part_path.unlink()
+    return True
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option(
+    "--config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+@click.option(
+    "--output_dir",
+    type=click.Path(file_okay=False, dir_okay=True),
+    required=False,
+    default=".",
+)
+@click.option(
+    "--parser",
+    type=click.Choice(list(RESULT_PARSERS.keys())),
+    required=False,
+    default=None,
+)
+def reparse(config: str, output_dir: str, parser: str):
+    """For each EIN in the config with a complete set of cached results pages, rebuilds its grant csv
+    EINs whose results came from the slices of a partitioned search, or from a batch of EINs searched
+    together, are rebuilt from those searches' pages (see fd_cache_utils.record_searches).
+    Args:
+        config: Path to configuration yml file (the one used for scraping)
+        output_dir: path to the directory where the foundation-grant csvs will be written
+        parser: results-table parser backend; defaults to the config's parser
+    Returns:
+        None
+    """
+    config_info = yaml_to_dict(config)
+    if config_info.get("cache_dir") is None:
+        raise ValueError("The configuration file does not specify a cache_dir")
+    if parser is None:
+        parser = config_info.get("parser", "bs4")
+
+    n_written = 0
+    not_rebuilt = []
+    for nonprofit in config_info["eins"]:
+        ein = list(nonprofit.values())[0]
+        company_name = clean_company_name(list(nonprofit.keys())[0])
+        final_path = grant_csv_path(config_info, output_dir, company_name, ein)
+        try:
+            written = reparse_ein(config_info, ein, final_path, parser)
+        except ValueError as split_error:
+            # grantmakers in the batch's results that the recorded names don't cover
+            logging.warning(
+                " ⚠️ Couldn't split the batch of EIN %s: %s", ein, split_error
+            )
+            written = None
+        if written is None:
+            logging.warning(" ⚠️ EIN %s can't be rebuilt from the page cache", ein)
+            not_rebuilt.append(ein)
+        elif written:
+            n_written += 1
+
+    logging.info(" >>> Rebuilt %s grant csvs from cached pages", str(n_written))
+    if len(not_rebuilt) > 0:
+        logging.warning(
+            " ⚠️ %s EINs couldn't be rebuilt from cached pages: %s",
+            str(len(not_rebuilt)),
+            not_rebuilt,
+        )
+
+
+if __name__ == "__main__":
+    reparse()
@@ -0,0 +1,202 @@
+"""Page-count manifest and work scheduling for the fd_scrape.py web scraper
+The manifest is an append-only file (one json object per line) recording how many results pages
+each EIN's search has, e.g. {"ein": "123456789", "query": "3f1c...", "total_pages": 12}, where query
+is a short hash of the config's target_url (see fd_cache_utils.query_key), along with the
+grantmaker names on the first results page ("grantmakers"). It is written by the fd_count_pages.py
+pre-pass and used to order EINs, estimate run time, split EIN lists into shards of similar size
+for separate machines (see process_propublica_results.py), and batch small EINs into combined
+searches (see fd_batch_utils.py).
+"""
+
+import heapq
+import json
+import logging
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+# ways fd_scrape can order EINs: as listed in the config, most pages first (so the long EINs
+# don't all end up at the end of a parallel run), or fewest pages first (quick partial results)
+SCHEDULES = ["config", "longest_first", "shortest_first"]
+
+# used for the ETA when there's no telemetry to learn from
+DEFAULT_SECONDS_PER_PAGE = 6.0
+
+# (ein number in the config, ein, company name), as queued for scraping
+EinItem = Tuple[int, str, str]
+
+
+def append_to_manifest(
+    manifest_path: Path,
+    ein: str,
+    query: str,
+    total_pages: int,
+    grantmakers: List[str] = None,
+):
+    """Record the number of results pages of an EIN's search in the manifest
+    Args:
+        manifest_path: path to the append-only page-count manifest
+        ein: EIN that was searched
+        query: key of the search query (see fd_cache_utils.query_key)
+        total_pages: number of pages in the EIN's results table
+        grantmakers: names in the Grantmaker column of the EIN's first results page
+    Returns:
+        None
+    """
+    entry = {"ein": str(ein), "query": query, "total_pages": total_pages}
+    if grantmakers is not None:
+        entry["grantmakers"] = grantmakers
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        manifest_file.write(json.dumps(entry) + "\n")
+
+
+def read_manifest(manifest_path: Union[str, Path], query: str = None) -> Dict[str, int]:
+    """Read the page count of each EIN from the manifest (the latest count wins)
+    Args:
+        manifest_path: path to the append-only page-count manifest
+        query: if given, only counts for this search query are read
+    Returns:
+        dictionary of ein -> number of results pages
+    """
+    page_counts = {}
+    if not Path(manifest_path).exists():
+        return page_counts
+
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        for line in manifest_file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line of a manifest cut off by a crash
+            if query is None or entry.get("query") == query:
+                page_counts[entry["ein"]] = entry["total_pages"]
+    return page_counts
+
+
+def read_grantmakers(
+    manifest_path: Union[str, Path], query: str = None
+) -> Dict[str, List[str]]:
+    """Read the grantmaker names recorded for each EIN in the manifest (the latest record wins)
+    Args:
+        manifest_path: path to the append-only page-count manifest
+        query: if given, only records for this search query are read
+    Returns:
+        dictionary of ein -> grantmaker names in its results (EINs recorded without names are left out)
+    """
+    grantmakers = {}
+    if not Path(manifest_path).exists():
+        return grantmakers
+
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        for line in manifest_file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if query is None or entry.get("query") == query:
+                if "grantmakers" in entry:
+                    grantmakers[entry["ein"]] = entry["grantmakers"]
+                else:
+                    grantmakers.pop(entry["ein"], None)
+    return grantmakers
+
+
+def page_loads(ein: str, page_counts: Dict[str, int], default: float) -> float:
+    """Expected page loads to scrape an EIN: its results pages, or default if it hasn't been counted
+    An EIN without results still costs the load of its initial search.
+    """
+    return max(page_counts.get(str(ein), default), 1)
+
+
+def schedule_eins(
+    items: List[EinItem], page_counts: Dict[str, int], schedule: str = "config"
+) -> List[EinItem]:
+    """Order EINs for scraping
+    Args:
+        items: (ein number, ein, company name) of each EIN to scrape, in config order
+        page_counts: ein -> number of results pages (see read_manifest)
+        schedule: one of SCHEDULES
+    Returns:
+        items in the order they should be scraped
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown schedule '{schedule}'. Choose one of {SCHEDULES}")
+    if schedule == "config":
+        return list(items)
+
+    # EINs that haven't been counted are assumed to be typical
+    default = statistics.median(page_counts.values()) if len(page_counts) > 0 else 1
+    return sorted(
+        items,
+        key=lambda item: page_loads(item[1], page_counts, default),
+        reverse=schedule == "longest_first",
+    )
+
+
+def balance_shards(
+    items: List[EinItem], page_counts: Dict[str, int], n_shards: int
+) -> List[List[EinItem]]:
+    """Split EINs into shards with about the same number of page loads each
+    Assigns EINs, most pages first, to whichever shard has the fewest page loads so far.
+    Args:
+        items: (ein number, ein, company name) of each EIN
+        page_counts: ein -> number of results pages (see read_manifest)
+        n_shards: number of shards
+    Returns:
+        list of shards, each a list of items in its original (config) order
+    """
+    default = statistics.median(page_counts.values()) if len(page_counts) > 0 else 1
+    shards = [[] for _ in range(n_shards)]
+    loads = [(0.0, k) for k in range(n_shards)]
+    for item in schedule_eins(items, page_counts, "longest_first"):
+        load, k = heapq.heappop(loads)
+        shards[k].append(item)
+        heapq.heappush(loads, (load + page_loads(item[1], page_counts, default), k))
+    return [sorted(shard) for shard in shards]
+
+
+def estimate_seconds(
+    items: List[EinItem],
+    page_counts: Dict[str, int],
+    workers: int = 1,
+    seconds_per_page: float = DEFAULT_SECONDS_PER_PAGE,
+) -> float:
+    """Estimate how long scraping EINs in the given order will take
+    Workers take EINs from the front of the list as they become free, as fd_scrape's queue does.
+    Args:
+        items: (ein number, ein, company name) of each EIN, in the order they'll be scraped
+        page_counts: ein -> number of results pages (see read_manifest)
+        workers: number of browser sessions scraping at once
+        seconds_per_page: time each worker takes per page load
+    Returns:
+        estimated seconds until the last EIN is done
+    """
+    default = statistics.median(page_counts.values()) if len(page_counts) > 0 else 1
+    finish_times = [0.0] * workers
+    for item in items:
+        start = heapq.heappop(finish_times)
+        heapq.heappush(
+            finish_times,
+            start + seconds_per_page * page_loads(item[1], page_counts, default),
+        )
+    return max(finish_times)
+
+
+def log_schedule(
+    items: List[EinItem],
+    page_counts: Dict[str, int],
+    workers: int,
+    seconds_per_page: float,
+):
+    """Report the work ahead and its estimated time"""
+    n_counted = sum(1 for item in items if str(item[1]) in page_counts)
+    eta_hours = estimate_seconds(items, page_counts, workers, seconds_per_page) / 3600
+    logging.info(
+        " %s EINs to scrape (%s with known page counts, %s pages); ETA %.1f h with %s worker(s) at %.1f s/page",
+        str(len(items)),
+        str(n_counted),
+        str(sum(page_counts.get(str(item[1]), 0) for item in items)),
+        eta_hours,
+        str(workers),
+        seconds_per_page,
+    )
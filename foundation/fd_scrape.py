@@ -1,11 +1,16 @@
 """This command-line script searches Foundation Directory grants for a list of foundations specified in fd_config.yml
 To use:
 > python3 [path/to/this/file] --config [path/to/fd_config.yml] --output_dir [path/to/dir/for/csv/outputs]
+To scrape with several independently logged-in browser sessions at once, add --workers [N]
+To pick up an interrupted run where it left off, add --resume
 """
 
 # pylint: disable = broad-exception-caught, bare-except
 import logging
+import queue
+import threading
 from pathlib import Path
+from typing import Dict, List, Tuple, Union
 
 import click
 import pandas as pd
@@ -19,14 +24,209 @@ from utils.io import yaml_to_dict
 
 logging.basicConfig(level=logging.INFO)
 
+from projects.foundation.fd_batch_utils import batch_items
+from projects.foundation.fd_cache_utils import query_key
+from projects.foundation.fd_rate_utils import start_rate_governor
+from projects.foundation.fd_schedule_utils import (
+    DEFAULT_SECONDS_PER_PAGE,
+    log_schedule,
+    read_grantmakers,
+    read_manifest,
+    schedule_eins,
+)
 from projects.foundation.fd_scrape_utils import (
-    count_table_pages,
+    clean_company_name,
     get_web_driver,
-    login_to_foundation_directory,
-    perform_initial_search,
-    scrape_table_pages,
+    open_journal,
+    recycle_driver,
+    scrape_batch,
+    scrape_ein,
+    scrape_worker,
+    start_session,
     write_ein_list,
 )
+from projects.foundation.fd_status_utils import (
+    eins_with_status,
+    known_empty,
+    read_statuses,
+    start_status_store,
+    status_store_path,
+)
+from projects.foundation.fd_telemetry_utils import start_telemetry
+
+
+def write_ein_results(
+    config_info: dict,
+    output_dir: str,
+    eins_with_no_results_list: list,
+    eins_with_more_than_100_results: list,
+):
+    """Report the EINs without results and the EINs with more than 100 table pages, and write the
+    lists of them that the status store holds for this query (from this run and earlier ones)
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the ein lists will be written
+        eins_with_no_results_list: EINs for which the search returned no grants
+        eins_with_more_than_100_results: EINs for which the results table had >100 pages
+    Returns:
+        None
+    """
+    logging.info(
+        "Completed searches for all EINs listed. The EINs listed below had no grant results: %s",
+        eins_with_no_results_list,
+    )
+    logging.info(
+        "Completed searches for all EINs listed. The EINs listed below had >100 table pages: %s",
+        eins_with_more_than_100_results,
+    )
+    statuses = read_statuses(
+        status_store_path(config_info, output_dir), query_key(config_info["target_url"])
+    )
+    write_ein_list(
+        eins_with_status(statuses, "more_than_100"),
+        Path(output_dir) / Path(config_info["more_than_100"]),
+    )
+    write_ein_list(
+        eins_with_status(statuses, "no_results"),
+        Path(output_dir) / Path(config_info["no_grants_for_ein"]),
+    )
+
+
+def finished_eins(
+    config_info: dict, journal: dict, statuses: Dict[str, dict]
+) -> Dict[str, str]:
+    """Statuses of the EINs in the config that don't need to be scraped in this run
+    Args:
+        config_info: configuration settings read in from fd_config.yml; with recheck_empty_days,
+            EINs found to have no grants longer ago than that many days are searched again
+        journal: progress for each EIN recorded by earlier runs (see open_journal)
+        statuses: latest status of each EIN in the status store (see start_status_store)
+    Returns:
+        dictionary of ein -> status, for EINs the journal marks finished or known to have no grants
+    """
+    empty = known_empty(statuses, config_info.get("recheck_empty_days"))
+    finished = {}
+    for nonprofit in config_info["eins"]:
+        ein = list(nonprofit.values())[0]
+        status = journal.get(str(ein), {}).get("status")
+        if status is not None:
+            finished[ein] = status
+        elif str(ein) in empty:
+            finished[ein] = "no_results"
+    return finished
+
+
+def scheduled_eins(
+    config_info: dict, output_dir: str, finished: Dict[str, str], workers: int
+) -> Tuple[
+    List[Union[Tuple[int, str, str], List[Tuple[int, str, str]]]], Dict[str, List[str]]
+]:
+    """List the EINs left to scrape in the order set by schedule in the config, and report an ETA
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the page-count manifest is kept
+        finished: EINs that don't need to be scraped (see finished_eins)
+        workers: number of browser sessions that will scrape the EINs
+    Returns:
+        items: (ein number, ein, company_name) of each unfinished EIN, in scraping order, with
+            lists of them in place of EINs to be searched together (if batch_size is set)
+        grantmakers: ein -> grantmaker names in its results, for splitting batched searches
+    """
+    items = [
+        (i, list(nonprofit.values())[0], clean_company_name(list(nonprofit.keys())[0]))
+        for i, nonprofit in enumerate(config_info["eins"])
+        if list(nonprofit.values())[0] not in finished
+    ]
+
+    # page counts from the fd_count_pages.py pre-pass, if it was run for this query
+    manifest_path = Path(output_dir) / Path(
+        config_info.get("manifest", "fd_page_manifest.jsonl")
+    )
+    page_counts = read_manifest(manifest_path, query_key(config_info["target_url"]))
+    items = schedule_eins(items, page_counts, config_info.get("schedule", "config"))
+    log_schedule(
+        items,
+        page_counts,
+        workers,
+        config_info.get("seconds_per_page", DEFAULT_SECONDS_PER_PAGE),
+    )
+
+    # small EINs whose grantmaker names are known can be searched several at a time
+    grantmakers = read_grantmakers(manifest_path, query_key(config_info["target_url"]))
+    n_items = len(items)
+    items = batch_items(items, page_counts, grantmakers, config_info)
+    if len(items) < n_items:
+        logging.info(
+            " Searching small EINs together: %s searches instead of %s",
+            str(len(items)),
+            str(n_items),
+        )
+    return items, grantmakers
+
+
+def fd_scrape_parallel(config_info: dict, output_dir: str, workers: int, resume: bool):
+    """Scrape all EINs in the configuration using several browser sessions that share one work queue
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the foundation-grant csvs will be written
+        workers: number of browser sessions (threads) to run
+        resume: if True, skip EINs (and pages) that the checkpoint journal marks as finished
+    Returns:
+        None
+    """
+    journal_path, journal = open_journal(config_info, output_dir, resume)
+    start_telemetry(config_info, output_dir)
+    start_rate_governor(config_info)
+
+    statuses = start_status_store(config_info, output_dir)
+
+    # each worker appends EINs to these lists as it finishes them
+    results = {"scraped": [], "no_results": [], "more_than_100": [], "failed": []}
+    results_lock = threading.Lock()
+
+    # skip EINs that an earlier run finished, or found to have no grants
+    finished = finished_eins(config_info, journal, statuses)
+    for ein, status in finished.items():
+        results[status].append(ein)
+
+    # with longest_first, each worker that frees up takes the longest EIN left
+    ein_queue = queue.Queue()
+    ein_items, grantmakers = scheduled_eins(config_info, output_dir, finished, workers)
+    for item in ein_items:
+        ein_queue.put(item)
+
+    threads = [
+        threading.Thread(
+            target=scrape_worker,
+            name=f"fd_worker_{n + 1}",
+            args=(n + 1, config_info, ein_queue, output_dir, results, results_lock),
+            kwargs={
+                "journal_path": journal_path,
+                "journal": journal,
+                "grantmakers": grantmakers,
+            },
+        )
+        for n in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # EINs handed back by workers whose browsers died after the other workers finished
+    while not ein_queue.empty():
+        item = ein_queue.get_nowait()
+        for _, ein, _ in item if isinstance(item, list) else [item]:
+            results["failed"].append(ein)
+
+    if len(results["failed"]) > 0:
+        logging.warning(
+            "❌ The EINs listed below could not be scraped: %s", results["failed"]
+        )
+
+    write_ein_results(
+        config_info, output_dir, results["no_results"], results["more_than_100"]
+    )
 
 
 # Function below is what is executed at the command line
@@ -42,60 +242,114 @@ from projects.foundation.fd_scrape_utils import (
     required=False,
     default=".",
 )
-def fd_scrape(config: str, output_dir: str):
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    required=False,
+    default=1,
+)
+@click.option("--resume", is_flag=True, default=False)
+def fd_scrape(config: str, output_dir: str, workers: int, resume: bool):
     """For a set of EINs, scrapes grant results from foundation
     Args:
         config: Path to configuration yml file
         output_dir: path to the directory where the foundation-grant csvs will be written
+        workers: number of browser sessions pulling EINs from a shared work queue
+        resume: if set, continue from the checkpoint journal left by an interrupted run
     Returns:
         None
     """
     # read configuration details from configuration yaml specified at command line
     config_info = yaml_to_dict(config)
+    if config_info.get("export", False) and not config_info.get("export_selector"):
+        raise ValueError(
+            "export needs export_selector: the css selector of FD's download control on the"
+            " search results page"
+        )
+
+    if workers > 1:
+        fd_scrape_parallel(config_info, output_dir, workers, resume)
+        return
+
+    journal_path, journal = open_journal(config_info, output_dir, resume)
+    start_telemetry(config_info, output_dir)
+    start_rate_governor(config_info)
+    statuses = start_status_store(config_info, output_dir)
 
-    driver = get_web_driver()
+    driver = get_web_driver(config_info)
 
-    driver = login_to_foundation_directory(driver, config_info)
+    # log in (and, in http fetch mode, make an http session with the browser's cookies)
+    session = start_session(driver, config_info)
 
     # initialize lists for tracking empty-result EINs and EINs with more than 100 result pages
     eins_with_no_results_list = []
     eins_with_more_than_100_results = []
 
-    # iterate through eins from configuration file
-    for i, nonprofit in enumerate(config_info["eins"]):
-        ein = list(nonprofit.values())[0]
-        company_name = (
-            list(nonprofit.keys())[0]
-            .replace(" ", "_")
-            .replace(".", "")
-            .replace("(", "")
-            .replace(")", "")
-            .lower()
-        )
-        logging.info(
-            " >>>>> Working on ein number %s (%s) for %s",
-            str(i + 1),
-            str(ein),
-            company_name,
-        )
-        try:
-            driver = perform_initial_search(driver, config_info, ein)
+    # skip EINs that an earlier run finished, or found to have no grants
+    finished = finished_eins(config_info, journal, statuses)
+    for ein, status in finished.items():
+        if status == "more_than_100":
+            eins_with_more_than_100_results.append(ein)
+        elif status == "no_results":
+            eins_with_no_results_list.append(ein)
 
-            total_number_of_pages = count_table_pages(driver)
+    # EIN to be scraped after each one, so its search can be prefetched (batches aren't)
+    ein_items, grantmakers = scheduled_eins(
+        config_info, output_dir, finished, workers=1
+    )
+    next_eins = {
+        item[1]: next_item[1]
+        for item, next_item in zip(ein_items, ein_items[1:])
+        if isinstance(item, tuple) and isinstance(next_item, tuple)
+    }
+    prefetched = {}
 
-            if total_number_of_pages > 100:
-                eins_with_more_than_100_results.append(ein)
-            elif total_number_of_pages > 0:
-                big_df = scrape_table_pages(
-                    driver, config_info, ein, total_number_of_pages
+    # iterate through eins from configuration file, in the scheduled order
+    for item in ein_items:
+        try:
+            if isinstance(item, list):
+                ein = ", ".join(str(batch_item[1]) for batch_item in item)
+                logging.info(
+                    " >>>>> Working on a batch of %s EINs (%s)", str(len(item)), ein
                 )
-                big_df.to_csv(
-                    Path(output_dir)
-                    / Path(f"{company_name}_{ein}{config_info['suffix']}"),
-                    index=False,
+                item_statuses = scrape_batch(
+                    driver,
+                    config_info,
+                    item,
+                    grantmakers,
+                    output_dir,
+                    journal_path=journal_path,
+                    journal=journal,
+                    session=session,
                 )
             else:
-                eins_with_no_results_list.append(ein)
+                i, ein, company_name = item
+                logging.info(
+                    " >>>>> Working on ein number %s (%s) for %s",
+                    str(i + 1),
+                    str(ein),
+                    company_name,
+                )
+                item_statuses = {
+                    ein: scrape_ein(
+                        driver,
+                        config_info,
+                        ein,
+                        company_name,
+                        output_dir,
+                        journal_path=journal_path,
+                        journal=journal,
+                        session=session,
+                        next_ein=next_eins.get(ein),
+                        prefetched=prefetched,
+                    )
+                }
+
+            for scraped_ein, status in item_statuses.items():
+                if status == "more_than_100":
+                    eins_with_more_than_100_results.append(scraped_ein)
+                elif status == "no_results":
+                    eins_with_no_results_list.append(scraped_ein)
 
         except (TimeoutException, NoSuchElementException) as selenium_error:
             logging.warning(
@@ -128,24 +382,24 @@ def fd_scrape(config: str, output_dir: str):
             logging.exception("❌ An unexpected error occurred for EIN %s: %s", ein, e)
             break
 
-    logging.info(
-        "Completed searches for all EINs listed. The EINs listed below had no grant results.",
-        *eins_with_no_results_list,
-    )
-    logging.info(
-        "Completed searches for all EINs listed. The EINs listed below had >100 table pages.",
-        *eins_with_more_than_100_results,
-    )
-    write_ein_list(
-        eins_with_more_than_100_results,
-        Path(output_dir) / Path(config_info["more_than_100"]),
-    )
-    write_ein_list(
+        try:
+            driver, session = recycle_driver(driver, session, config_info)
+        except Exception as recycle_error:
+            # the EINs not yet scraped are picked up by a --resume run
+            logging.critical("❌ Could not replace the browser: %s", recycle_error)
+            break
+
+    write_ein_results(
+        config_info,
+        output_dir,
         eins_with_no_results_list,
-        Path(output_dir) / Path(config_info["no_grants_for_ein"]),
+        eins_with_more_than_100_results,
     )
 
-    driver.quit()
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass  # the browser was already quit when recycling failed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+"""This command-line script benchmarks fd_scrape.py end to end against a local stand-in FD server
+It starts fd_fake_server.py in the background, writes an fd_config.yml that points at it, runs
+fd_scrape.py (Chrome and all), checks every EIN's csv against the grants the server lists, and
+reports elapsed time, pages per hour, and the telemetry summary for each phase of the scrape.
+To use:
+> python3 [path/to/this/file] --eins 20 --workers 2 --latency 0.3 --challenge_rate 0.01 --fetch_mode http
+"""
+
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import pandas as pd
+
+from projects.foundation.fd_fake_server import (
+    LOGIN_PATH,
+    SEARCH_PATH,
+    search_grants,
+    start_fake_fd_server,
+)
+from projects.foundation.fd_query_utils import get_query_params
+from projects.foundation.fd_scrape import fd_scrape
+from projects.foundation.fd_scrape_utils import clean_company_name, grant_csv_path
+from projects.foundation.fd_telemetry_utils import (
+    pages_per_hour,
+    read_telemetry,
+    summarize_telemetry,
+)
+from utils.io import dict_to_yaml
+
+logging.basicConfig(level=logging.INFO)
+
+# first EIN of the synthetic grantmakers scraped by the benchmark
+FIRST_EIN = 100000000
+
+
+def benchmark_config(
+    base_url: str, n_eins: int, fetch_mode: str, parser: str, export: bool = False
+) -> dict:
+    """fd_config.yml settings that scrape n_eins synthetic grantmakers from the stand-in server"""
+    filters = (
+        "amount_min=%240&amount_max=%2410%2C000%2C000%2C000&year_min=2003&year_max=2025"
+    )
+    return {
+        "username": "benchmark",
+        "password": "benchmark",
+        "login_url": base_url + LOGIN_PATH,
+        "target_url": f"{base_url}{SEARCH_PATH}?collection=grants&_new_search=1&{filters}",
+        "page_url": f"{base_url}{SEARCH_PATH}?collection=grants&{filters}",
+        "suffix": "_grants.csv",
+        "more_than_100": "eins_with_more_than_100_pages.yml",
+        "no_grants_for_ein": "eins_without_grants.yml",
+        "journal": "fd_scrape_journal.jsonl",
+        "telemetry": "fd_scrape_telemetry.jsonl",
+        "wait_seconds": 60,
+        "page_limit": 100,
+        "partition": True,
+        "parser": parser,
+        "parse_queue_size": 2,
+        "fetch_mode": fetch_mode,
+        "http_timeout": 30,
+        "export": export,
+        "export_selector": "a.export-grants",
+        "eins": [
+            {f"benchmark_grantmaker_{i}": str(FIRST_EIN + i)} for i in range(n_eins)
+        ],
+    }
+
+
+def check_outputs(config_info: dict, output_dir: str, seed: int) -> int:
+    """Compare the number of grants in each EIN's csv with the number the stand-in server lists
+    Returns:
+        number of EINs whose csv doesn't match
+    """
+    query = get_query_params(config_info["target_url"])
+    mismatches = 0
+    for nonprofit in config_info["eins"]:
+        company_name, ein = list(nonprofit.items())[0]
+        expected = len(search_grants(dict(query, ein=ein), seed))
+        csv_path = grant_csv_path(
+            config_info, output_dir, clean_company_name(company_name), ein
+        )
+        found = len(pd.read_csv(csv_path)) if csv_path.exists() else 0
+        if found != expected:
+            mismatches += 1
+            logging.warning(
+                " ❌ EIN %s: %s grants scraped, %s listed", ein, found, expected
+            )
+    return mismatches
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option("--eins", type=click.IntRange(min=1), required=False, default=20)
+@click.option("--workers", type=click.IntRange(min=1), required=False, default=1)
+@click.option("--latency", type=float, required=False, default=0.0)
+@click.option("--challenge_rate", type=float, required=False, default=0.0)
+@click.option(
+    "--fetch_mode",
+    type=click.Choice(["browser", "http"]),
+    required=False,
+    default="browser",
+)
+@click.option("--parser", type=str, required=False, default="targeted")
+@click.option("--export", is_flag=True, default=False)
+@click.option("--seed", type=int, required=False, default=0)
+@click.option(
+    "--output_dir",
+    type=click.Path(file_okay=False, dir_okay=True),
+    required=False,
+    default=None,
+)
+def scrape_benchmark(
+    eins: int,
+    workers: int,
+    latency: float,
+    challenge_rate: float,
+    fetch_mode: str,
+    parser: str,
+    export: bool,
+    seed: int,
+    output_dir: str,
+):
+    """Run fd_scrape.py against the stand-in FD server and report its throughput
+    Args:
+        eins: number of synthetic grantmakers to scrape
+        workers: number of browser sessions (fd_scrape --workers)
+        latency: seconds the server adds to every response
+        challenge_rate: chance that the server answers a results page with a challenge
+        fetch_mode: browser or http (see fd_config.yml)
+        parser: results-table parser backend (see fd_parse_utils.py)
+        export: if set, grants are downloaded with the export link instead of scraped page by page
+        seed: seed of the synthetic grants and challenges
+        output_dir: where the csvs, journal and telemetry go (a new temporary directory if not given)
+    Returns:
+        None
+    """
+    if output_dir is None:
+        output_dir = tempfile.mkdtemp(prefix="fd_scrape_benchmark_")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    server = start_fake_fd_server(
+        latency=latency, challenge_rate=challenge_rate, seed=seed
+    )
+    config_info = benchmark_config(server.base_url, eins, fetch_mode, parser, export)
+    config_path = Path(output_dir) / "fd_benchmark_config.yml"
+    dict_to_yaml(config_info, config_path)
+    logging.info(
+        " Stand-in FD server at %s; writing to %s", server.base_url, output_dir
+    )
+
+    start = time.perf_counter()
+    try:
+        fd_scrape.main(
+            [
+                "--config",
+                str(config_path),
+                "--output_dir",
+                output_dir,
+                "--workers",
+                str(workers),
+            ],
+            standalone_mode=False,
+        )
+    finally:
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+    mismatches = check_outputs(config_info, output_dir, seed)
+    logging.info(
+        " Scraped %s EINs in %.1f s: %s results pages and %s exports served, %s challenges, %s logins, %s EINs mismatched",
+        str(eins),
+        elapsed,
+        str(server.stats["pages"]),
+        str(server.stats["exports"]),
+        str(server.stats["challenges"]),
+        str(server.stats["logins"]),
+        str(mismatches),
+    )
+    logging.info(
+        " %.0f results pages per hour (server count)",
+        3600 * server.stats["pages"] / elapsed,
+    )
+
+    events = read_telemetry(Path(output_dir) / config_info["telemetry"])
+    logging.info(" %.0f pages per hour (telemetry)", pages_per_hour(events))
+    logging.info("\n%s", summarize_telemetry(events).round(3).to_string())
+
+
+if __name__ == "__main__":
+    scrape_benchmark()
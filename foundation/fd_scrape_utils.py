@@ -1,28 +1,112 @@
 """Bespoke utility funcitons for the fd_scrape.py command-line web scraper for Foundation Directory"""
 
 # pylint: disable = broad-exception-caught, bare-except, raise-missing-from
+import json
 import logging
-import math
 import os
-import re
+import queue
+import threading
 import time
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
 
 import pandas as pd
-from bs4 import BeautifulSoup
+import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+from urllib3.util.retry import Retry
 from webdriver_manager.chrome import ChromeDriverManager
 
-from utils.io import dict_to_yaml, yaml_to_dict
+from projects.foundation.fd_batch_utils import batch_ein_param, split_batch
+from projects.foundation.fd_cache_utils import cache_page, record_searches
+from projects.foundation.fd_export_utils import download_dir, export_grants
+from projects.foundation.fd_parse_utils import (
+    CHALLENGE_SELECTOR,
+    RESULT_COLUMNS,
+    count_pages_in_html,
+    is_challenge_page,
+    is_results_page,
+    parse_results_page,
+)
+from projects.foundation.fd_query_utils import (
+    merge_slice_csvs,
+    query_bounds,
+    query_slice,
+    split_bounds,
+)
+from projects.foundation.fd_rate_utils import (
+    acquire_request,
+    report_challenge,
+    report_success,
+)
+from projects.foundation.fd_status_utils import record_status
+from projects.foundation.fd_telemetry_utils import (
+    PAGE_PHASE,
+    note_captcha,
+    record_event,
+    timed,
+)
+from utils.io import dict_to_yaml
 
 logging.basicConfig(level=logging.INFO)
 
+# serializes journal appends from concurrent scrape workers
+_JOURNAL_LOCK = threading.Lock()
+
+# seconds that FD search results take to show up after a page load, smoothed over recent pages
+_LOAD_TIME = {"expected": 1.0}
+_LOAD_TIME_LOCK = threading.Lock()
+LOAD_TIME_SMOOTHING = 0.2
+MIN_POLL_SECONDS = 0.02
+MAX_POLL_SECONDS = 0.5
+# longest a patient wait goes on without results or a challenge before giving up on the page
+MAX_PATIENT_SECONDS = 300
+
+# url patterns the lightweight browser doesn't download: images, fonts, and third-party trackers
+# (Cloudflare's challenge scripts must stay reachable). Override with blocked_urls in the config.
+BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.svg",
+    "*.webp",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+]
+
+# browser page loads by each thread's driver since it logged in (see recycle_driver)
+_DRIVER_PAGES = threading.local()
+
+# whether FD's answer to a batch search has matched the manifest yet this run, or failed to before
+# any did (batching is then turned off for the rest of the run; see scrape_batch)
+_BATCH_CHECK = {"verified": False, "failed": False}
+_BATCH_CHECK_LOCK = threading.Lock()
+
+# fetches the next EIN's initial search over http while the current EIN finishes (see prefetch)
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fd_prefetch")
+
 
 def play_ding():
     """Plays a ding on a Mac -- used to alert the user to handle a Cloudfare 'human test'"""
@@ -47,7 +131,7 @@ def wait_for_human_verification(driver, timeout=120):
     # Wait for the challenge to be removed (checkbox disappears)
     try:
         WebDriverWait(driver, timeout).until_not(
-            EC.presence_of_element_located((By.CLASS_NAME, "cb-c"))
+            EC.presence_of_element_located((By.CSS_SELECTOR, CHALLENGE_SELECTOR))
         )
 
     except TimeoutException:
@@ -55,109 +139,480 @@ def wait_for_human_verification(driver, timeout=120):
     # input("🔓 Press Enter when the verification has passed and page is fully loaded..."
 
 
-def get_web_driver() -> webdriver:
+def get_web_driver(config_info: dict = None) -> webdriver:
     """Configure a Chrome web driver for navigating FD dashboard
     Args:
-        None
+        config_info: configuration settings read in from fd_config.yml; with lightweight set, the
+            browser skips images, fonts and third-party scripts (see BLOCKED_URLS), and with
+            headless set it runs without a window
     Returns:
         driver: chrome web driver configured for FD querying purpose
     """
+    if config_info is None:
+        config_info = {}
+
     # Add a download directory for chrome if it doesn't exist
-    download_dir = os.path.join(os.getcwd(), "downloads")
-    os.makedirs(download_dir, exist_ok=True)
+    downloads = str(download_dir(config_info))
+    os.makedirs(downloads, exist_ok=True)
 
     # --- Configure Chrome to auto-download CSV ---
     options = Options()
     options.add_experimental_option(
         "prefs",
         {
-            "download.default_directory": download_dir,
+            "download.default_directory": downloads,
             "download.prompt_for_download": False,
             "download.directory_upgrade": True,
             "safebrowsing.enabled": True,
         },
     )
-    options.add_argument("--start-maximized")
+    if config_info.get("headless", False):
+        # only sensible when no human verification is expected: nobody can click the checkbox
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+    else:
+        options.add_argument("--start-maximized")
+    if config_info.get("lightweight", False):
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--mute-audio")
+        options.add_argument("--no-first-run")
+        # hand the page over once its html is parsed; wait_for_results checks for the results
+        options.page_load_strategy = "eager"
 
     driver = webdriver.Chrome(
         service=Service(ChromeDriverManager().install()), options=options
     )
+
+    if config_info.get("lightweight", False):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs",
+            {"urls": config_info.get("blocked_urls", BLOCKED_URLS)},
+        )
     return driver
 
 
-def scrape_table_pages(
-    driver: webdriver, config_info: dict, ein: int, max_page: int
-) -> pd.DataFrame:
-    """Compile all table-page results into a single dataframe
+def start_session(driver: webdriver, config_info: dict) -> requests.Session:
+    """Log a new browser in to FD and, in http fetch mode, make an http session with its cookies
+    Args:
+        driver: newly started webdriver (see get_web_driver)
+        config_info: configuration settings read in from fd_config.yml
+    Returns:
+        session: requests session for http fetch mode, or None in browser fetch mode
+    """
+    login_to_foundation_directory(driver, config_info)
+    _DRIVER_PAGES.count = 0
+
+    # optionally fetch results pages over http, reusing the logged-in browser's cookies
+    if config_info.get("fetch_mode", "browser") == "http":
+        return get_http_session(driver, config_info)
+    return None
+
+
+def count_driver_page():
+    """Count a page load by the current thread's browser (see recycle_driver)"""
+    _DRIVER_PAGES.count = getattr(_DRIVER_PAGES, "count", 0) + 1
+
+
+def recycle_driver(
+    driver: webdriver, session: requests.Session, config_info: dict
+) -> Tuple[webdriver, requests.Session]:
+    """Swap the browser for a fresh, logged-in one once it has loaded recycle_pages pages
+    Chrome's memory grows with every page it loads; a new browser starts small again.
+    Args:
+        driver: this thread's logged-in webdriver
+        session: its http session (None in browser fetch mode)
+        config_info: configuration settings read in from fd_config.yml
+    Returns:
+        driver and session to use from now on (the same ones if it isn't time to recycle)
+    """
+    recycle_pages = config_info.get("recycle_pages")
+    if not recycle_pages or getattr(_DRIVER_PAGES, "count", 0) < recycle_pages:
+        return driver, session
+
+    logging.info(" Recycling the browser after %s page loads", str(_DRIVER_PAGES.count))
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass  # a browser that's already gone is as good as quit
+
+    driver = get_web_driver(config_info)
+    try:
+        session = start_session(driver, config_info)
+    except:
+        driver.quit()
+        raise
+    return driver, session
+
+
+def load_results_page(
+    driver: webdriver,
+    url: str,
+    ein: int = None,
+    page: int = None,
+    acquire: bool = True,
+) -> str:
+    """Load an FD results page in the browser, waiting out any human verification
     Args:
         driver: webdriver with open, logged in browsing session on FD website
-        config_info: dictionary with configuration settings read in from fd_config.yml
-        ein: EIN of the foundation that is currently being interrogated
-        max_page: total number of pages into which results table is split
+        url: address of the results page
+        ein: EIN the page belongs to (recorded in telemetry)
+        page: page number of the results table (recorded in telemetry)
+        acquire: if False, the caller already took this page's turn from the rate governor
     Returns:
-        pandas dataframe containing compiled grant results
+        html of the loaded page
     """
-    df_list = []
+    if acquire:
+        acquire_request(ein=ein, page=page)
+    with timed("page_get", ein=ein, page=page):
+        driver.get(url)
+    count_driver_page()
 
-    for p in range(1, max_page + 1):
-        driver.get(config_info["page_url"] + f"&ein={ein}&page={p}")  # + f"{p}")
+    # Wait for  content to confirm the page loaded
+    with timed("page_wait", ein=ein, page=page):
+        wait_for_results(driver, 5, ein=ein, page=page, patient=True)
 
-        # Wait for  content to confirm the page loaded
-        while True:
-            try:
-                WebDriverWait(driver, 5).until(
-                    EC.presence_of_element_located((By.ID, "search-results-container"))
-                )
+    return driver.page_source
 
-                break
-            except TimeoutException:
+
+def page_state(driver: webdriver) -> str:
+    """What the browser is showing, judged from the markup of its current page
+    Args:
+        driver: webdriver instance
+    Returns:
+        'results' (FD search results), 'challenge' (Cloudflare human verification), or 'loading'
+    """
+    if len(driver.find_elements(By.ID, "search-results-container")) > 0:
+        return "results"
+    if len(driver.find_elements(By.CSS_SELECTOR, CHALLENGE_SELECTOR)) > 0:
+        return "challenge"
+    return "loading"
+
+
+def record_load_time(seconds: float):
+    """Fold one observed wait for search results into the expected wait (see wait_for_results)"""
+    with _LOAD_TIME_LOCK:
+        _LOAD_TIME["expected"] += LOAD_TIME_SMOOTHING * (
+            seconds - _LOAD_TIME["expected"]
+        )
+
+
+def wait_for_results(
+    driver: webdriver,
+    timeout: float,
+    ein: int = None,
+    page: int = None,
+    patient: bool = False,
+):
+    """Poll the browser until it shows FD search results, handling challenges as soon as they appear
+    Polls tightly at first, backing off toward a quarter of the wait seen for earlier pages (at
+    most MAX_POLL_SECONDS between polls), and returns as soon as the results are there.
+    Args:
+        driver: webdriver that has just been sent to an FD search page
+        timeout: seconds to wait for results (or a challenge) to show up
+        ein: EIN the page belongs to (recorded in telemetry)
+        page: page number of the results table (recorded in telemetry)
+        patient: if True, a page that shows neither results nor a challenge within timeout is
+            logged and recorded as a slow_load telemetry event (not as a challenge, so the request
+            rate isn't cut), the user is alerted as for a challenge, and the wait goes on for up
+            to MAX_PATIENT_SECONDS; otherwise a TimeoutException is raised right away
+    Returns:
+        None
+    Raises:
+        TimeoutException: if the page shows neither results nor a challenge in time
+    """
+    expected = _LOAD_TIME["expected"]
+    start = time.perf_counter()
+    # start of the wait that the patience limit applies to (since the last challenge)
+    waiting_since = start
+    deadline = start + timeout
+    interval = max(MIN_POLL_SECONDS, expected / 20)
+    challenged = False
+    while True:
+        state = page_state(driver)
+        if state == "results":
+            # waits that include a human verification say nothing about FD's load times
+            if not challenged:
+                record_load_time(time.perf_counter() - start)
+                report_success()
+            return
+
+        if state == "challenge":
+            note_captcha()
+            report_challenge()
+            with timed("verification", ein=ein, page=page):
                 play_ding()
                 wait_for_human_verification(driver)
-                time.sleep(5)
+            challenged = True
+            waiting_since = time.perf_counter()
+            deadline = waiting_since + timeout
+            interval = MIN_POLL_SECONDS
+            continue
+
+        if time.perf_counter() > deadline:
+            waited = time.perf_counter() - waiting_since
+            if not patient or waited > MAX_PATIENT_SECONDS:
+                raise TimeoutException(
+                    f"FD search results did not load within {round(waited)} seconds"
+                )
+            # only slow: no challenge was seen, so the request rate is left alone, but the user
+            # is alerted in case the page needs them
+            logging.warning(
+                " ! EIN %s page %s still loading after %s seconds; waiting on",
+                str(ein),
+                str(page),
+                str(round(waited, 1)),
+            )
+            record_event("slow_load", waited, ein=ein, page=page)
+            with timed("verification", ein=ein, page=page):
+                play_ding()
+                wait_for_human_verification(driver)
+            challenged = True
+            deadline = time.perf_counter() + timeout
+            interval = MIN_POLL_SECONDS
+            continue
+        time.sleep(interval)
+        interval = min(
+            interval * 1.5, MAX_POLL_SECONDS, max(MIN_POLL_SECONDS, expected / 4)
+        )
+
+
+def get_http_session(driver: webdriver, config_info: dict) -> requests.Session:
+    """Make a pooled http session that carries the logged-in browser's cookies and user agent
+    Args:
+        driver: webdriver with open, logged in browsing session on FD website
+        config_info: dictionary with configuration settings read in from fd_config.yml
+    Returns:
+        session: requests session that FD treats like the browser session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 504]),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # cloudflare ties its clearance cookie to the user agent that earned it
+    session.headers.update(
+        {
+            "User-Agent": driver.execute_script("return navigator.userAgent;"),
+            "Referer": config_info["target_url"],
+        }
+    )
+    copy_driver_cookies(driver, session)
+    return session
+
 
+def copy_driver_cookies(driver: webdriver, session: requests.Session):
+    """Copy (or refresh) the browser's cookies into the http session
+    Args:
+        driver: webdriver with open, logged in browsing session on FD website
+        session: requests session that fetches FD pages over http
+    Returns:
+        None
+    """
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
+
+
+def fetch_results_page(
+    driver: webdriver,
+    url: str,
+    session: requests.Session = None,
+    timeout: int = 30,
+    ein: int = None,
+    page: int = None,
+) -> str:
+    """Get the html of an FD results page over http if possible, in the browser otherwise
+    Args:
+        driver: webdriver with open, logged in browsing session on FD website
+        url: address of the results page
+        session: if given, the page is first requested over http with this session
+        timeout: seconds to wait for the http response
+        ein: EIN the page belongs to (recorded in telemetry)
+        page: page number of the results table (recorded in telemetry)
+    Returns:
+        html of the results page
+    """
+    if session is None:
+        return load_results_page(driver, url, ein=ein, page=page)
+
+    acquire_request(ein=ein, page=page)
+    with timed("http_fetch", ein=ein, page=page):
+        try:
+            response = session.get(url, timeout=timeout)
+            if response.ok and is_results_page(response.text):
+                report_success()
+                return response.text
+            reason = f"status {response.status_code}"
+            if is_challenge_page(response.text):
+                note_captcha()
+                report_challenge()
+                reason = "a Cloudflare challenge"
+        except requests.exceptions.RequestException as http_error:
+            reason = str(http_error)
+
+    # let the browser handle the challenge, then pick up its fresh clearance cookies
+    logging.info(" http fetch got %s; loading page in the browser instead", reason)
+    html = load_results_page(driver, url, ein=ein, page=page, acquire=False)
+    copy_driver_cookies(driver, session)
+    return html
+
+
+def scrape_table_pages(
+    driver: webdriver,
+    config_info: dict,
+    ein: int,
+    max_page: int,
+    part_path: Path,
+    journal_path: Path = None,
+    progress: dict = None,
+    session: requests.Session = None,
+    first_page_html: str = None,
+    after_last_fetch: Callable[[], None] = None,
+) -> int:
+    """Scrape all table pages, appending each page's results to a csv as soon as it is parsed
+    Args:
+        driver: webdriver with open, logged in browsing session on FD website
+        config_info: dictionary with configuration settings read in from fd_config.yml
+        ein: EIN of the foundation that is currently being interrogated
+        max_page: total number of pages into which results table is split
+        part_path: csv to which the results are appended, page by page (see partial_csv_path)
+        journal_path: if given, each page appended to part_path is recorded in this checkpoint journal
+        progress: this search's progress from an earlier run's journal; its pages are not re-scraped
+        session: if given, pages are fetched over http with this session (see get_http_session)
+        first_page_html: html of the search's first page, if already loaded by the initial search
+        after_last_fetch: called once the last page has been fetched, while it is still being parsed
+    Returns:
+        number of pages fetched from FD
+    """
+    first_page = resume_partial_csv(part_path, progress)
+    if first_page > 1:
         logging.info(
-            "✅ Navigated to target search URL for page %s of %s!",
-            str(p),
+            " Pages 1-%s of %s already scraped into %s",
+            str(first_page - 1),
             str(max_page),
+            str(part_path),
         )
 
-        # get html for this page
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-
-        # find the results table and get the results row
-        results_table = soup.find("tbody", id="search-results-grants")
-        rows = results_table.find_all("tr")
-
-        visible_data = []
-
-        # assemble the data from each row of the reusults table into a dataframe
-        for row in rows:
-            cols = row.find_all("td")
-            if len(cols) < 9:
-                continue  # skip malformed rows
-
-            visible_data.append(
-                {
-                    "Grantmaker": cols[1].get_text(strip=True),
-                    "Recipient": cols[2].get_text(strip=True),
-                    "Recipient City": cols[3].get_text(strip=True),
-                    "Recipient State": cols[4].get_text(strip=True),
-                    "Recipient Country": cols[5].get_text(strip=True),
-                    "Primary Subject": cols[6].get_text(strip=True),
-                    "Year": cols[7].get_text(strip=True),
-                    "Grant Amount": cols[8].get_text(strip=True),
-                    "ein": ein,
-                    "search_result_page": p,
-                }
+    # futures of pages handed to the parse worker that haven't been checked yet
+    pending = []
+
+    # parse page p in the background while the browser loads page p + 1
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="fd_parse") as parser:
+        for p in range(first_page, max_page + 1):
+            # the initial search already loaded the first page: don't load it again
+            if p == 1 and first_page_html is not None:
+                html = first_page_html
+            else:
+                with timed(PAGE_PHASE, ein=ein, page=p):
+                    html = fetch_results_page(
+                        driver,
+                        config_info["page_url"] + f"&ein={ein}&page={p}",
+                        session=session,
+                        timeout=config_info.get("http_timeout", 30),
+                        ein=ein,
+                        page=p,
+                    )
+
+            logging.info(
+                "✅ Navigated to target search URL for page %s of %s!",
+                str(p),
+                str(max_page),
+            )
+
+            pending.append(
+                parser.submit(
+                    process_results_page,
+                    config_info,
+                    ein,
+                    p,
+                    html,
+                    part_path,
+                    journal_path,
+                )
+            )
+
+            # bound the backlog of fetched-but-unparsed pages (and surface parse errors early)
+            backlog = [future for future in pending if not future.done()]
+            if len(backlog) > config_info.get("parse_queue_size", 2):
+                backlog[0].result()
+            for future in pending:
+                if future.done():
+                    future.result()
+            pending = [future for future in pending if not future.done()]
+
+        if after_last_fetch is not None:
+            after_last_fetch()
+
+        for future in pending:
+            future.result()
+
+    fetched = max_page - first_page + 1
+    if first_page == 1 and first_page_html is not None:
+        fetched -= 1
+    return max(fetched, 0)
+
+
+def process_results_page(
+    config_info: dict,
+    ein: int,
+    page: int,
+    html: str,
+    part_path: Path,
+    journal_path: Path = None,
+) -> int:
+    """Cache, parse, append to csv, and checkpoint one fetched results page
+    Args:
+        config_info: dictionary with configuration settings read in from fd_config.yml
+        ein: EIN of the foundation that is currently being interrogated
+        page: page number of the results table that html holds
+        html: page source of the results page
+        part_path: csv to which the page's results are appended
+        journal_path: if given, the appended page is recorded in this checkpoint journal
+    Returns:
+        number of grants on this page
+    """
+    # keep the raw page so a parser change can be applied later without re-scraping
+    if config_info.get("cache_dir") is not None:
+        with timed("cache", ein=ein, page=page):
+            cache_page(
+                config_info["cache_dir"], config_info["page_url"], ein, page, html
             )
 
-        visible_df = pd.DataFrame(visible_data)
+    # assemble the data from the rows of the results table into a dataframe
+    with timed("parse", ein=ein, page=page):
+        visible_df = parse_results_page(
+            html, ein, page, parser=config_info.get("parser", "bs4")
+        )
+
+    # append the page (with a header if it's the first) and make sure it's on disk
+    with timed("write", ein=ein, page=page):
+        with open(part_path, "ab") as part_file:
+            part_file.write(
+                visible_df.to_csv(index=False, header=part_file.tell() == 0).encode(
+                    "utf-8"
+                )
+            )
+            part_file.flush()
+            os.fsync(part_file.fileno())
+            offset = part_file.tell()
 
-        # append this table's dataframe into a list of all dfs for the foundation
-        df_list.append(visible_df)
+    # journal the page only once it's on disk, with the csv's length at the end of it
+    if journal_path is not None:
+        entry = {"ein": str(ein), "page": page, "offset": offset}
+        if config_info.get("query_slice") is not None:
+            entry["slice"] = config_info["query_slice"]
+        append_to_journal(journal_path, entry)
 
-    df = pd.concat(df_list)
-    return df
+    return len(visible_df)
 
 
 def login_to_foundation_directory(driver: webdriver, config_info: dict) -> webdriver:
@@ -216,74 +671,770 @@ def perform_initial_search(driver: webdriver, config_info: dict, ein: int) -> we
         webdriver with the results of the initial search
     """
     # Navigate to the target URL using the same session
-    driver.get(config_info["target_url"] + f"&ein={ein}")
+    acquire_request(ein=ein)
+    with timed("search_get", ein=ein):
+        driver.get(config_info["target_url"] + f"&ein={ein}")
+    count_driver_page()
 
     # Wait for some content to confirm the page loaded
-    WebDriverWait(driver, config_info["wait_seconds"]).until(
-        EC.presence_of_element_located((By.ID, "search-results-container"))
-    )
+    with timed("search_wait", ein=ein):
+        wait_for_results(driver, config_info["wait_seconds"], ein=ein)
 
     logging.info(" ✅ Navigated to target search URL!")
 
     return driver
 
 
-def count_table_pages(driver: webdriver) -> int:
+def count_table_pages(driver: webdriver, ein: int = None, html: str = None) -> int:
     """
     Get the total number of pages based on the number of results and results per page.
 
     Args:
         driver: webdriver instance
+        ein: EIN that was searched (recorded in telemetry)
+        html: page source of the initial search, if not the driver's current page (e.g., prefetched)
     Returns:
         total_number_of_pages: number pages into which the table is parsed
     """
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+    with timed("count_pages", ein=ein):
+        return count_pages_in_html(driver.page_source if html is None else html)
+
+
+def fetch_initial_search(
+    config_info: dict, ein: int, session: requests.Session
+) -> Union[str, None]:
+    """Get the initial search for an EIN over http
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN for the foundation to search
+        session: requests session with the logged-in browser's cookies (see get_http_session)
+    Returns:
+        html of the search results, or None if FD didn't answer with a results page
+    """
+    acquire_request(ein=ein)
+    with timed("search_prefetch", ein=ein):
+        try:
+            response = session.get(
+                config_info["target_url"] + f"&ein={ein}",
+                timeout=config_info.get("http_timeout", 30),
+            )
+        except requests.exceptions.RequestException:
+            return None
+        if response.ok and is_results_page(response.text):
+            report_success()
+            return response.text
+        if is_challenge_page(response.text):
+            note_captcha()
+            report_challenge()
+    return None
 
+
+def initial_search_html(
+    driver: webdriver,
+    config_info: dict,
+    ein: int,
+    prefetched: Dict[str, Future] = None,
+) -> str:
+    """Page source of the initial search for an EIN, taken from a prefetch if one was started
+    Args:
+        driver: webdriver with a logged-in session on the FD dashboard
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN for the foundation currently being interrogated
+        prefetched: EIN -> background fetch of its initial search (see scrape_ein's next_ein)
+    Returns:
+        html of the initial search
+    """
+    future = None if prefetched is None else prefetched.pop(str(ein), None)
+    if future is not None:
+        html = future.result()
+        if html is not None:
+            logging.info(" ✅ Using prefetched search for EIN %s", str(ein))
+            return html
+    # no prefetch, or it hit a challenge: search in the browser
+    return perform_initial_search(driver, config_info, ein).page_source
+
+
+def write_ein_list(ein_list: List[int], ein_filepath: str):
+    """writes a list of eins to a simple yaml file, replacing any earlier list there
+    Args:
+        ein_list: list of ein numbers to be written to a simple yaml (see fd_status_utils.py for
+            the store that accumulates them across runs)
+        ein_filepath: filepath where eins will be written
+    Returns:
+        None
+    """
+    dict_to_yaml({"eins": list(dict.fromkeys(ein_list))}, ein_filepath)
+
+
+def append_to_journal(journal_path: Path, entry: dict):
+    """Append one progress record to the checkpoint journal (one json object per line)
+    Args:
+        journal_path: path to the append-only checkpoint journal
+        entry: record to append, e.g. {'ein': '123456789', 'page': 3}
+    Returns:
+        None
+    """
+    with _JOURNAL_LOCK:
+        with open(journal_path, "a", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps(entry) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+
+def read_journal(journal_path: Path) -> Dict[str, dict]:
+    """Read the checkpoint journal into a summary of progress for each EIN
+    Args:
+        journal_path: path to the append-only checkpoint journal
+    Returns:
+        dictionary keyed by EIN (or checkpoint_key, for slices of a partitioned search) with
+        'total_pages', 'pages' (finished page -> length of the partial csv after it) and 'status'
+    """
+    progress = {}
+    if not journal_path.exists():
+        return progress
+
+    with open(journal_path, "r", encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # last line of a journal cut off by a crash
+                logging.warning(" Ignoring incomplete journal line: %s", line.strip())
+                continue
+            key = entry["ein"]
+            if "slice" in entry:
+                key = f"{entry['ein']}_{entry['slice']}"
+            ein_progress = progress.setdefault(
+                key, {"total_pages": None, "pages": {}, "status": None}
+            )
+            if "total_pages" in entry:
+                ein_progress["total_pages"] = entry["total_pages"]
+            if "page" in entry:
+                ein_progress["pages"][entry["page"]] = entry.get("offset")
+            if "status" in entry:
+                ein_progress["status"] = entry["status"]
+
+    return progress
+
+
+def open_journal(
+    config_info: dict, output_dir: str, resume: bool
+) -> Tuple[Path, Dict[str, dict]]:
+    """Locate the checkpoint journal and, when resuming, read the progress it records
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the journal is kept
+        resume: if True, keep the existing journal; otherwise start a new one
+    Returns:
+        journal_path: path to the checkpoint journal
+        journal: progress for each EIN recorded by earlier runs (empty if not resuming)
+    """
+    journal_path = Path(output_dir) / Path(
+        config_info.get("journal", "fd_scrape_journal.jsonl")
+    )
+    if not resume:
+        journal_path.unlink(missing_ok=True)
+        return journal_path, {}
+
+    journal = read_journal(journal_path)
+    logging.info(
+        " Resuming from %s: %s EINs finished, %s partially scraped",
+        str(journal_path),
+        str(sum(1 for p in journal.values() if p["status"] is not None)),
+        str(sum(1 for p in journal.values() if p["status"] is None)),
+    )
+    return journal_path, journal
+
+
+def checkpoint_key(config_info: dict, ein: int) -> str:
+    """Key under which progress on an EIN's search (or one slice of it) is journaled
+    Args:
+        config_info: configuration settings (or a query_slice of them) used for the search
+        ein: EIN of the foundation
+    Returns:
+        the EIN, followed by the slice label if the search is one slice of a partitioned search
+    """
+    if config_info.get("query_slice") is None:
+        return str(ein)
+    return f"{ein}_{config_info['query_slice']}"
+
+
+def partial_csv_path(final_path: Path, config_info: dict) -> Path:
+    """Location of the csv that an EIN's results (or one slice of them) are appended to while scraping
+    Args:
+        final_path: path of the EIN's finished csv (see grant_csv_path)
+        config_info: configuration settings (or a query_slice of them) used for the search
+    Returns:
+        path of the partial csv, next to the finished csv
+    """
+    if config_info.get("query_slice") is None:
+        return final_path.with_name(final_path.name + ".part")
+    return final_path.with_name(f"{final_path.name}.{config_info['query_slice']}.part")
+
+
+def resume_partial_csv(part_path: Path, progress: dict = None) -> int:
+    """Prepare a partial csv for scraping: trim it back to its last journaled page, or start it over
+    Args:
+        part_path: csv to which a search's results are appended, page by page
+        progress: the search's progress from an earlier run's journal (see read_journal)
+    Returns:
+        the first page that still has to be scraped
+    """
+    pages = {} if progress is None else progress["pages"]
+    if len(pages) > 0:
+        # pages are appended in order, so the journaled pages are 1 through the last one
+        last_page = max(pages)
+        offset = pages[last_page]
+        if (
+            offset is not None
+            and set(pages) == set(range(1, last_page + 1))
+            and part_path.exists()
+            and part_path.stat().st_size >= offset
+        ):
+            # drop anything written after the last journaled page
+            with open(part_path, "r+b") as part_file:
+                part_file.truncate(offset)
+            return last_page + 1
+        logging.warning(
+            " ⚠️ %s doesn't match the journal; scraping it from page 1", part_path
+        )
+
+    part_path.unlink(missing_ok=True)
+    return 1
+
+
+def clean_company_name(company_name: str) -> str:
+    """Convert a company name from the config's ein list into a filename-friendly string
+    Args:
+        company_name: name of the company (key in the config_info['eins'] list)
+    Returns:
+        lowercase company name without spaces, periods, or parentheses
+    """
+    return (
+        company_name.replace(" ", "_")
+        .replace(".", "")
+        .replace("(", "")
+        .replace(")", "")
+        .lower()
+    )
+
+
+def grant_csv_path(
+    config_info: dict, output_dir: str, company_name: str, ein: int
+) -> Path:
+    """Location of the csv that holds all grant results for one EIN
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the foundation-grant csvs are written
+        company_name: filename-friendly company name (see clean_company_name)
+        ein: EIN of the foundation
+    Returns:
+        path to the per-EIN csv
+    """
+    return Path(output_dir) / Path(f"{company_name}_{ein}{config_info['suffix']}")
+
+
+def export_search(
+    driver: webdriver, config_info: dict, ein: int, part_path: Path
+) -> bool:
+    """Write all of a search's grants to a csv with FD's bulk export (see fd_export_utils.py)
+    Args:
+        driver: webdriver with a logged-in session on the FD dashboard
+        config_info: configuration settings (or a query_slice of them) used for the search
+        ein: EIN for the foundation currently being interrogated
+        part_path: csv to write the grants to (see partial_csv_path)
+    Returns:
+        True if the export worked; False if the search's pages have to be scraped instead
+    """
     try:
-        showing_span = soup.select_one("span.showing-number")
-    except:
-        raise ValueError("Could not find html for grant numbers.")
-
-    # If span.showing-number was not in the html, then there aren't any grants for this EIN
-    if showing_span is None:
-        return 0
-
-    # find the three numbers in the showing span text.
-    # Should be of the form Showing [FIRST MATCH]-[SECOND MATCH] of [THIRD MATCH] Results
-    match = re.search(r"Showing\s+(\d+)[–-](\d+)\s+of\s+([\d,]+)", showing_span.text)
-    if not match:
-        raise ValueError(
-            """
-            Structure of text shown on table doesn't match expected structure:\n
-            'Showing [FIRST MATCH]-[SECOND MATCH] of [THIRD MATCH] Results'
-            """
+        # the download control is on the search results page
+        if driver.current_url != config_info["target_url"] + f"&ein={ein}":
+            perform_initial_search(driver, config_info, ein)
+        acquire_request(ein=ein)
+        with timed("export", ein=ein):
+            export_df = export_grants(driver, config_info, ein)
+    except (TimeoutException, NoSuchElementException, ValueError) as export_error:
+        logging.warning(
+            " ⚠️ Export failed for EIN %s (%s); scraping its pages instead",
+            str(ein),
+            export_error,
+        )
+        return False
+
+    export_df.to_csv(part_path, index=False)
+    return True
+
+
+def partition_search(
+    driver: webdriver, config_info: dict, ein: int, page_limit: int
+) -> List[Tuple[dict, int, str]]:
+    """Split a search with too many results pages into slices by year (then by grant amount)
+    Bisects the search's year range (and, within a single year, its grant-amount range) until
+    every slice's results table fits within FD's page limit.
+    Args:
+        driver: webdriver with a logged-in session on the FD dashboard
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN for the foundation currently being interrogated
+        page_limit: most results-table pages FD will show for one search
+    Returns:
+        list of (configuration for the slice, number of pages in the slice, html of the slice's
+        first page), in year order
+    """
+    slices = []
+    to_search = split_bounds(query_bounds(config_info))
+    while len(to_search) > 0:
+        bounds = to_search.pop(0)
+        slice_config = query_slice(config_info, bounds)
+
+        driver = perform_initial_search(driver, slice_config, ein)
+        total_number_of_pages = count_table_pages(driver, ein)
+        logging.info(
+            " Slice %s of EIN %s has %s pages",
+            slice_config["query_slice"],
+            str(ein),
+            str(total_number_of_pages),
         )
-    # Convert match results to integers, removing any thousands-separator commas
-    start = int(match.group(1).replace(",", ""))
-    end = int(match.group(2).replace(",", ""))
-    total_results = int(match.group(3).replace(",", ""))
-
-    results_per_page = end - start + 1
-    total_number_of_pages = math.ceil(total_results / results_per_page)
-    logging.debug(
-        " Found %s pages of the results table for this ein.", str(total_number_of_pages)
+
+        if total_number_of_pages == 0:
+            continue
+        halves = None
+        if total_number_of_pages > page_limit:
+            halves = split_bounds(bounds)
+            if halves is None:
+                logging.warning(
+                    " ⚠️ Slice %s of EIN %s can't be split further; only its first %s pages can be scraped",
+                    slice_config["query_slice"],
+                    str(ein),
+                    str(page_limit),
+                )
+        if halves is None:
+            slices.append((slice_config, total_number_of_pages, driver.page_source))
+        else:
+            # search the halves next, keeping the slices in year order
+            to_search = halves + to_search
+
+    return slices
+
+
+def scrape_ein(
+    driver: webdriver,
+    config_info: dict,
+    ein: int,
+    company_name: str,
+    output_dir: str,
+    journal_path: Path = None,
+    journal: Dict[str, dict] = None,
+    session: requests.Session = None,
+    next_ein: int = None,
+    prefetched: Dict[str, Future] = None,
+) -> str:
+    """Search FD for one EIN and write its grants to csv, partitioning searches that are too long
+    Args:
+        driver: webdriver with a logged-in session on the FD dashboard
+        config_info: configuration settings read in from fd_config.yml
+        ein: EIN for the foundation currently being interrogated
+        company_name: filename-friendly company name used to name the output csv
+        output_dir: path to the directory where the foundation-grant csv will be written
+        journal_path: if given, progress on this EIN is recorded in this checkpoint journal
+        journal: progress from an earlier run's journal (see read_journal)
+        session: if given, results pages are fetched over http with this session
+        next_ein: EIN to be scraped after this one; with a session and prefetch set in the config,
+            its initial search is fetched over http while this EIN's last pages are processed
+        prefetched: EIN -> background fetch of its initial search, shared by successive calls
+    Returns:
+        status: 'scraped', 'no_results', or 'more_than_100' (some results are beyond FD's page
+        limit: partition is off in the config, or they are even after partitioning the search)
+    Raises:
+        ValueError: if the search must be partitioned but target_url has no year_min filter
+    """
+    if journal is None:
+        journal = {}
+    page_limit = config_info.get("page_limit", 100)
+
+    def start_prefetch():
+        # start the next EIN's initial search (once) while this EIN finishes
+        if (
+            next_ein is not None
+            and session is not None
+            and prefetched is not None
+            and config_info.get("prefetch", False)
+            and str(next_ein) not in prefetched
+        ):
+            prefetched[str(next_ein)] = _PREFETCH_POOL.submit(
+                fetch_initial_search, config_info, next_ein, session
+            )
+
+    # a partially scraped EIN already knows its page count: skip the initial search
+    total_number_of_pages = journal.get(str(ein), {}).get("total_pages")
+    first_page_html = None
+    if total_number_of_pages is None:
+        first_page_html = initial_search_html(driver, config_info, ein, prefetched)
+        total_number_of_pages = count_table_pages(driver, ein, html=first_page_html)
+        if journal_path is not None:
+            append_to_journal(
+                journal_path, {"ein": str(ein), "total_pages": total_number_of_pages}
+            )
+
+    status = "no_results"
+    slices = []
+    if total_number_of_pages > page_limit:
+        # without partitioning (or if no slice turns up results), the EIN is only listed
+        status = "more_than_100"
+        if config_info.get("partition", True):
+            slices = partition_search(driver, config_info, ein, page_limit)
+            if len(slices) == 0:
+                logging.warning(
+                    " ⚠️ No slice of the %s-page search for EIN %s has results; no csv is written",
+                    str(total_number_of_pages),
+                    str(ein),
+                )
+    elif total_number_of_pages > 0:
+        # the initial search's results are the first page of the results table
+        slices = [(config_info, total_number_of_pages, first_page_html)]
+
+    if len(slices) > 0:
+        final_path = grant_csv_path(config_info, output_dir, company_name, ein)
+        part_paths = []
+        exported = []
+        for n, (slice_config, slice_pages, slice_html) in enumerate(slices):
+            part_paths.append(partial_csv_path(final_path, slice_config))
+
+            # one download instead of a page load for every page of the results table
+            exported.append(
+                config_info.get("export", False)
+                and export_search(driver, slice_config, ein, part_paths[-1])
+            )
+            if exported[-1]:
+                if n == len(slices) - 1:
+                    start_prefetch()
+                continue
+
+            scrape_table_pages(
+                driver,
+                slice_config,
+                ein,
+                min(slice_pages, page_limit),
+                part_paths[-1],
+                journal_path=journal_path,
+                progress=journal.get(checkpoint_key(slice_config, ein)),
+                session=session,
+                first_page_html=slice_html,
+                after_last_fetch=start_prefetch if n == len(slices) - 1 else None,
+            )
+
+        # finalize: the per-EIN csv appears only once all of its pages are written
+        if len(part_paths) == 1:
+            os.replace(part_paths[0], final_path)
+        else:
+            merge_slice_csvs(part_paths, final_path)
+            for part_path in part_paths:
+                part_path.unlink()
+        if config_info.get("cache_dir") is not None:
+            record_searches(
+                config_info["cache_dir"],
+                config_info["page_url"],
+                ein,
+                [
+                    {
+                        "page_url": slice_config["page_url"],
+                        "ein": str(ein),
+                        "query_slice": slice_config.get("query_slice"),
+                        "exported": slice_exported,
+                    }
+                    for (slice_config, _, _), slice_exported in zip(slices, exported)
+                ],
+            )
+        status = "scraped"
+        if max(slice_pages for _, slice_pages, _ in slices) > page_limit:
+            status = "more_than_100"
+
+    if journal_path is not None:
+        append_to_journal(journal_path, {"ein": str(ein), "status": status})
+    record_status(ein, status)
+    start_prefetch()
+
+    return status
+
+
+def scrape_batch(
+    driver: webdriver,
+    config_info: dict,
+    batch: List[Tuple[int, int, str]],
+    grantmakers: Dict[str, List[str]],
+    output_dir: str,
+    journal_path: Path = None,
+    journal: Dict[str, dict] = None,
+    session: requests.Session = None,
+) -> Dict[int, str]:
+    """Search FD for several small EINs at once and split the results into a csv for each EIN
+    If the combined search has more pages than expected, has rows that can't be attributed to one
+    of the batch's EINs by grantmaker name, or doesn't give each EIN the rows the manifest expects,
+    the EINs are scraped one at a time instead. If that happens before any batch search of the run
+    has matched the manifest, FD is taken not to support batch searches, and batching is turned
+    off for the rest of the run.
+    Args:
+        driver: webdriver with a logged-in session on the FD dashboard
+        config_info: configuration settings read in from fd_config.yml
+        batch: (ein number, ein, company_name) of each EIN to search together (see fd_batch_utils.py)
+        grantmakers: ein -> grantmaker names in its results (see fd_schedule_utils.read_grantmakers)
+        output_dir: path to the directory where the foundation-grant csvs will be written
+        journal_path: if given, each EIN's status is recorded in this checkpoint journal
+        journal: progress from an earlier run's journal (see read_journal)
+        session: if given, results pages are fetched over http with this session
+    Returns:
+        dictionary of ein -> status ('scraped', 'no_results', or 'more_than_100') of each EIN
+    """
+
+    def one_at_a_time() -> Dict[int, str]:
+        return {
+            ein: scrape_ein(
+                driver,
+                config_info,
+                ein,
+                company_name,
+                output_dir,
+                journal_path=journal_path,
+                journal=journal,
+                session=session,
+            )
+            for _, ein, company_name in batch
+        }
+
+    if _BATCH_CHECK["failed"]:
+        return one_at_a_time()
+
+    eins = batch_ein_param([ein for _, ein, _ in batch], config_info)
+    first_page_html = initial_search_html(driver, config_info, eins)
+    total_number_of_pages = count_table_pages(driver, eins, html=first_page_html)
+
+    batch_df = pd.DataFrame(columns=RESULT_COLUMNS)
+    if 0 < total_number_of_pages <= config_info.get("page_limit", 100):
+        part_path = Path(output_dir) / Path(
+            f"batch_{batch[0][1]}{config_info['suffix']}.part"
+        )
+        scrape_table_pages(
+            driver,
+            config_info,
+            eins,
+            total_number_of_pages,
+            part_path,
+            session=session,
+            first_page_html=first_page_html,
+        )
+        batch_df = pd.read_csv(part_path, dtype=str, keep_default_na=False)
+        part_path.unlink()
+
+    try:
+        if total_number_of_pages > config_info.get("page_limit", 100):
+            raise ValueError(f"{total_number_of_pages} pages of results")
+        split = split_batch(batch_df, batch, grantmakers)
+    except ValueError as split_error:
+        # the manifest is out of date for some of these EINs
+        logging.warning(
+            " ⚠️ Couldn't split the search for EINs %s (%s); searching them one at a time",
+            eins,
+            split_error,
+        )
+        with _BATCH_CHECK_LOCK:
+            if not _BATCH_CHECK["verified"] and not _BATCH_CHECK["failed"]:
+                _BATCH_CHECK["failed"] = True
+                logging.warning(
+                    " ⚠️ No batch search has matched the manifest yet; batching is off for the rest of this run"
+                )
+        return one_at_a_time()
+
+    with _BATCH_CHECK_LOCK:
+        _BATCH_CHECK["verified"] = True
+
+    statuses = {}
+    for _, ein, company_name in batch:
+        statuses[ein] = "no_results"
+        if len(split[str(ein)]) > 0:
+            final_path = grant_csv_path(config_info, output_dir, company_name, ein)
+            part_path = partial_csv_path(final_path, config_info)
+            split[str(ein)].to_csv(part_path, index=False)
+            os.replace(part_path, final_path)
+            statuses[ein] = "scraped"
+        if config_info.get("cache_dir") is not None:
+            record_searches(
+                config_info["cache_dir"],
+                config_info["page_url"],
+                ein,
+                [
+                    {
+                        "page_url": config_info["page_url"],
+                        "ein": eins,
+                        "query_slice": None,
+                    }
+                ],
+                batch=[
+                    {
+                        "ein": batch_ein,
+                        "grantmakers": grantmakers.get(str(batch_ein), []),
+                    }
+                    for _, batch_ein, _ in batch
+                ],
+            )
+        if journal_path is not None:
+            append_to_journal(journal_path, {"ein": str(ein), "status": statuses[ein]})
+        record_status(ein, statuses[ein])
+
+    logging.info(
+        " ✅ Searched %s EINs at once: %s results pages",
+        str(len(batch)),
+        str(total_number_of_pages),
     )
+    return statuses
 
-    return total_number_of_pages
 
+def _next_from_queue(ein_queue: queue.Queue) -> Union[Tuple[int, int, str], None]:
+    """Take the next (ein number, ein, company_name) from the work queue; None once it's empty"""
+    try:
+        return ein_queue.get_nowait()
+    except queue.Empty:
+        return None
 
-def write_ein_list(ein_list: List[int], ein_filepath: str):
-    """appends new list of eins to yaml file containing list
+
+def scrape_worker(
+    worker_id: int,
+    config_info: dict,
+    ein_queue: queue.Queue,
+    output_dir: str,
+    results: Dict[str, list],
+    results_lock: threading.Lock,
+    journal_path: Path = None,
+    journal: Dict[str, dict] = None,
+    grantmakers: Dict[str, List[str]] = None,
+):
+    """Log in an independent browser session and scrape EINs from a shared work queue until it is empty
     Args:
-        ein_list: list of ein numbers to be written to a simple yaml
-        ein_filepath: filepath where eins will be written (or already exist)
+        worker_id: number identifying this worker in log messages
+        config_info: configuration settings read in from fd_config.yml
+        ein_queue: queue of (ein number, ein, company_name) tuples shared among all workers, and of
+            lists of them for EINs to be searched together (see fd_batch_utils.batch_items)
+        output_dir: path to the directory where the foundation-grant csvs will be written
+        results: dictionary of status -> list of EINs, shared among all workers
+        results_lock: lock guarding results
+        journal_path: if given, progress is recorded in this checkpoint journal
+        journal: progress of each EIN from an earlier run's journal (see read_journal)
+        grantmakers: ein -> grantmaker names in its results, for splitting batched searches
     Returns:
         None
     """
-    if ein_filepath.exists():
-        more_than_100_dict = yaml_to_dict(ein_filepath)
-        ein_list_from_file = more_than_100_dict["eins"]
-        ein_list.extend(ein_list_from_file)
+    driver = get_web_driver(config_info)
+    try:
+        session = start_session(driver, config_info)
+
+        # with prefetching, each worker claims its next EIN early so that EIN's initial search
+        # can load while the current one finishes
+        prefetch = session is not None and config_info.get("prefetch", False)
+        prefetched = {}
 
-    dict_to_yaml({"eins": ein_list}, ein_filepath)
+        item = _next_from_queue(ein_queue)
+        while item is not None:
+            next_item = _next_from_queue(ein_queue) if prefetch else None
+            eins = (
+                [batch_item[1] for batch_item in item]
+                if isinstance(item, list)
+                else [item[1]]
+            )
+            ein = ", ".join(str(batch_ein) for batch_ein in eins)
+
+            try:
+                if isinstance(item, list):
+                    logging.info(
+                        " >>>>> [worker %s] Working on a batch of %s EINs (%s)",
+                        str(worker_id),
+                        str(len(item)),
+                        ein,
+                    )
+                    statuses = scrape_batch(
+                        driver,
+                        config_info,
+                        item,
+                        grantmakers or {},
+                        output_dir,
+                        journal_path=journal_path,
+                        journal=journal,
+                        session=session,
+                    )
+                else:
+                    logging.info(
+                        " >>>>> [worker %s] Working on ein number %s (%s) for %s",
+                        str(worker_id),
+                        str(item[0] + 1),
+                        ein,
+                        item[2],
+                    )
+                    statuses = {
+                        item[1]: scrape_ein(
+                            driver,
+                            config_info,
+                            item[1],
+                            item[2],
+                            output_dir,
+                            journal_path=journal_path,
+                            journal=journal,
+                            session=session,
+                            # batches aren't prefetched
+                            next_ein=(
+                                next_item[1] if isinstance(next_item, tuple) else None
+                            ),
+                            prefetched=prefetched,
+                        )
+                    }
+
+            except (TimeoutException, NoSuchElementException) as selenium_error:
+                # a stuck page only costs this worker its current EIN; keep going
+                logging.warning(
+                    "❌ [worker %s] Selenium error occurred for EIN %s: %s",
+                    str(worker_id),
+                    ein,
+                    selenium_error,
+                )
+                statuses = {batch_ein: "failed" for batch_ein in eins}
+
+            except WebDriverException as web_driver_error:
+                # this worker's browser is unusable: hand the EIN back to the other workers
+                logging.critical(
+                    "❌ [worker %s] WebDriver encountered a fatal issue: %s",
+                    str(worker_id),
+                    web_driver_error,
+                )
+                ein_queue.put(item)
+                if next_item is not None:
+                    ein_queue.put(next_item)
+                break
+
+            except Exception as e:
+                logging.exception(
+                    "❌ [worker %s] An unexpected error occurred for EIN %s: %s",
+                    str(worker_id),
+                    ein,
+                    e,
+                )
+                statuses = {batch_ein: "failed" for batch_ein in eins}
+
+            with results_lock:
+                for batch_ein in eins:
+                    results[statuses.get(batch_ein, "failed")].append(batch_ein)
+
+            try:
+                driver, session = recycle_driver(driver, session, config_info)
+            except Exception as recycle_error:
+                # no browser to go on with: hand the claimed EIN back to the other workers
+                logging.critical(
+                    "❌ [worker %s] Could not replace the browser: %s",
+                    str(worker_id),
+                    recycle_error,
+                )
+                if next_item is not None:
+                    ein_queue.put(next_item)
+                break
+            item = next_item if prefetch else _next_from_queue(ein_queue)
+    finally:
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass  # the browser was already quit when recycling failed
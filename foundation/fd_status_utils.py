@@ -0,0 +1,156 @@
+"""Append-only store of each EIN's scrape status, kept across fd_scrape.py runs
+Every finished EIN adds one json line, e.g.
+ {"ein": "123456789", "query": "3f1c...", "status": "no_results", "time": 1760000000.0}
+where query is a short hash of the config's target_url (see fd_cache_utils.query_key) and status is
+'scraped', 'no_results', or 'more_than_100'. The latest line for a (query, ein) wins. When old lines
+outnumber current ones, the file is compacted to one line per (query, ein). fd_scrape.py uses the
+store to skip EINs already known to have no grants before opening a browser page, and writes the
+no-grant and >100-page EIN lists (no_grants_for_ein and more_than_100 in the config) from it.
+"""
+
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+from projects.foundation.fd_cache_utils import query_key
+
+# compact once the file holds this many lines for each (query, ein) in it
+COMPACT_RATIO = 2
+
+# store of this process's run; path None turns recording off
+_STORE = {"path": None, "query": None}
+
+
+@contextmanager
+def _locked(status_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the store (shared by every fd_scrape process that uses it)"""
+    with open(status_path.with_name(status_path.name + ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_entries(status_path: Path) -> Iterator[dict]:
+    """Every complete line of the store, oldest first"""
+    if not status_path.exists():
+        return
+    with open(status_path, "r", encoding="utf-8") as status_file:
+        for line in status_file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line of a store cut off by a crash
+
+
+def read_statuses(
+    status_path: Union[str, Path], query: str = None
+) -> Dict[str, Dict[str, Union[str, float]]]:
+    """Read the latest status of each EIN
+    Args:
+        status_path: path to the append-only status store
+        query: if given, only statuses for this search query are read
+    Returns:
+        dictionary of ein -> {'status': ..., 'time': seconds since the epoch it was recorded}
+    """
+    statuses = {}
+    for entry in _read_entries(Path(status_path)):
+        if query is None or entry["query"] == query:
+            statuses[entry["ein"]] = {"status": entry["status"], "time": entry["time"]}
+    return statuses
+
+
+def compact_statuses(status_path: Union[str, Path]) -> int:
+    """Rewrite the store with only the latest line for each (query, ein)
+    Args:
+        status_path: path to the append-only status store
+    Returns:
+        number of lines in the compacted store
+    """
+    status_path = Path(status_path)
+    with _locked(status_path):
+        latest = {}
+        for entry in _read_entries(status_path):
+            latest[(entry["query"], entry["ein"])] = entry
+
+        compacted_path = status_path.with_name(status_path.name + ".compact")
+        with open(compacted_path, "w", encoding="utf-8") as compacted_file:
+            for entry in latest.values():
+                compacted_file.write(json.dumps(entry) + "\n")
+            compacted_file.flush()
+            os.fsync(compacted_file.fileno())
+        os.replace(compacted_path, status_path)
+    return len(latest)
+
+
+def status_store_path(config_info: dict, output_dir: str) -> Path:
+    """Path of the status store (status_store in the config; fd_ein_status.jsonl by default)"""
+    return Path(output_dir) / Path(
+        config_info.get("status_store", "fd_ein_status.jsonl")
+    )
+
+
+def start_status_store(
+    config_info: dict, output_dir: str
+) -> Dict[str, Dict[str, Union[str, float]]]:
+    """Turn on recording of EIN statuses for this run, compacting the store first if it needs it
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the store is kept
+    Returns:
+        latest status of each EIN for the config's query (see read_statuses)
+    """
+    status_path = status_store_path(config_info, output_dir)
+    _STORE.update(path=status_path, query=query_key(config_info["target_url"]))
+
+    entries = list(_read_entries(status_path))
+    if len(entries) > COMPACT_RATIO * len(set((e["query"], e["ein"]) for e in entries)):
+        compact_statuses(status_path)
+    return read_statuses(status_path, _STORE["query"])
+
+
+def record_status(ein: int, status: str):
+    """Append an EIN's status to the store of this run (does nothing if the store isn't started)"""
+    if _STORE["path"] is None:
+        return
+    entry = {
+        "ein": str(ein),
+        "query": _STORE["query"],
+        "status": status,
+        "time": time.time(),
+    }
+    with _locked(_STORE["path"]):
+        with open(_STORE["path"], "a", encoding="utf-8") as status_file:
+            status_file.write(json.dumps(entry) + "\n")
+            status_file.flush()
+            os.fsync(status_file.fileno())
+
+
+def known_empty(
+    statuses: Dict[str, Dict[str, Union[str, float]]], recheck_days: float = None
+) -> set:
+    """EINs whose latest search found no grants (and, with recheck_days, found it recently)
+    Args:
+        statuses: latest status of each EIN (see read_statuses)
+        recheck_days: if given, EINs found empty longer ago than this are searched again
+    Returns:
+        set of EINs (as strings) that don't need to be searched
+    """
+    oldest = 0.0 if recheck_days is None else time.time() - 86400 * recheck_days
+    return set(
+        ein
+        for ein, latest in statuses.items()
+        if latest["status"] == "no_results" and latest["time"] >= oldest
+    )
+
+
+def eins_with_status(
+    statuses: Dict[str, Dict[str, Union[str, float]]], status: str
+) -> List[str]:
+    """EINs whose latest status is status, in the order they were first recorded"""
+    return [ein for ein, latest in statuses.items() if latest["status"] == status]
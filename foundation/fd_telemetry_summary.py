@@ -0,0 +1,63 @@
+"""This command-line script summarizes the timing telemetry written by fd_scrape.py
+It reports p50/p95 latency for each phase of the scrape, how many captchas were met in each, and
+overall results pages per hour.
+To use:
+> python3 [path/to/this/file] --telemetry [path/to/fd_scrape_telemetry.jsonl]
+"""
+
+import logging
+
+import click
+
+from projects.foundation.fd_telemetry_utils import (
+    pages_per_hour,
+    read_telemetry,
+    summarize_telemetry,
+)
+
+logging.basicConfig(level=logging.INFO)
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option(
+    "--telemetry",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=True,
+)
+def telemetry_summary(telemetry: str):
+    """Report latency percentiles per scrape phase and pages per hour
+    Args:
+        telemetry: path to the telemetry file written by fd_scrape.py
+    Returns:
+        None
+    """
+    events = read_telemetry(telemetry)
+    summary = summarize_telemetry(events)
+
+    logging.info(
+        " %-13s %7s %9s %9s %9s %10s %8s",
+        "phase",
+        "count",
+        "p50 (s)",
+        "p95 (s)",
+        "max (s)",
+        "total (s)",
+        "captchas",
+    )
+    for phase, row in summary.sort_values("total", ascending=False).iterrows():
+        logging.info(
+            " %-13s %7d %9.3f %9.3f %9.3f %10.1f %8d",
+            phase,
+            row["count"],
+            row["p50"],
+            row["p95"],
+            row["max"],
+            row["total"],
+            row["captchas"],
+        )
+    logging.info(" %.0f pages per hour", pages_per_hour(events))
+
+
+if __name__ == "__main__":
+    telemetry_summary()
@@ -0,0 +1,129 @@
+"""Timing telemetry for the fd_scrape.py web scraper
+Each timed phase of the scrape (loading a page, waiting for the results table, waiting out a human
+verification, parsing, ...) is appended as one json object per line to a telemetry file, e.g.
+ {"time": 1760000000.0, "phase": "page_wait", "seconds": 1.27, "ein": "123456789", "page": 4,
+  "captchas": 0, "worker": "fd_worker_1"}
+fd_telemetry_summary.py reports latency percentiles per phase and pages per hour from the file.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+import pandas as pd
+
+# phase recorded once per results page fetched (whatever the fetch mode); used for pages per hour
+PAGE_PHASE = "page"
+
+# telemetry file shared by every thread of the scrape; None turns telemetry off
+_TELEMETRY = {"path": None}
+_TELEMETRY_LOCK = threading.Lock()
+
+# captchas (human verifications) met so far by each thread
+_CAPTCHAS = threading.local()
+
+
+def start_telemetry(config_info: dict, output_dir: str) -> Union[Path, None]:
+    """Turn on telemetry if the config names a telemetry file (kept in output_dir)
+    Args:
+        config_info: configuration settings read in from fd_config.yml
+        output_dir: path to the directory where the telemetry file is kept
+    Returns:
+        path to the telemetry file, or None if telemetry is off
+    """
+    if config_info.get("telemetry") is None:
+        _TELEMETRY["path"] = None
+    else:
+        _TELEMETRY["path"] = Path(output_dir) / Path(config_info["telemetry"])
+    return _TELEMETRY["path"]
+
+
+def note_captcha():
+    """Count a captcha (human-verification challenge) met by the current thread"""
+    _CAPTCHAS.count = getattr(_CAPTCHAS, "count", 0) + 1
+
+
+def record_event(phase: str, seconds: float, **fields):
+    """Append one timing event to the telemetry file (does nothing if telemetry is off)
+    Args:
+        phase: name of the timed phase, e.g. 'page_get'
+        seconds: how long the phase took
+        fields: anything else to record, e.g. ein, page, captchas (fields that are None are left out)
+    Returns:
+        None
+    """
+    if _TELEMETRY["path"] is None:
+        return
+    event = {"time": time.time(), "phase": phase, "seconds": round(seconds, 4)}
+    event.update({key: value for key, value in fields.items() if value is not None})
+    event.setdefault("captchas", 0)
+    event["worker"] = threading.current_thread().name
+    with _TELEMETRY_LOCK:
+        with open(_TELEMETRY["path"], "a", encoding="utf-8") as telemetry_file:
+            telemetry_file.write(json.dumps(event, default=str) + "\n")
+
+
+@contextmanager
+def timed(phase: str, **fields) -> Iterator[None]:
+    """Time the enclosed block and record it as one event, with the captchas met during it
+    Args:
+        phase: name of the timed phase
+        fields: anything else to record, e.g. ein, page
+    Returns:
+        None
+    """
+    captchas = getattr(_CAPTCHAS, "count", 0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        fields["captchas"] = getattr(_CAPTCHAS, "count", 0) - captchas
+        record_event(phase, time.perf_counter() - start, **fields)
+
+
+def read_telemetry(telemetry_path: Union[str, Path]) -> pd.DataFrame:
+    """Read a telemetry file into a dataframe with one row per event"""
+    events = []
+    with open(telemetry_path, "r", encoding="utf-8") as telemetry_file:
+        for line in telemetry_file:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # last line of a file cut off by a crash
+    events_df = pd.DataFrame(events)
+    if len(events_df) == 0:
+        raise ValueError(f"No telemetry events found in {telemetry_path}")
+    return events_df
+
+
+def summarize_telemetry(events: pd.DataFrame) -> pd.DataFrame:
+    """Latency percentiles and totals for each phase
+    Args:
+        events: telemetry events (see read_telemetry)
+    Returns:
+        dataframe indexed by phase with count, p50, p95, max and total seconds, and captchas
+    """
+    grouped = events.groupby("phase")
+    return pd.DataFrame(
+        {
+            "count": grouped["seconds"].count(),
+            "p50": grouped["seconds"].quantile(0.5),
+            "p95": grouped["seconds"].quantile(0.95),
+            "max": grouped["seconds"].max(),
+            "total": grouped["seconds"].sum(),
+            "captchas": grouped["captchas"].sum(),
+        }
+    )
+
+
+def pages_per_hour(events: pd.DataFrame) -> float:
+    """Results pages fetched per hour of wall-clock time covered by the telemetry events"""
+    n_pages = int((events["phase"] == PAGE_PHASE).sum())
+    # each event's time is when it ended
+    hours = (events["time"].max() - (events["time"] - events["seconds"]).min()) / 3600
+    if n_pages == 0 or hours <= 0:
+        return 0.0
+    return n_pages / hours
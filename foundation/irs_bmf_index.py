@@ -0,0 +1,47 @@
+"""Command line script to build the offline EIN lookup index used by propublica_ein.py
+Loads csvs of the IRS Exempt Organizations Business Master File extract (eo1.csv ... eo4.csv, or
+the per-state eo_xx.csv files), downloaded from
+https://www.irs.gov/charities-non-profits/exempt-organizations-business-master-file-extract-eo-bmf
+into one SQLite file (see irs_bmf_utils.py). Point bmf_index in propublica_all_names.yml at it to
+look up search strings without calling the Nonprofit Explorer API.
+
+To use at command line:
+> python3 [path/to/this/file] --csv [path/to/eo1.csv] --csv [path/to/eo2.csv] --index [path/to/irs_eo_bmf.sqlite]
+"""
+
+import logging
+
+import click
+
+from projects.foundation.irs_bmf_utils import build_bmf_index
+
+logging.basicConfig(level=logging.INFO)
+
+
+@click.command()
+@click.option(
+    "--csv",
+    "csv_paths",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--index",
+    "index_path",
+    type=click.Path(file_okay=True, dir_okay=False),
+    required=True,
+)
+def irs_bmf_index(csv_paths: tuple, index_path: str):
+    """Build the EO BMF index
+    Args:
+        csv_paths: paths to EO BMF csvs
+        index_path: path of the SQLite file to write
+    Returns:
+        None
+    """
+    build_bmf_index(csv_paths, index_path)
+
+
+if __name__ == "__main__":
+    irs_bmf_index()
@@ -0,0 +1,259 @@
+"""Offline EIN lookup index built from the IRS Exempt Organizations Business Master File (EO BMF)
+The EO BMF extract (eo1.csv ... eo4.csv, or the per-state eo_xx.csv files) lists every tax-exempt
+organization with its EIN, NAME, SORT_NAME (secondary name), CITY, STATE and SUBSECTION (501(c)
+code). build_bmf_index loads the csvs into one SQLite file holding
+- organizations: ein, name, sub_name (SORT_NAME), city, state, subsection, one row per EIN
+- tokens and postings: an inverted index of the words of each organization's name and sub_name
+search_bmf_index answers the query parameters propublica_ein.py sends to the Nonprofit Explorer
+API (see propublica_plan_utils.search_variants) with an answer shaped like the API's, so with
+bmf_index set in propublica_all_names.yml, search strings are looked up locally instead. Words of
+the search string are runs of letters and digits, compared without case; -terms rule out names
+as ignore_client_side does (see propublica_plan_utils.ignore_pattern). Organizations are listed by
+name (the API's relevance order can't be reproduced), all on one page.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+import pandas as pd
+
+from projects.foundation.propublica_plan_utils import (
+    ignore_pattern,
+    parse_search_query,
+)
+
+# EO BMF columns that are read, all as text (EINs have leading zeros)
+BMF_COLUMNS = {
+    "EIN": str,
+    "NAME": str,
+    "SORT_NAME": str,
+    "CITY": str,
+    "STATE": str,
+    "SUBSECTION": str,
+}
+
+# rows of an EO BMF csv read at a time
+CHUNK_ROWS = 200000
+
+
+def tokenize(text: str) -> List[str]:
+    """Words of a name as the index compares them: runs of letters and digits, upper-cased"""
+    if not isinstance(text, str):
+        return []
+    return re.findall(r"[A-Z0-9]+", text.upper())
+
+
+def _contains(tokens: List[str], phrase: List[str]) -> bool:
+    """True if the words of phrase appear together, in order, in tokens"""
+    return any(
+        tokens[start : start + len(phrase)] == phrase
+        for start in range(len(tokens) - len(phrase) + 1)
+    )
+
+
+def build_bmf_index(
+    csv_paths: Iterable[Union[str, Path]], index_path: Union[str, Path]
+) -> int:
+    """Load EO BMF csvs into an indexed SQLite store (replacing any store at index_path)
+    Args:
+        csv_paths: paths to EO BMF csvs; an EIN listed in more than one keeps its first listing
+        index_path: path of the SQLite file to write
+    Returns:
+        number of organizations in the index
+    """
+    index_path = Path(index_path)
+    building_path = index_path.with_name(index_path.name + ".building")
+    building_path.unlink(missing_ok=True)
+
+    conn = sqlite3.connect(building_path)
+    conn.executescript(
+        """
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE organizations (
+            ein INTEGER PRIMARY KEY,
+            name TEXT,
+            sub_name TEXT,
+            city TEXT,
+            state TEXT,
+            subsection INTEGER
+        );
+        CREATE TABLE tokens (id INTEGER PRIMARY KEY, token TEXT UNIQUE, count INTEGER);
+        CREATE TABLE loaded_postings (token_id INTEGER, ein INTEGER);
+        """
+    )
+    vocabulary = {}
+    token_counts = []
+    seen_eins = set()
+    for csv_path in csv_paths:
+        n_rows = 0
+        for chunk in pd.read_csv(
+            csv_path,
+            usecols=list(BMF_COLUMNS),
+            dtype=BMF_COLUMNS,
+            keep_default_na=False,
+            chunksize=CHUNK_ROWS,
+        ):
+            organizations = []
+            postings = []
+            for ein, name, sub_name, city, state, subsection in chunk[
+                list(BMF_COLUMNS)
+            ].itertuples(index=False):
+                ein = int(ein)
+                if ein in seen_eins:
+                    continue
+                seen_eins.add(ein)
+                organizations.append(
+                    (
+                        ein,
+                        name,
+                        sub_name,
+                        city,
+                        state,
+                        int(subsection) if subsection.isdigit() else None,
+                    )
+                )
+                for token in set(tokenize(name)) | set(tokenize(sub_name)):
+                    token_id = vocabulary.setdefault(token, len(vocabulary) + 1)
+                    if token_id > len(token_counts):
+                        token_counts.append(0)
+                    token_counts[token_id - 1] += 1
+                    postings.append((token_id, ein))
+            conn.executemany(
+                "INSERT INTO organizations VALUES (?, ?, ?, ?, ?, ?)", organizations
+            )
+            conn.executemany("INSERT INTO loaded_postings VALUES (?, ?)", postings)
+            n_rows += len(chunk)
+        logging.info(" Read %s rows of %s", str(n_rows), str(csv_path))
+
+    conn.executemany(
+        "INSERT INTO tokens VALUES (?, ?, ?)",
+        (
+            (token_id, token, token_counts[token_id - 1])
+            for token, token_id in vocabulary.items()
+        ),
+    )
+    # the postings are stored once, sorted by word: loading them in that order is much faster
+    # than keeping the sorted table up to date, and the table is its own index
+    conn.executescript(
+        """
+        CREATE TABLE postings (
+            token_id INTEGER,
+            ein INTEGER,
+            PRIMARY KEY (token_id, ein)
+        ) WITHOUT ROWID;
+        INSERT INTO postings
+            SELECT token_id, ein FROM loaded_postings ORDER BY token_id, ein;
+        DROP TABLE loaded_postings;
+        """
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    os.replace(building_path, index_path)
+    logging.info(
+        " Indexed %s organizations (%s distinct words) in %s",
+        str(len(seen_eins)),
+        str(len(vocabulary)),
+        str(index_path),
+    )
+    return len(seen_eins)
+
+
+def open_bmf_index(index_path: Union[str, Path]) -> sqlite3.Connection:
+    """Open an index written by build_bmf_index, read only"""
+    index_path = Path(index_path)
+    if not index_path.exists():
+        raise FileNotFoundError(
+            f"No EO BMF index at {index_path}; build one with irs_bmf_index.py"
+        )
+    return sqlite3.connect(f"file:{index_path.resolve()}?mode=ro", uri=True)
+
+
+def search_bmf_index(
+    conn: sqlite3.Connection, params: Dict[str, str]
+) -> Union[dict, None]:
+    """Answer a Nonprofit Explorer API search from the index
+    An organization matches if the quoted name's words appear together in its name or sub_name,
+    every other word of q appears in its name or sub_name, none of the -terms appears in either
+    as whole words, and its subsection is c_code[id] (if given).
+    Args:
+        conn: connection to the index (see open_bmf_index)
+        params: query parameters of the search (q and c_code[id]; see search_variants)
+    Returns:
+        json-like answer as the API gives (total_results, organizations, num_pages, ...), or None
+        if nothing matches, as the API answers a search without results
+    """
+    name, required, excluded = parse_search_query(params.get("q", ""))
+    phrase = tokenize(name)
+    words = sorted(
+        set(phrase + [token for word in required for token in tokenize(word)])
+    )
+    if len(phrase) == 0:
+        return None
+
+    # rarest word first: its organizations are the candidates, checked for the other words
+    token_ids = [
+        token_id
+        for (token_id,) in conn.execute(
+            f"SELECT id FROM tokens WHERE token IN ({', '.join('?' * len(words))}) "
+            "ORDER BY count",
+            words,
+        )
+    ]
+    if len(token_ids) < len(words):
+        return None  # no organization has one of the words
+
+    query = (
+        "SELECT o.ein, o.name, o.sub_name, o.city, o.state, o.subsection "
+        "FROM postings AS p JOIN organizations AS o ON o.ein = p.ein WHERE p.token_id = ?"
+    )
+    for _ in token_ids[1:]:
+        query += (
+            " AND EXISTS (SELECT 1 FROM postings AS other"
+            " WHERE other.token_id = ? AND other.ein = p.ein)"
+        )
+    args = list(token_ids)
+    c_code = params.get("c_code[id]")
+    if c_code is not None and str(c_code).isdigit():
+        query += " AND o.subsection = ?"
+        args.append(int(c_code))
+
+    excluded_pattern = ignore_pattern(excluded)
+    organizations = []
+    for ein, org_name, sub_name, city, state, subsection in conn.execute(query, args):
+        if not any(_contains(tokenize(text), phrase) for text in [org_name, sub_name]):
+            continue
+        if any(
+            excluded_pattern.search(text or "") is not None
+            for text in [org_name, sub_name]
+        ):
+            continue
+        organizations.append(
+            {
+                "ein": ein,
+                "name": org_name,
+                "sub_name": sub_name,
+                "city": city,
+                "state": state,
+                "subseccd": subsection,
+            }
+        )
+    if len(organizations) == 0:
+        return None
+
+    organizations.sort(key=lambda org: (org["name"], org["ein"]))
+    return {
+        "total_results": len(organizations),
+        "organizations": organizations,
+        "num_pages": 1,
+        "cur_page": 0,
+        "per_page": len(organizations),
+        "search_query": params.get("q"),
+        "selected_code": c_code,
+        "data_source": "irs_eo_bmf",
+    }
@@ -4,6 +4,10 @@ results (executed by propublica_ein.py), removes duplicates, appends a leading 0
 querying process (fd_scrape.py)
 To use:
 > python3 [path/to/this/file] --input [path/to/ein/file] --output_dir [path/to/dir/for/csv/output]
+To split the EINs into N fd_scrape configs with about the same number of results pages each (using
+page counts recorded by fd_count_pages.py), add --shards [N] --manifest [path/to/fd_page_manifest.jsonl]
+--fd_config [path/to/fd_config.yml]; the config's target_url picks the search whose page counts are
+used, and every other setting of it is copied into the shard configs
 """
 
 # pylint: disable = broad-exception-caught, bare-except
@@ -12,7 +16,10 @@ from pathlib import Path
 
 import click
 import pandas as pd
-from utils.io import dict_to_yaml
+
+from projects.foundation.fd_cache_utils import query_key
+from projects.foundation.fd_schedule_utils import balance_shards, read_manifest
+from utils.io import dict_to_yaml, yaml_to_dict
 
 logging.basicConfig(level=logging.INFO)
 
@@ -30,14 +37,38 @@ logging.basicConfig(level=logging.INFO)
     required=False,
     default=".",
 )
-def process_ein(input: str, output_dir: str):
+@click.option("--shards", type=click.IntRange(min=1), required=False, default=1)
+@click.option(
+    "--manifest",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=False,
+    default=None,
+)
+@click.option(
+    "--fd_config",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    required=False,
+    default=None,
+)
+def process_ein(
+    input: str, output_dir: str, shards: int, manifest: str, fd_config: str
+):
     """For a set of EINs, scrapes grant results from foundation
     Args:
         input: Path to csv ein results (hand-reviewed) (column with eins must be called 'ein')
         output_dir: path to the directory where write the subsetted file
+        shards: if more than 1, write this many fd_scrape configs with balanced EIN lists
+        manifest: page-count manifest written by fd_count_pages.py (EINs not in it count as typical)
+        fd_config: fd_scrape config whose other settings are copied into each shard's config; its
+            target_url picks the manifest's page counts (required with manifest)
     Returns:
         None
     """
+    if manifest is not None and fd_config is None:
+        raise click.UsageError(
+            "--manifest needs --fd_config, whose target_url says which search's page counts to use"
+        )
+
     # read configuration details from configuration yaml specified at command line
     ein_df = pd.read_csv(input, dtype={"ein": str})
     if "notes" in ein_df.columns:
@@ -56,6 +87,30 @@ def process_ein(input: str, output_dir: str):
         Path(output_dir) / Path("eins_for_fdo_query.csv"), index=False
     )  # save
 
+    if shards > 1:
+        items = [
+            (i, row["ein"], row["search_term"].lower().replace(" ", "_"))
+            for i, (_, row) in enumerate(ein_df.iterrows())
+        ]
+        config_info = {} if fd_config is None else yaml_to_dict(fd_config)
+        page_counts = {}
+        if manifest is not None:
+            page_counts = read_manifest(manifest, query_key(config_info["target_url"]))
+        for k, shard in enumerate(balance_shards(items, page_counts, shards)):
+            shard_path = Path(output_dir) / Path(
+                f"eins_for_fdo_query_shard_{k + 1}.yml"
+            )
+            dict_to_yaml(
+                dict(config_info, eins=[{name: ein} for _, ein, name in shard]),
+                shard_path,
+            )
+            logging.info(
+                " Wrote %s EINs (%s known pages) to %s",
+                str(len(shard)),
+                str(sum(page_counts.get(ein, 0) for _, ein, _ in shard)),
+                str(shard_path),
+            )
+
 
 if __name__ == "__main__":
     process_ein()
@@ -0,0 +1,87 @@
+"""On-disk cache of ProPublica Nonprofit Explorer API answers, for propublica_ein.py
+Each answer is stored gzipped at [cache dir]/[first 2 hex digits]/[request key].json.gz, with the
+time it was fetched, e.g. {"url": ..., "params": {...}, "time": 1760000000.0, "data": {...}}, where
+data is null for a search the API answered with no results. The request key is a sha256 of the
+normalized request: the url, and the parameters sorted by name, with the q parameter's spacing
+collapsed and its -terms de-duplicated and sorted (the API doesn't care about their order).
+Failed requests are never cached.
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+from utils.io import write_atomically
+
+
+def normalize_query(q: str) -> str:
+    """q with its spacing collapsed and its -terms (which the API applies in any order) sorted"""
+    words = re.findall(r'-?"[^"]*"|\S+', q)
+    terms = [word for word in words if not word.startswith("-")]
+    excluded = sorted(set(word for word in words if word.startswith("-")))
+    return " ".join(terms + excluded)
+
+
+def request_key(url: str, params: Dict[str, str]) -> str:
+    """sha256 identifying an API request, the same for requests that must get the same answer"""
+    normalized = {
+        name: normalize_query(str(value)) if name == "q" else str(value).strip()
+        for name, value in params.items()
+    }
+    request = json.dumps([url.rstrip("/"), sorted(normalized.items())])
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def _response_path(cache_dir: Union[str, Path], key: str) -> Path:
+    """Location of the cached answer to the request with the given key"""
+    return Path(cache_dir) / key[:2] / f"{key}.json.gz"
+
+
+def read_cached_response(
+    cache_dir: Union[str, Path],
+    url: str,
+    params: Dict[str, str],
+    ttl_seconds: float = None,
+) -> Tuple[bool, Union[dict, None]]:
+    """Get the cached answer to an API request
+    Args:
+        cache_dir: directory holding the response cache
+        url: API endpoint
+        params: query parameters of the request
+        ttl_seconds: answers cached longer ago than this are ignored (None: they never expire)
+    Returns:
+        found: True if a current answer is in the cache
+        data: the cached json answer (None if the API found no results, or nothing was found)
+    """
+    response_path = _response_path(cache_dir, request_key(url, params))
+    if not response_path.exists():
+        return False, None
+    try:
+        cached = json.loads(gzip.decompress(response_path.read_bytes()))
+    except (OSError, EOFError, ValueError):
+        return False, None  # damaged file: fetch the answer again
+    if ttl_seconds is not None and time.time() - cached["time"] > ttl_seconds:
+        return False, None
+    return True, cached["data"]
+
+
+def cache_response(
+    cache_dir: Union[str, Path], url: str, params: Dict[str, str], data: dict = None
+) -> Path:
+    """Store the answer to an API request in the cache
+    Args:
+        cache_dir: directory holding the response cache
+        url: API endpoint
+        params: query parameters of the request
+        data: json answer, or None if the API found no results
+    Returns:
+        path of the cached answer
+    """
+    response_path = _response_path(cache_dir, request_key(url, params))
+    cached = {"url": url, "params": params, "time": time.time(), "data": data}
+    write_atomically(response_path, gzip.compress(json.dumps(cached).encode("utf-8")))
+    return response_path
@@ -0,0 +1,271 @@
+"""Local stand-in for ProPublica's Nonprofit Explorer API, for exercising propublica_ein.py offline
+Serves /nonprofits/api/v2/search.json like the real API: the q parameter is a quoted name,
+optionally followed by more words (which every result must contain) and -terms (which no result may
+contain), c_code[id] picks the 501(c) subsection, and page picks a page of 25 results. A search
+without results gets a 404, as the real API gives.
+Organizations are synthetic, and the same every time for a given name, subsection and seed (see
+synthetic_organizations). Every response can be delayed (latency), and any request can be answered,
+at random, with a 429 or 503 error (error_rate).
+To use:
+> python3 [path/to/this/file] --port 8766 --latency 0.2 --error_rate 0.05
+then point api_root in propublica_all_names.yml at http://127.0.0.1:8766/nonprofits/api/v2/search.json
+"""
+
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+
+from projects.foundation.propublica_plan_utils import parse_search_query
+
+logging.basicConfig(level=logging.INFO)
+
+SEARCH_PATH = "/nonprofits/api/v2/search.json"
+RESULTS_PER_PAGE = 25
+
+# endings of the synthetic organizations' names; some contain typical ignore_results_with terms
+_ENDINGS = [
+    "Foundation",
+    "Charitable Foundation",
+    "Family Foundation",
+    "Fund",
+    "Charitable Trust",
+    "Employees Fund",
+    "Retirees Association",
+    "Youth Sports Club",
+    "Scholarship Fund",
+    "Historical Society",
+    "Political Action Committee",
+    "Trade Association",
+]
+_PLACES = [
+    ("BOSTON", "MA"),
+    ("HOUSTON", "TX"),
+    ("NEW YORK", "NY"),
+    ("SAN FRANCISCO", "CA"),
+    ("TULSA", "OK"),
+    ("WASHINGTON", "DC"),
+]
+
+
+@lru_cache(maxsize=1024)
+def synthetic_organizations(name: str, c_code: int, seed: int = 0) -> List[dict]:
+    """Every organization the stand-in lists under a name and 501(c) subsection
+    Args:
+        name: name searched for (the quoted part of q)
+        c_code: 501(c) subsection
+        seed: changes every name's organizations
+    Returns:
+        organizations as the API lists them, in the order it lists them
+    """
+    rng = random.Random(f"{seed}-{name.lower()}-{c_code}")
+    n_organizations = rng.choice([0, 0, 1, 2, 3, 5, 8, 13, 30, 60])
+    organizations = {}
+    for _ in range(n_organizations):
+        org_name = f"{name} {rng.choice(_ENDINGS)}".upper()
+        if rng.random() < 0.3:
+            org_name = f"{rng.choice(['FIRST', 'GREATER', 'NATIONAL'])} {org_name}"
+        city, state = rng.choice(_PLACES)
+        # the same name always has the same EIN, whichever search finds it
+        ein = 100000000 + zlib.crc32(f"{seed}-{org_name}-{c_code}".encode()) % 900000000
+        organizations[ein] = {
+            "ein": ein,
+            "strein": f"{str(ein)[:2]}-{str(ein)[2:]}",
+            "name": org_name,
+            "sub_name": org_name if rng.random() < 0.8 else "",
+            "city": city,
+            "state": state,
+            "ntee_code": None,
+            "raw_ntee_code": None,
+            "subseccd": c_code,
+            "has_subseccd": True,
+            "have_filings": None,
+            "have_extracts": None,
+            "have_pdfs": None,
+            "score": round(rng.uniform(1, 100), 4),
+        }
+    return sorted(organizations.values(), key=lambda org: -org["score"])
+
+
+def search_organizations(query: Dict[str, str], seed: int = 0) -> List[dict]:
+    """Organizations matching a search's name, required words, -terms and subsection
+    Args:
+        query: query-string parameters of the search (name -> value)
+        seed: seed of the synthetic organizations (see synthetic_organizations)
+    Returns:
+        matching organizations, in the order the API lists them
+    """
+    name, required, excluded = parse_search_query(query.get("q", ""))
+    if name == "":
+        return []
+
+    def has_word(org_name: str, word: str) -> bool:
+        return re.search(rf"\b{re.escape(word.upper())}\b", org_name) is not None
+
+    return [
+        org
+        for org in synthetic_organizations(
+            name, int(query.get("c_code[id]") or 3), seed
+        )
+        if all(has_word(org["name"], word) for word in required)
+        and not any(has_word(org["name"], word) for word in excluded)
+    ]
+
+
+def search_response(organizations: List[dict], query: Dict[str, str]) -> dict:
+    """json answer of the API for one page of a search's organizations"""
+    page = int(query.get("page") or 0)
+    first = page * RESULTS_PER_PAGE
+    return {
+        "total_results": len(organizations),
+        "organizations": organizations[first : first + RESULTS_PER_PAGE],
+        "num_pages": math.ceil(len(organizations) / RESULTS_PER_PAGE),
+        "cur_page": page,
+        "page_offset": first,
+        "per_page": RESULTS_PER_PAGE,
+        "search_query": query.get("q"),
+        "selected_state": None,
+        "selected_ntee": None,
+        "selected_code": query.get("c_code[id]"),
+        "data_source": "stand-in",
+        "api_version": 2,
+    }
+
+
+class FakeProPublicaHandler(BaseHTTPRequestHandler):
+    """Request handler for the stand-in API (settings are attributes of the server)"""
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(" fake ProPublica: " + format, *args)
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        time.sleep(self.server.latency)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve a page of search results, or a random error"""
+        url = urlsplit(self.path)
+        self.server.count("requests")
+        if url.path != SEARCH_PATH:
+            self._send(404, {"error": "not found"})
+            return
+
+        status = self.server.error()
+        if status is not None:
+            self._send(status, {"error": "try again"}, headers={"Retry-After": "0"})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        organizations = search_organizations(query, self.server.seed)
+        if len(organizations) == 0:
+            self._send(404, {"error": "no results"})
+            return
+        self._send(200, search_response(organizations, query))
+
+
+class FakeProPublicaServer(ThreadingHTTPServer):
+    """Threaded http server with the stand-in's settings and request counts"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(address, FakeProPublicaHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.stats = {"requests": 0, "errors": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, stat: str):
+        """Add one to a request count"""
+        with self._lock:
+            self.stats[stat] += 1
+
+    def error(self) -> int:
+        """Status of a random error to answer this request with, or None to answer it"""
+        with self._lock:
+            if self._rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return self._rng.choice([429, 503])
+        return None
+
+    @property
+    def api_root(self) -> str:
+        """Search endpoint of the server, e.g. http://127.0.0.1:8766/nonprofits/api/v2/search.json"""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}{SEARCH_PATH}"
+
+
+def start_fake_propublica_server(
+    host: str = "127.0.0.1", port: int = 0, **settings
+) -> FakeProPublicaServer:
+    """Start the stand-in API in a background thread
+    Args:
+        host: address to listen on
+        port: port to listen on (0 picks a free port; see api_root)
+        settings: latency, error_rate, seed (see FakeProPublicaServer)
+    Returns:
+        the running server; call its shutdown() method to stop it
+    """
+    server = FakeProPublicaServer((host, port), **settings)
+    threading.Thread(
+        target=server.serve_forever, name="fake_propublica_server", daemon=True
+    ).start()
+    return server
+
+
+# Function below is what is executed at the command line
+@click.command()
+@click.option("--host", type=str, required=False, default="127.0.0.1")
+@click.option("--port", type=int, required=False, default=8766)
+@click.option("--latency", type=float, required=False, default=0.0)
+@click.option("--error_rate", type=float, required=False, default=0.0)
+@click.option("--seed", type=int, required=False, default=0)
+def fake_propublica_server(
+    host: str, port: int, latency: float, error_rate: float, seed: int
+):
+    """Run the stand-in Nonprofit Explorer API until interrupted
+    Args:
+        host: address to listen on
+        port: port to listen on
+        latency: seconds added to every response
+        error_rate: chance that a request is answered with a 429 or 503 error
+        seed: seed of the synthetic organizations and errors
+    Returns:
+        None
+    """
+    server = FakeProPublicaServer(
+        (host, port), latency=latency, error_rate=error_rate, seed=seed
+    )
+    logging.info(" Stand-in Nonprofit Explorer API listening at %s", server.api_root)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info(" Served %s", server.stats)
+
+
+if __name__ == "__main__":
+    fake_propublica_server()
@@ -0,0 +1,142 @@
+"""Planning of the API searches made by propublica_ein.py
+Each search string is sent as up to three searches (variants; see search_variants). Before any
+request is made, the searches of every search string are planned: searches that must get the same
+answer (the same request key; see propublica_cache_utils.request_key) are run once, and their answer
+is handed to every search string, company and variant that uses it. Two kinds of searches merge:
+- the same search string listed for several companies (or with different spacing)
+- the 'Foundation' variant of a search string that already contains the word Foundation, which is
+  the basic 501(c)(3) search again
+With ignore_client_side set in the config, searches are sent without the ignore_results_with
+terms, and organizations whose name or sub_name contains one of them are dropped from the answers
+instead. The queries are then shorter, and cached answers survive changes to the ignore list.
+"""
+
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple, Union
+
+from projects.foundation.propublica_cache_utils import request_key
+
+# (variant label, 501(c) code, query parameters) of one search of the API
+Variant = Tuple[str, int, Dict[str, str]]
+
+
+def search_variants(search_string: str, config_info: dict) -> List[Variant]:
+    """The API searches made for one search string, in the order their results are listed
+    Args:
+        search_string: name to search for
+        config_info: configuration settings read in from propublica_all_names.yml
+    Returns:
+        list of (variant label, 501(c) code, query parameters)
+    """
+    # ignore results with these search strings (unless they're applied to the answers)
+    minus_these_terms = ""
+    if not config_info.get("ignore_client_side", False):
+        minus_these_terms = " -" + " -".join(config_info["ignore_results_with"])
+    basic_params = {"q": f'"{search_string}" {minus_these_terms}', "c_code[id]": "3"}
+
+    variants = [("501c3", 3, basic_params)]
+    # test search string with 'Foundation' (this specificity oddly finds more results?)
+    if config_info["test_just_foundation_first"]:
+        if re.search(r"\bfoundation\b", str(search_string), re.IGNORECASE):
+            # the search string already requires the word: same search as the basic one
+            variants.append(("foundation", 3, dict(basic_params)))
+        else:
+            variants.append(
+                (
+                    "foundation",
+                    3,
+                    {
+                        "q": f'"{search_string}" Foundation {minus_these_terms}',
+                        "c_code[id]": "3",
+                    },
+                )
+            )
+    # look for 501c6 nonprofits
+    if config_info["501c_6"]:
+        variants.append(
+            (
+                "501c6",
+                6,
+                {"q": f'"{search_string}" {minus_these_terms}', "c_code[id]": "6"},
+            )
+        )
+    return variants
+
+
+def parse_search_query(q: str) -> Tuple[str, List[str], List[str]]:
+    """Split q into the quoted name, the other words results must contain, and the -terms they mustn't
+    Quoted words (e.g. -"Lions Club") are kept together, without their quotes.
+    """
+    words = re.findall(r'-?"[^"]*"|\S+', q)
+    name = words[0].strip('"') if len(words) > 0 else ""
+    required = [word.strip('"') for word in words[1:] if not word.startswith("-")]
+    excluded = [
+        word[1:].strip('"')
+        for word in words[1:]
+        if word.startswith("-") and len(word[1:].strip('"')) > 0
+    ]
+    return name, required, excluded
+
+
+def plan_searches(search_strings: Iterable[str], config_info: dict) -> Counter:
+    """Count the uses of each distinct API search made for a list of search strings
+    Args:
+        search_strings: search strings to be run, in order (repeats allowed)
+        config_info: configuration settings read in from propublica_all_names.yml
+    Returns:
+        Counter of request key -> number of (search string, variant) searches that use its answer
+    """
+    uses = Counter()
+    n_search_strings = 0
+    for search_string in search_strings:
+        n_search_strings += 1
+        for _, _, params in search_variants(search_string, config_info):
+            uses[request_key(config_info["api_root"], params)] += 1
+    logging.info(
+        " Planned %s API searches for %s variant searches of %s search strings",
+        str(len(uses)),
+        str(sum(uses.values())),
+        str(n_search_strings),
+    )
+    return uses
+
+
+def ignore_pattern(ignore_results_with: List[str]) -> re.Pattern:
+    """Regular expression matching any of the ignore terms as whole words, ignoring case
+    Quoted terms (e.g. '"Lions Club"') match as phrases, as they do in the API's query syntax.
+    """
+    phrases = [
+        r"\s+".join(re.escape(word) for word in term.strip('"').split())
+        for term in ignore_results_with
+        if term.strip('"').strip() != ""
+    ]
+    if len(phrases) == 0:
+        return re.compile(r"(?!)")  # matches nothing
+    return re.compile(r"\b(?:" + "|".join(sorted(set(phrases))) + r")\b", re.IGNORECASE)
+
+
+def drop_ignored(data: Union[dict, None], pattern: re.Pattern) -> Union[dict, None]:
+    """An answer without the organizations the ignore terms rule out
+    Args:
+        data: json answer with the organizations of all its pages (see fetch_all_pages), or None
+        pattern: regular expression of the ignore terms (see ignore_pattern)
+    Returns:
+        a copy of the answer with matching organizations dropped and total_results reduced to
+        match (pages that couldn't be fetched still count), or None if nothing is left
+    """
+    if data is None:
+        return None
+    organizations = [
+        organization
+        for organization in data["organizations"]
+        if pattern.search(str(organization.get("name") or "")) is None
+        and pattern.search(str(organization.get("sub_name") or "")) is None
+    ]
+    missing = max(data["total_results"] - len(data["organizations"]), 0)
+    if len(organizations) == 0 and missing == 0:
+        return None  # as the API answers a search without results
+    return dict(
+        data, organizations=organizations, total_results=len(organizations) + missing
+    )
@@ -0,0 +1,458 @@
+"""Query engine for the propublica_ein.py search of ProPublica's Nonprofit Explorer API
+Each search string is sent as up to three searches (variants): the basic search among 501(c)(3)
+organizations, the same search with 'Foundation' added (test_just_foundation_first in the config),
+and the basic search among 501(c)(6) organizations (501c_6). Searches are planned first (see
+propublica_plan_utils.py), so a search shared by several search strings or variants is run once.
+The searches of all search strings run concurrently on an asyncio event loop, with at most
+concurrency requests in flight, at most requests_per_second requests started per API host, and
+retries (with jittered exponential backoff) of requests that time out, fail to connect, or get a
+429 or 5xx answer. Every page of each search's
+answer is fetched (num_pages), and rows are streamed to the output csv in search-string and variant
+order as each search string's answers arrive, so memory use stays bounded however long the list.
+Rows are built a column at a time from the answers' organizations arrays and handed to the csv
+writer as data frames of up to FRAME_ROWS rows.
+With cache_dir set in the config, answers are kept on disk (see propublica_cache_utils.py) and
+reused by later runs, for cache_ttl_days if that is set. With bmf_index set, searches are answered
+from an offline index of the IRS EO BMF (see irs_bmf_utils.py) instead of the API.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Tuple, Union
+from urllib.parse import urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from projects.foundation.irs_bmf_utils import open_bmf_index, search_bmf_index
+from projects.foundation.propublica_cache_utils import (
+    cache_response,
+    read_cached_response,
+    request_key,
+)
+from projects.foundation.propublica_plan_utils import (
+    drop_ignored,
+    ignore_pattern,
+    plan_searches,
+    search_variants,
+)
+
+# http status codes worth retrying; anything else (e.g. the API's 404 for no results) is final
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# what to log when a variant finds nothing (or its request fails), by variant label
+NO_RESULTS_MESSAGES = {
+    "501c3": "===  No foundations for basic 501c3 search “%s”",
+    "foundation": "⚠️  No 'Foundation' foundations for “%s”",
+    "501c6": "///  No 501c6 foundations for “%s”",
+}
+
+
+def initialize_row_dict(result_id, company, fullname):
+    row_dict = dict()
+    row_dict["search_term"] = company
+    row_dict["full_name"] = fullname
+    row_dict["result_id"] = result_id
+    row_dict["ein"] = ""
+    row_dict["name"] = ""
+    row_dict["sub_name"] = ""
+    row_dict["city"] = ""
+    row_dict["state"] = ""
+    row_dict["501c"] = -1
+    row_dict["propublica_queried"] = 0
+    return row_dict
+
+
+# columns of the output csv
+ROW_COLUMNS = list(initialize_row_dict(0, "", "").keys())
+
+# columns of the output csv copied from the API's organizations
+ORGANIZATION_FIELDS = ["ein", "name", "sub_name", "city", "state"]
+
+# most rows in each data frame of results handed to the csv writer
+FRAME_ROWS = 10000
+
+
+def append_search_columns(
+    columns: Dict[str, list],
+    result_id: int,
+    search_string: str,
+    company_name: str,
+    responses: List[Tuple[str, int, Union[dict, None]]],
+):
+    """Add the output rows of one search string to columns of rows, from the answers to its searches
+    Each answer's organizations are added a column at a time, straight from its json arrays. A
+    search that failed (or found nothing) repeats the row before it, or adds an unqueried row for
+    the search string if it comes first.
+    Args:
+        columns: column name -> values (ROW_COLUMNS; see initialize_row_dict), added to in place
+        result_id: number of the search string in the search string file
+        search_string: name that was searched for
+        company_name: company the search string belongs to
+        responses: (variant label, 501(c) code, json answer or None if the search failed) of each
+            search, in search_variants order
+    """
+    # row repeated after a search that failed
+    row_dict = initialize_row_dict(result_id, search_string, company_name)
+    for label, c_code, data in responses:
+        if data is None:
+            logging.info(NO_RESULTS_MESSAGES[label], search_string)
+            for column in ROW_COLUMNS:
+                columns[column].append(row_dict.get(column))
+            continue
+
+        logging.info(
+            " >>> %s foundations for “%s” ", data["total_results"], search_string
+        )
+        organizations = data["organizations"][: data["total_results"]]
+        n_organizations = len(organizations)
+        columns["search_term"].extend([search_string] * n_organizations)
+        columns["full_name"].extend([company_name] * n_organizations)
+        columns["result_id"].extend(range(n_organizations))
+        for field in ORGANIZATION_FIELDS:
+            columns[field].extend([org[field] for org in organizations])
+        columns["501c"].extend([c_code] * n_organizations)
+        columns["propublica_queried"].extend([1] * n_organizations)
+        row_dict = dict()
+        if n_organizations > 0:
+            row_dict = {column: columns[column][-1] for column in ROW_COLUMNS}
+        if n_organizations < data["total_results"]:
+            # some pages of the answer couldn't be fetched: count the search as failed
+            logging.info(NO_RESULTS_MESSAGES[label], search_string)
+            for column in ROW_COLUMNS:
+                columns[column].append(row_dict.get(column))
+
+
+class _HostRateLimiter:
+    """Spaces out the start of requests to one host so no more than rate start per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        """Wait for this request's turn to start"""
+        async with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+async def fetch_json(
+    session: requests.Session,
+    url: str,
+    params: Dict[str, str],
+    config_info: dict,
+    semaphore: asyncio.Semaphore,
+    limiters: Dict[str, _HostRateLimiter],
+    cache: dict = None,
+) -> Union[dict, None]:
+    """Get one API answer, retrying transient failures with jittered exponential backoff
+    Args:
+        session: requests session (used from worker threads)
+        url: API endpoint
+        params: query parameters of the search
+        config_info: configuration settings read in from propublica_all_names.yml; timeout,
+            retries and backoff_seconds
+        semaphore: bounds the number of requests in flight
+        limiters: host -> rate limiter of requests to it
+        cache: if given, the response cache's dir, ttl_seconds, refresh (if True, cached answers
+            are not used, only replaced) and stats (hit and miss counts)
+    Returns:
+        json answer, or None if the search failed or found nothing
+    """
+    if cache is not None:
+        if not cache["refresh"]:
+            found, data = read_cached_response(
+                cache["dir"], url, params, cache["ttl_seconds"]
+            )
+            if found:
+                cache["stats"]["hits"] += 1
+                return data
+        cache["stats"]["misses"] += 1
+
+    retries = config_info.get("retries", 3)
+    backoff_seconds = config_info.get("backoff_seconds", 1.0)
+    limiter = limiters.get(urlsplit(url).netloc)
+
+    for attempt in range(retries + 1):
+        retry_after = None
+        async with semaphore:
+            if limiter is not None:
+                await limiter.wait()
+            try:
+                resp = await asyncio.to_thread(
+                    session.get,
+                    url,
+                    params=params,
+                    timeout=config_info.get("timeout", 15),
+                )
+            except requests.exceptions.RequestException as request_error:
+                logging.debug(" Request for %s failed: %s", params["q"], request_error)
+            else:
+                if resp.status_code not in RETRY_STATUSES:
+                    if not resp.ok:
+                        # the API's answer to a search without results is worth keeping
+                        if cache is not None and resp.status_code == 404:
+                            cache_response(cache["dir"], url, params, None)
+                        return None
+                    try:
+                        data = resp.json()
+                    except ValueError:
+                        return None
+                    if cache is not None:
+                        cache_response(cache["dir"], url, params, data)
+                    return data
+                retry_after = resp.headers.get("Retry-After")
+
+        if attempt < retries:
+            # full jitter keeps concurrent retries from arriving together
+            delay = random.uniform(0, backoff_seconds * 2**attempt)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+    return None
+
+
+async def fetch_all_pages(
+    session: requests.Session,
+    url: str,
+    params: Dict[str, str],
+    config_info: dict,
+    semaphore: asyncio.Semaphore,
+    limiters: Dict[str, _HostRateLimiter],
+    cache: dict = None,
+) -> Union[dict, None]:
+    """Get every page of one search's answer (the API lists 25 organizations per page)
+    Args:
+        session, url, params, config_info, semaphore, limiters, cache: as for fetch_json
+    Returns:
+        the first page's json answer with the organizations of all pages in its organizations
+        list, or None if the search failed or found nothing. If a later page can't be fetched,
+        organizations is shorter than total_results.
+    """
+    data = await fetch_json(
+        session, url, params, config_info, semaphore, limiters, cache
+    )
+    if data is None or data.get("num_pages", 1) <= 1:
+        return data
+
+    # the rest of the pages are fetched together
+    pages = await asyncio.gather(
+        *[
+            fetch_json(
+                session,
+                url,
+                dict(params, page=str(page)),
+                config_info,
+                semaphore,
+                limiters,
+                cache,
+            )
+            for page in range(1, data["num_pages"])
+        ]
+    )
+    for page, page_data in enumerate(pages, start=1):
+        if page_data is None or page_data.get("cur_page", page) != page:
+            logging.warning(
+                " Page %s of %s for %s couldn't be fetched",
+                str(page + 1),
+                str(data["num_pages"]),
+                params["q"],
+            )
+            break
+        data["organizations"].extend(page_data["organizations"])
+    return data
+
+
+async def _stream_searches(
+    searches: List[Tuple[int, str, str]], config_info: dict, refresh: bool = False
+) -> AsyncIterator[Tuple[int, List[Union[dict, None]]]]:
+    """Search the variants of each search string, yielding the answers in search string order
+    Searches of up to search_window search strings (4 x concurrency by default) are under way at
+    once. Each planned search is run once, and its answer is held until its last use.
+    """
+    concurrency = config_info.get("concurrency", 8)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="propublica")
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    limiters = {}
+    if config_info.get("requests_per_second") is not None:
+        limiters[urlsplit(config_info["api_root"]).netloc] = _HostRateLimiter(
+            config_info["requests_per_second"]
+        )
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    cache = None
+    if config_info.get("cache_dir") is not None:
+        cache = {
+            "dir": config_info["cache_dir"],
+            "ttl_seconds": (
+                None
+                if config_info.get("cache_ttl_days") is None
+                else 86400 * config_info["cache_ttl_days"]
+            ),
+            "refresh": refresh,
+            "stats": {"hits": 0, "misses": 0},
+        }
+
+    uses = plan_searches(
+        (search_string for _, search_string, _ in searches), config_info
+    )
+    pattern = None
+    if config_info.get("ignore_client_side", False):
+        pattern = ignore_pattern(config_info["ignore_results_with"])
+    bmf_index = None
+    if config_info.get("bmf_index") is not None:
+        logging.info(
+            " Searching the EO BMF index %s instead of the API",
+            str(config_info["bmf_index"]),
+        )
+        bmf_index = open_bmf_index(config_info["bmf_index"])
+
+    async def search(params: Dict[str, str]) -> Union[dict, None]:
+        if bmf_index is not None:
+            data = search_bmf_index(bmf_index, params)
+        else:
+            data = await fetch_all_pages(
+                session,
+                config_info["api_root"],
+                params,
+                config_info,
+                semaphore,
+                limiters,
+                cache,
+            )
+        return data if pattern is None else drop_ignored(data, pattern)
+
+    # request key -> task searching for its answer, from the first use of the key to the last
+    started = {}
+
+    def start(search_string: str) -> List[str]:
+        keys = []
+        for _, _, params in search_variants(search_string, config_info):
+            key = request_key(config_info["api_root"], params)
+            if key not in started:
+                started[key] = asyncio.ensure_future(search(params))
+            keys.append(key)
+        return keys
+
+    async def answers_of(keys: List[str]) -> List[Union[dict, None]]:
+        answers = []
+        for key in keys:
+            answers.append(await started[key])
+            uses[key] -= 1
+            if uses[key] == 0:
+                del started[key]
+        return answers
+
+    window = config_info.get("search_window", 4 * concurrency)
+    pending = deque()
+    try:
+        for i, search_string, _ in searches:
+            pending.append((i, start(search_string)))
+            if len(pending) >= window:
+                i, keys = pending.popleft()
+                yield i, await answers_of(keys)
+        while len(pending) > 0:
+            i, keys = pending.popleft()
+            yield i, await answers_of(keys)
+    finally:
+        for task in started.values():
+            task.cancel()
+        session.close()
+        if bmf_index is not None:
+            bmf_index.close()
+        if cache is not None:
+            logging.info(
+                " Response cache %s: %s hits, %s misses",
+                str(cache["dir"]),
+                str(cache["stats"]["hits"]),
+                str(cache["stats"]["misses"]),
+            )
+
+
+def iter_propublica_frames(
+    df: pd.DataFrame, config_info: dict, refresh: bool = False
+) -> Iterator[pd.DataFrame]:
+    """Search the API for every search string marked to be run, yielding output rows as they're ready
+    Args:
+        df: search strings, one per row (search_string_col, company_col and run_col in the config)
+        config_info: configuration settings read in from propublica_all_names.yml
+        refresh: if True, search the API again instead of using cached answers
+    Returns:
+        generator of data frames of about FRAME_ROWS rows (ROW_COLUMNS), in search string order
+    """
+    columns = [
+        config_info["search_string_col"],
+        config_info["company_col"],
+        config_info["run_col"],
+    ]
+    searches = [
+        (i, search_string, company_name)
+        for i, search_string, company_name, run in df[columns].itertuples()
+        if run == 1
+    ]
+
+    frame_columns = {column: [] for column in ROW_COLUMNS}
+    with asyncio.Runner() as runner:
+        stream = _stream_searches(searches, config_info, refresh)
+        for i, search_string, company_name, run in df[columns].itertuples():
+            if run != 1:
+                row_dict = initialize_row_dict(i, search_string, company_name)
+                for column in ROW_COLUMNS:
+                    frame_columns[column].append(row_dict[column])
+            else:
+                # the stream answers the search strings to be run in the same order
+                _, answers = runner.run(anext(stream))
+                responses = [
+                    (label, c_code, data)
+                    for (label, c_code, _), data in zip(
+                        search_variants(search_string, config_info), answers
+                    )
+                ]
+                append_search_columns(
+                    frame_columns, i, search_string, company_name, responses
+                )
+
+            if len(frame_columns["ein"]) >= FRAME_ROWS:
+                yield pd.DataFrame(frame_columns, columns=ROW_COLUMNS, dtype=object)
+                frame_columns = {column: [] for column in ROW_COLUMNS}
+        runner.run(stream.aclose())
+    if len(frame_columns["ein"]) > 0:
+        yield pd.DataFrame(frame_columns, columns=ROW_COLUMNS, dtype=object)
+
+
+def write_propublica_frames(frames: Iterable[pd.DataFrame], output_file: str) -> int:
+    """Write data frames of rows to a csv as they arrive, keeping only the first row for each EIN
+    Args:
+        frames: data frames of rows (ROW_COLUMNS), e.g. from iter_propublica_frames
+        output_file: path of the csv to write
+    Returns:
+        number of rows written
+    """
+    seen_eins = set()
+    n_rows = 0
+    with open(output_file, "w", newline="", encoding="utf-8") as output:
+        pd.DataFrame(columns=ROW_COLUMNS).to_csv(
+            output, index=False, lineterminator="\n"
+        )
+        for frame in frames:
+            frame = frame.drop_duplicates(subset="ein")
+            frame = frame[~frame["ein"].map(seen_eins.__contains__).astype(bool)]
+            seen_eins.update(frame["ein"])
+            frame.to_csv(output, index=False, header=False, lineterminator="\n")
+            n_rows += len(frame)
+    return n_rows
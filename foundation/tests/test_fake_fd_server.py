@@ -0,0 +1,76 @@
+import math
+
+import pandas as pd
+import pytest
+import requests
+
+from projects.foundation.fd_fake_server import (
+    LOGIN_PATH,
+    SEARCH_PATH,
+    start_fake_fd_server,
+    synthetic_grants,
+)
+from projects.foundation.fd_parse_utils import RESULTS_PER_PAGE, count_pages_in_html
+from projects.foundation.fd_scrape_utils import (
+    fetch_results_page,
+    read_journal,
+    scrape_table_pages,
+)
+
+# synthetic grantmaker with several pages of grants
+EIN = "100"
+
+
+@pytest.fixture
+def fake_fd():
+    server = start_fake_fd_server()
+    yield server
+    server.shutdown()
+
+
+def test_scrape_over_http(fake_fd, tmp_path):
+    """Scrape every results page of a multi-page EIN from the stand-in FD server over http"""
+    filters = "year_min=2003&year_max=2025"
+    config_info = {
+        "target_url": f"{fake_fd.base_url}{SEARCH_PATH}?_new_search=1&{filters}",
+        "page_url": f"{fake_fd.base_url}{SEARCH_PATH}?{filters}",
+        "parser": "targeted",
+    }
+    grants = synthetic_grants(EIN)
+    assert len(grants) > RESULTS_PER_PAGE
+
+    session = requests.Session()
+    session.post(f"{fake_fd.base_url}{LOGIN_PATH}", data={"user": "u", "pass": "p"})
+    first_page_html = fetch_results_page(
+        None, config_info["page_url"] + f"&ein={EIN}&page=1", session=session
+    )
+    total_number_of_pages = count_pages_in_html(first_page_html)
+    assert total_number_of_pages == math.ceil(len(grants) / RESULTS_PER_PAGE)
+
+    part_path = tmp_path / "grants.csv.part"
+    journal_path = tmp_path / "journal.jsonl"
+    scrape_table_pages(
+        None,
+        config_info,
+        EIN,
+        total_number_of_pages,
+        part_path,
+        journal_path=journal_path,
+        session=session,
+    )
+    assert fake_fd.stats["logins"] == 1
+
+    scraped = pd.read_csv(part_path, dtype=str)
+    assert list(scraped["Recipient"]) == [grant[1] for grant in grants]
+    assert list(scraped["Year"]) == [str(grant[6]) for grant in grants]
+    assert sorted(read_journal(journal_path)[EIN]["pages"]) == list(
+        range(1, total_number_of_pages + 1)
+    )
+
+
+def test_login_required(fake_fd):
+    response = requests.get(
+        f"{fake_fd.base_url}{SEARCH_PATH}?ein={EIN}", allow_redirects=False
+    )
+    assert response.status_code == 302
+    assert response.headers["Location"] == LOGIN_PATH
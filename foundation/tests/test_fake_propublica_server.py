@@ -0,0 +1,69 @@
+import math
+
+import pandas as pd
+import pytest
+
+from projects.foundation.propublica_fake_server import (
+    RESULTS_PER_PAGE,
+    search_organizations,
+    start_fake_propublica_server,
+)
+from projects.foundation.propublica_plan_utils import search_variants
+from projects.foundation.propublica_utils import (
+    iter_propublica_frames,
+    write_propublica_frames,
+)
+
+CONFIG_INFO = {
+    "run_col": "run",
+    "search_string_col": "search_string",
+    "company_col": "company",
+    "501c_6": True,
+    "test_just_foundation_first": True,
+    "concurrency": 4,
+    "ignore_results_with": ["Employees", "Retirees"],
+}
+
+
+@pytest.fixture
+def fake_propublica():
+    server = start_fake_propublica_server()
+    yield server
+    server.shutdown()
+
+
+def test_propublica_search_against_stand_in(fake_propublica, tmp_path):
+    """Search the stand-in API for a few names and write the rows propublica_ein.py would"""
+    config_info = dict(CONFIG_INFO, api_root=fake_propublica.api_root)
+    df = pd.DataFrame(
+        {
+            "search_string": ["Acme", "Initech", "Acme", "Globex Foundation"],
+            "company": ["Acme Corp", "Initech", "Acme Corp", "Globex"],
+            "run": [1, 1, 1, 0],
+        }
+    )
+
+    output_file = tmp_path / "propublica.csv"
+    n_rows = write_propublica_frames(
+        iter_propublica_frames(df, config_info), str(output_file)
+    )
+
+    # every organization the server lists for a search, without the ignored ones; each distinct
+    # search (the repeated search string's, too) is requested once per page of its answer
+    expected = set()
+    pages = {}
+    for search_string in ["Acme", "Initech"]:
+        for label, _, params in search_variants(search_string, config_info):
+            organizations = search_organizations(params)
+            pages[(search_string, label)] = max(
+                1, math.ceil(len(organizations) / RESULTS_PER_PAGE)
+            )
+            expected.update(
+                org["ein"]
+                for org in organizations
+                if "EMPLOYEES" not in org["name"] and "RETIREES" not in org["name"]
+            )
+    rows = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+    assert n_rows == len(rows)
+    assert set(int(ein) for ein in rows["ein"] if ein != "") == expected
+    assert fake_propublica.stats["requests"] == sum(pages.values())
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from projects.foundation.fd_batch_utils import batch_items, split_batch
+from projects.foundation.fd_parse_utils import RESULT_COLUMNS
+
+ITEMS = [
+    (0, "111", "alpha"),
+    (1, "222", "beta"),
+    (2, "333", "gamma"),
+    (3, "444", "delta"),
+]
+GRANTMAKERS = {
+    "111": ["Alpha Foundation"],
+    "222": ["Beta Fund"],
+    "333": ["Gamma Trust"],
+    "444": ["Delta Trust"],
+}
+
+
+def test_batch_items():
+    page_counts = {"111": 1, "222": 0, "333": 2, "444": 5}
+    config_info = {"batch_size": 2}
+
+    # EINs are batched in scraping order; one with more than a page is searched on its own
+    assert batch_items(ITEMS, page_counts, GRANTMAKERS, config_info) == [
+        [ITEMS[0], ITEMS[1]],
+        ITEMS[2],
+        ITEMS[3],
+    ]
+
+    # batching is off with a batch_size under 2
+    assert batch_items(ITEMS, page_counts, GRANTMAKERS, {"batch_size": 1}) == ITEMS
+
+    # a grantmaker name found under two EINs can't tell their rows apart
+    shared = dict(GRANTMAKERS, **{"333": ["ALPHA foundation"]})
+    one_page = dict(page_counts, **{"333": 1})
+    assert batch_items(ITEMS, one_page, shared, config_info) == [
+        ITEMS[0],
+        ITEMS[1],
+        ITEMS[2],
+        ITEMS[3],
+    ]
+
+
+def test_split_batch():
+    rows = [
+        ["Alpha Foundation", "Rice University"],
+        ["Gamma Trust", "Harvard University"],
+        ["alpha  foundation.", "Stanford University"],
+    ]
+    batch_df = pd.DataFrame(
+        [row + [""] * 6 + ["111,222,333", "1"] for row in rows], columns=RESULT_COLUMNS
+    )
+
+    # EIN 222 has no grants, so the manifest has no grantmaker names for it
+    grantmakers = dict(GRANTMAKERS, **{"222": []})
+    split = split_batch(batch_df, ITEMS[:3], grantmakers)
+    assert list(split["111"]["Recipient"]) == ["Rice University", "Stanford University"]
+    assert list(split["111"]["ein"]) == ["111", "111"]
+    assert list(split["111"]["search_result_page"]) == [1, 1]
+    assert len(split["222"]) == 0
+    assert list(split["333"]["Recipient"]) == ["Harvard University"]
+
+    # rows whose grantmaker isn't in the manifest for any EIN of the batch
+    with pytest.raises(ValueError):
+        split_batch(batch_df, ITEMS[1:3], grantmakers)
+
+    # an EIN with grants that gets no rows (FD didn't search for it)
+    with pytest.raises(ValueError):
+        split_batch(batch_df, ITEMS[:3], GRANTMAKERS)
@@ -0,0 +1,31 @@
+from projects.foundation.fd_cache_utils import (
+    cache_page,
+    cached_pages,
+    query_key,
+    read_cached_page,
+)
+
+PAGE_URL = "https://fd/search/?collection=grants&year_min=2003"
+
+
+def test_cache_page(tmp_path):
+    assert read_cached_page(tmp_path, PAGE_URL, 111, 1) is None
+    assert cached_pages(tmp_path, PAGE_URL) == {}
+
+    digest = cache_page(tmp_path, PAGE_URL, 111, 1, "<html>page 1 ✓</html>")
+    cache_page(tmp_path, PAGE_URL, 111, 2, "<html>page 2</html>")
+    # identical pages are stored once
+    assert cache_page(tmp_path, PAGE_URL, 222, 1, "<html>page 1 ✓</html>") == digest
+    assert len(list((tmp_path / "objects").rglob("*.html.gz"))) == 2
+
+    assert read_cached_page(tmp_path, PAGE_URL, 111, 1) == "<html>page 1 ✓</html>"
+    assert cached_pages(tmp_path, PAGE_URL) == {"111": [1, 2], "222": [1]}
+
+    # a page fetched again replaces the earlier copy
+    cache_page(tmp_path, PAGE_URL, 111, 2, "<html>page 2, later</html>")
+    assert read_cached_page(tmp_path, PAGE_URL, 111, 2) == "<html>page 2, later</html>"
+
+    # caches of different searches never mix
+    other_url = PAGE_URL.replace("2003", "2010")
+    assert query_key(other_url) != query_key(PAGE_URL)
+    assert read_cached_page(tmp_path, other_url, 111, 1) is None
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from projects.foundation.fd_export_utils import (
+    download_dir,
+    format_amount,
+    normalize_export,
+)
+from projects.foundation.fd_fake_server import (
+    render_export,
+    render_results_page,
+    synthetic_grants,
+)
+from projects.foundation.fd_parse_utils import RESULT_COLUMNS, parse_results_page
+
+
+def test_format_amount():
+    assert format_amount("25000.00") == "$25,000"
+    assert format_amount("$1,500") == "$1,500"
+    assert format_amount("n/a") == "n/a"
+
+
+def test_download_dir(tmp_path):
+    assert download_dir({"download_dir": str(tmp_path)}) == tmp_path
+    assert download_dir({}).name == "downloads"
+
+
+def test_normalize_export(tmp_path):
+    """An export gives the same rows as scraping the results pages of the same search"""
+    ein = "100"
+    grants = synthetic_grants(ein)
+    export_path = tmp_path / "grants.csv"
+    export_path.write_text(render_export(grants), encoding="utf-8")
+
+    exported = normalize_export(export_path, ein)
+    scraped = pd.concat(
+        [
+            parse_results_page(render_results_page(grants, page), ein, page)
+            for page in range(1, (len(grants) - 1) // 50 + 2)
+        ],
+        ignore_index=True,
+    )
+    assert list(exported.columns) == RESULT_COLUMNS
+    pd.testing.assert_frame_equal(exported, scraped, check_dtype=False)
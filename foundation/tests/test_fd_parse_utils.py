@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from projects.foundation.fd_parse_utils import (
+    RESULT_COLUMNS,
+    RESULT_PARSERS,
+    parse_results_page,
+)
+
+FIXTURES = sorted((Path(__file__).parent.parent / "fixtures").glob("*.html"))
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=[path.stem for path in FIXTURES])
+def test_parsers_agree(fixture):
+    html = fixture.read_text(encoding="utf-8")
+    expected = parse_results_page(html, 111, 3, parser="bs4")
+    assert list(expected.columns) == RESULT_COLUMNS
+    assert len(expected) > 0
+    assert set(expected["search_result_page"]) == {3}
+
+    for parser in RESULT_PARSERS:
+        pd.testing.assert_frame_equal(
+            parse_results_page(html, 111, 3, parser=parser), expected
+        )
+
+
+def test_parse_results_page_errors():
+    with pytest.raises(ValueError):
+        parse_results_page("<html></html>", 111, 1, parser="regex")
+    for parser in ["lxml", "targeted"]:
+        with pytest.raises(ValueError):
+            parse_results_page("<html><body></body></html>", 111, 1, parser=parser)
+
+
+@pytest.mark.parametrize(
+    "quoted_id", ["'search-results-grants'", "search-results-grants"]
+)
+def test_targeted_parser_id_quoting(quoted_id):
+    html = FIXTURES[0].read_text(encoding="utf-8")
+    requoted = html.replace('id="search-results-grants"', f"id={quoted_id}")
+    assert requoted != html
+    pd.testing.assert_frame_equal(
+        parse_results_page(requoted, 111, 1, parser="targeted"),
+        parse_results_page(html, 111, 1, parser="bs4"),
+    )
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from projects.foundation.fd_parse_utils import RESULT_COLUMNS
+from projects.foundation.fd_query_utils import (
+    merge_slice_csvs,
+    query_bounds,
+    query_slice,
+    split_bounds,
+)
+
+CONFIG_INFO = {
+    "target_url": "https://fd/search/?_new_search=1&year_min=2003&year_max=2025"
+    "&amount_min=%241%2C000&amount_max=%245%2C000",
+    "page_url": "https://fd/search/?year_min=2003&year_max=2025",
+}
+
+
+def grant(recipient, amount, page=1):
+    return ["Grantmaker", recipient, "Boston", "MA", "United States", "Education",
+            "2020", amount, "111", str(page)]  # fmt: skip
+
+
+def test_split_bounds():
+    # by year while the slice spans several years
+    assert split_bounds((2003, 2025, 0, 1000)) == [
+        (2003, 2014, 0, 1000),
+        (2015, 2025, 0, 1000),
+    ]
+
+    # then by amount, geometrically, with the halves sharing their boundary amount
+    halves = split_bounds((2020, 2020, 0, 10_000_000))
+    assert halves[0][:3] == (2020, 2020, 0)
+    assert halves[1][1:] == (2020, halves[0][3], 10_000_000)
+    assert 0 < halves[0][3] < 10_000_000
+
+    # amount ranges of two dollars, then one
+    assert split_bounds((2020, 2020, 5, 7)) == [(2020, 2020, 5, 6), (2020, 2020, 6, 7)]
+    assert split_bounds((2020, 2020, 5, 6)) == [(2020, 2020, 5, 5), (2020, 2020, 6, 6)]
+    assert split_bounds((2020, 2020, 5, 5)) is None
+
+
+def test_query_bounds():
+    assert query_bounds(CONFIG_INFO) == (2003, 2025, 1000, 5000)
+
+    # no earliest year is assumed
+    with pytest.raises(ValueError):
+        query_bounds({"target_url": "https://fd/search/?_new_search=1&year_max=2025"})
+
+
+def test_query_slice():
+    slice_config = query_slice(CONFIG_INFO, (2010, 2012, 0, 1000))
+    assert slice_config["query_slice"] == "y2010-2012_a0-1000"
+    assert "_new_search=1" in slice_config["target_url"]
+    assert "year_min=2010" in slice_config["target_url"]
+    assert "year_max=2012" in slice_config["page_url"]
+    assert "amount_max=%241%2C000" in slice_config["page_url"]
+    # the config itself is left alone
+    assert query_bounds(CONFIG_INFO) == (2003, 2025, 1000, 5000)
+
+
+def test_merge_slice_csvs(tmp_path):
+    low_path = tmp_path / "low.part"
+    high_path = tmp_path / "high.part"
+    pd.DataFrame(
+        [
+            grant("Rice University", "$1,000"),
+            grant("Rice University", "$1,000", page=2),  # two installments of one grant
+            grant("Harvard University", "$5,000"),  # on the boundary of both slices
+        ],
+        columns=RESULT_COLUMNS,
+    ).to_csv(low_path, index=False)
+    pd.DataFrame(
+        [
+            grant("Harvard University", "$5,000"),
+            grant("Stanford University", "$9,000"),
+        ],
+        columns=RESULT_COLUMNS,
+    ).to_csv(high_path, index=False)
+
+    output_path = tmp_path / "grants.csv"
+    merge_slice_csvs([low_path, high_path], output_path, chunksize=2)
+
+    merged = pd.read_csv(output_path, dtype=str)
+    assert list(merged.columns) == RESULT_COLUMNS
+    assert list(merged["Recipient"]) == [
+        "Rice University",
+        "Rice University",
+        "Harvard University",
+        "Stanford University",
+    ]
+    assert not (tmp_path / "grants.csv.tmp").exists()
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from projects.foundation.fd_rate_utils import (
+    RATE_DECREASE,
+    acquire_request,
+    current_rate,
+    report_challenge,
+    report_success,
+    start_rate_governor,
+)
+
+
+@pytest.fixture
+def governor(tmp_path):
+    config_info = {
+        "rate_limit": 1.0,
+        "rate_limit_max": 1.5,
+        "rate_limit_increase": 0.25,
+        "rate_limit_burst": 2,
+        "rate_limit_file": str(tmp_path / "governor.json"),
+    }
+    yield start_rate_governor(config_info)
+    start_rate_governor({})  # governor off again for other tests
+
+
+def test_governor_off():
+    assert start_rate_governor({}) is None
+    assert current_rate() is None
+    acquire_request()
+    report_challenge()
+    report_success()
+
+
+def test_rate_adapts(governor):
+    assert governor.name == "governor.json"
+    assert current_rate() == 1.0
+
+    report_success()
+    assert current_rate() == 1.25
+    report_success()
+    report_success()
+    assert current_rate() == 1.5  # no faster than rate_limit_max
+
+    # a success that doesn't change the rate leaves the file alone
+    governor.write_text(json.dumps(json.loads(governor.read_text()), indent=1))
+    written = governor.read_text()
+    report_success()
+    assert governor.read_text() == written
+
+    report_challenge()
+    assert current_rate() == 1.5 * RATE_DECREASE
+    # a burst of challenges counts as one
+    report_challenge()
+    assert current_rate() == 1.5 * RATE_DECREASE
+
+
+def test_acquire_request(governor):
+    # the bucket starts full: a burst of requests goes through at once
+    acquire_request()
+    acquire_request()
+    assert governor.exists()
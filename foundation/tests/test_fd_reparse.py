@@ -0,0 +1,120 @@
+import math
+
+import pandas as pd
+
+from projects.foundation.fd_cache_utils import cache_page, record_searches
+from projects.foundation.fd_fake_server import render_results_page, search_grants
+from projects.foundation.fd_parse_utils import RESULTS_PER_PAGE
+from projects.foundation.fd_query_utils import get_query_params, query_slice
+from projects.foundation.fd_reparse import reparse_ein
+
+
+def config(tmp_path):
+    return {
+        "target_url": "http://fd/fdo-search/search/?year_min=2003",
+        "page_url": "http://fd/fdo-search/search/?collection=grants&year_min=2003&year_max=2025",
+        "cache_dir": str(tmp_path / "cache"),
+        "page_limit": 100,
+    }
+
+
+def cache_search(config_info, page_url, ein):
+    """Cache every page of a search's results, as fd_scrape.py would; returns its grants"""
+    query = dict(get_query_params(page_url), ein=str(ein))
+    grants = search_grants(query)
+    for page in range(1, max(1, math.ceil(len(grants) / RESULTS_PER_PAGE)) + 1):
+        cache_page(
+            config_info["cache_dir"],
+            page_url,
+            ein,
+            page,
+            render_results_page(grants, page),
+        )
+    return grants
+
+
+def test_reparse_partitioned_ein(tmp_path):
+    config_info = config(tmp_path)
+    ein = "108"
+    slices = [
+        query_slice(config_info, (2003, 2014, 0, 10_000_000_000)),
+        query_slice(config_info, (2015, 2025, 0, 10_000_000_000)),
+    ]
+    grants = []
+    for slice_config in slices:
+        grants.extend(cache_search(config_info, slice_config["page_url"], ein))
+    record_searches(
+        config_info["cache_dir"],
+        config_info["page_url"],
+        ein,
+        [
+            {
+                "page_url": slice_config["page_url"],
+                "ein": ein,
+                "query_slice": slice_config["query_slice"],
+            }
+            for slice_config in slices
+        ],
+    )
+
+    final_path = tmp_path / "108.csv"
+    assert reparse_ein(config_info, ein, final_path, "bs4")
+    assert len(pd.read_csv(final_path)) == len(grants)
+    assert list(tmp_path.glob("*.part")) == []
+
+
+def test_reparse_uncached_ein(tmp_path):
+    config_info = config(tmp_path)
+    cache_search(config_info, config_info["page_url"], "113")
+
+    assert reparse_ein(config_info, "113", tmp_path / "113.csv", "bs4")
+    assert reparse_ein(config_info, "444", tmp_path / "444.csv", "bs4") is None
+    assert not (tmp_path / "444.csv").exists()
+
+
+def test_reparse_batched_eins(tmp_path):
+    config_info = config(tmp_path)
+    eins = "105,113"
+    grants = cache_search(config_info, config_info["page_url"], eins)
+    batch = [
+        {"ein": ein, "grantmakers": [f"Grantmaker {ein} Foundation"]}
+        for ein in ["105", "113"]
+    ]
+    for ein in ["105", "113"]:
+        record_searches(
+            config_info["cache_dir"],
+            config_info["page_url"],
+            ein,
+            [{"page_url": config_info["page_url"], "ein": eins, "query_slice": None}],
+            batch=batch,
+        )
+
+    # the batch's results are split back into each EIN's
+    for ein in ["105", "113"]:
+        final_path = tmp_path / f"{ein}.csv"
+        assert reparse_ein(config_info, ein, final_path, "bs4")
+        assert len(pd.read_csv(final_path)) == sum(
+            1 for grant in grants if ein in grant[0]
+        )
+
+
+def test_reparse_exported_ein(tmp_path):
+    config_info = config(tmp_path)
+    # pages of an earlier scrape are in the cache, but the EIN's grants were exported since
+    cache_search(config_info, config_info["page_url"], "113")
+    record_searches(
+        config_info["cache_dir"],
+        config_info["page_url"],
+        "113",
+        [
+            {
+                "page_url": config_info["page_url"],
+                "ein": "113",
+                "query_slice": None,
+                "exported": True,
+            }
+        ],
+    )
+
+    assert reparse_ein(config_info, "113", tmp_path / "113.csv", "bs4") is None
+    assert not (tmp_path / "113.csv").exists()
@@ -0,0 +1,60 @@
+import pytest
+
+from projects.foundation.fd_schedule_utils import (
+    append_to_manifest,
+    balance_shards,
+    estimate_seconds,
+    read_manifest,
+    schedule_eins,
+)
+
+ITEMS = [
+    (0, "111", "alpha"),
+    (1, "222", "beta"),
+    (2, "333", "gamma"),
+    (3, "444", "delta"),
+]
+PAGE_COUNTS = {"111": 1, "222": 40, "333": 0, "444": 7}
+
+
+def test_read_manifest(tmp_path):
+    manifest_path = tmp_path / "manifest.jsonl"
+    assert read_manifest(manifest_path) == {}
+
+    append_to_manifest(manifest_path, "111", "query_a", 3)
+    append_to_manifest(manifest_path, "222", "query_a", 0)
+    append_to_manifest(manifest_path, "111", "query_b", 9)
+    append_to_manifest(manifest_path, "111", "query_a", 4)  # the latest count wins
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        manifest_file.write('{"ein": "333", "qu')  # cut off by a crash
+
+    assert read_manifest(manifest_path, "query_a") == {"111": 4, "222": 0}
+    assert read_manifest(manifest_path, "query_b") == {"111": 9}
+    assert read_manifest(manifest_path) == {"111": 4, "222": 0}
+
+
+def test_schedule_eins():
+    assert schedule_eins(ITEMS, PAGE_COUNTS) == ITEMS
+    assert [item[1] for item in schedule_eins(ITEMS, PAGE_COUNTS, "longest_first")] == [
+        "222",
+        "444",
+        "111",
+        "333",
+    ]
+    # an EIN that hasn't been counted is assumed to be typical (the median count)
+    shortest = schedule_eins(ITEMS, {"111": 1, "222": 40, "333": 10}, "shortest_first")
+    assert [item[1] for item in shortest] == ["111", "333", "444", "222"]
+    with pytest.raises(ValueError):
+        schedule_eins(ITEMS, PAGE_COUNTS, "random")
+
+
+def test_balance_shards():
+    shards = balance_shards(ITEMS, PAGE_COUNTS, 2)
+    assert shards == [[ITEMS[1]], [ITEMS[0], ITEMS[2], ITEMS[3]]]
+    assert sorted(item for shard in shards for item in shard) == ITEMS
+
+
+def test_estimate_seconds():
+    # an EIN without results still costs its initial search
+    assert estimate_seconds(ITEMS, PAGE_COUNTS, 1, seconds_per_page=1.0) == 49.0
+    assert estimate_seconds(ITEMS, PAGE_COUNTS, 2, seconds_per_page=1.0) == 40.0
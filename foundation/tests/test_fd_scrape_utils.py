@@ -0,0 +1,219 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+import requests
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+from projects.foundation import fd_scrape_utils
+from projects.foundation.fd_fake_server import render_results_page, synthetic_grants
+from projects.foundation.fd_scrape_utils import (
+    append_to_journal,
+    checkpoint_key,
+    fetch_results_page,
+    open_journal,
+    partial_csv_path,
+    read_journal,
+    resume_partial_csv,
+    scrape_ein,
+    wait_for_results,
+    write_ein_list,
+)
+from utils.io import yaml_to_dict
+
+
+def test_read_journal(tmp_path):
+    journal_path = tmp_path / "journal.jsonl"
+    assert read_journal(journal_path) == {}
+
+    for entry in [
+        {"ein": "111", "total_pages": 3},
+        {"ein": "111", "page": 1, "offset": 100},
+        {"ein": "111", "page": 2, "offset": 200},
+        {"ein": "222", "total_pages": 0},
+        {"ein": "222", "status": "no_results"},
+        {"ein": "333", "slice": "y2003-2014_a0-100", "page": 1, "offset": 50},
+    ]:
+        append_to_journal(journal_path, entry)
+    # last line of a journal cut off by a crash
+    with open(journal_path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"ein": "111", "pa')
+
+    journal = read_journal(journal_path)
+    assert journal["111"] == {
+        "total_pages": 3,
+        "pages": {1: 100, 2: 200},
+        "status": None,
+    }
+    assert journal["222"] == {"total_pages": 0, "pages": {}, "status": "no_results"}
+    # slices of a partitioned search are journaled apart from the EIN
+    assert journal["333_y2003-2014_a0-100"]["pages"] == {1: 50}
+    assert "333" not in journal
+
+
+def test_checkpoint_key():
+    assert checkpoint_key({}, 333) == "333"
+    assert checkpoint_key({"query_slice": "y2003-2014_a0-100"}, 333) == (
+        "333_y2003-2014_a0-100"
+    )
+
+
+def test_open_journal(tmp_path):
+    config_info = {"journal": "journal.jsonl"}
+    journal_path = tmp_path / "journal.jsonl"
+    journal_path.write_text(json.dumps({"ein": "111", "status": "scraped"}) + "\n")
+
+    # resuming keeps the journal and reads what it records
+    resumed_path, journal = open_journal(config_info, str(tmp_path), resume=True)
+    assert resumed_path == journal_path
+    assert journal["111"]["status"] == "scraped"
+
+    # a fresh run starts a new journal
+    fresh_path, journal = open_journal(config_info, str(tmp_path), resume=False)
+    assert fresh_path == journal_path
+    assert journal == {}
+    assert not journal_path.exists()
+
+    # the journal is named fd_scrape_journal.jsonl unless the config says otherwise
+    default_path, _ = open_journal({}, str(tmp_path), resume=False)
+    assert default_path == tmp_path / "fd_scrape_journal.jsonl"
+
+
+def test_partial_csv_path(tmp_path):
+    final_path = tmp_path / "acme_111.csv"
+    assert partial_csv_path(final_path, {}) == tmp_path / "acme_111.csv.part"
+    assert partial_csv_path(final_path, {"query_slice": "y2003-2014_a0-100"}) == (
+        tmp_path / "acme_111.csv.y2003-2014_a0-100.part"
+    )
+
+
+def test_resume_partial_csv(tmp_path):
+    part_path = tmp_path / "grants.csv.part"
+
+    # nothing journaled: start over
+    part_path.write_text("header\nrow\n")
+    assert resume_partial_csv(part_path) == 1
+    assert not part_path.exists()
+
+    # trimmed back to the last journaled page
+    part_path.write_text("header\npage 1\npage 2\nhalf of page 3")
+    progress = {
+        "pages": {1: len("header\npage 1\n"), 2: len("header\npage 1\npage 2\n")}
+    }
+    assert resume_partial_csv(part_path, progress) == 3
+    assert part_path.read_text() == "header\npage 1\npage 2\n"
+
+    # a gap in the journaled pages, or a csv shorter than the journal says: start over
+    part_path.write_text("header\npage 1\n")
+    assert resume_partial_csv(part_path, {"pages": {1: 14, 3: 30}}) == 1
+    assert not part_path.exists()
+    part_path.write_text("header\n")
+    assert resume_partial_csv(part_path, {"pages": {1: 14}}) == 1
+    assert not part_path.exists()
+
+
+def test_write_ein_list(tmp_path):
+    ein_path = tmp_path / "eins.yml"
+    write_ein_list([111, 222], ein_path)
+
+    # the list replaces any earlier one, without duplicates
+    write_ein_list([222, 333, 222], ein_path)
+    assert yaml_to_dict(ein_path)["eins"] == [222, 333]
+
+
+def prefetched_search(ein):
+    """An initial search that was prefetched, so scrape_ein needs no browser to get it"""
+    future = Future()
+    future.set_result(render_results_page(synthetic_grants(ein), 1))
+    return {ein: future}
+
+
+def test_scrape_ein_too_many_pages(tmp_path):
+    # EIN 108's search has 22 pages, more than this page_limit
+    config_info = {
+        "target_url": "https://fd/search/?_new_search=1&year_max=2025",
+        "page_limit": 10,
+        "partition": False,
+    }
+
+    # not partitioned: the EIN is listed, and no csv is written
+    status = scrape_ein(
+        None,
+        config_info,
+        "108",
+        "Co",
+        str(tmp_path),
+        prefetched=prefetched_search("108"),
+    )
+    assert status == "more_than_100"
+    assert list(tmp_path.iterdir()) == []
+
+    # a search that must be partitioned needs a year_min to start from
+    with pytest.raises(ValueError):
+        scrape_ein(
+            None,
+            dict(config_info, partition=True),
+            "108",
+            "Co",
+            str(tmp_path),
+            prefetched=prefetched_search("108"),
+        )
+
+
+class LoadingDriver:
+    """Stands in for a browser whose page never shows results or a challenge"""
+
+    def find_element(self, by, value):
+        raise NoSuchElementException(value)
+
+    def find_elements(self, by, value):
+        return []
+
+
+def test_wait_for_results_patience(monkeypatch):
+    dings = []
+    monkeypatch.setattr(fd_scrape_utils, "play_ding", lambda: dings.append(1))
+    monkeypatch.setattr(fd_scrape_utils, "MAX_PATIENT_SECONDS", 0.2)
+
+    with pytest.raises(TimeoutException):
+        wait_for_results(LoadingDriver(), 0.05)
+    assert dings == []
+
+    # a patient wait alerts the user for a slow page, but still gives up in the end
+    with pytest.raises(TimeoutException):
+        wait_for_results(LoadingDriver(), 0.05, patient=True)
+    assert len(dings) > 0
+
+
+class ResultsDriver:
+    """Stands in for a browser that shows a results page as soon as it's sent to one"""
+
+    page_source = '<div id="search-results-container"></div>'
+
+    def get(self, url):
+        pass
+
+    def find_elements(self, by, value):
+        return [value] if value == "search-results-container" else []
+
+    def get_cookies(self):
+        return []
+
+
+class FailingSession(requests.Session):
+    def get(self, url, **kwargs):
+        raise requests.exceptions.ConnectionError("no connection")
+
+
+def test_fetch_results_page_acquires_once(monkeypatch):
+    acquired = []
+    monkeypatch.setattr(
+        fd_scrape_utils, "acquire_request", lambda **fields: acquired.append(fields)
+    )
+
+    # the http fetch fails, and the browser loads the page on the same turn
+    html = fetch_results_page(
+        ResultsDriver(), "https://fd/search/", session=FailingSession(), page=2
+    )
+    assert html == ResultsDriver.page_source
+    assert acquired == [{"ein": None, "page": 2}]
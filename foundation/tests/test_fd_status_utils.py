@@ -0,0 +1,64 @@
+import time
+
+from projects.foundation import fd_status_utils
+from projects.foundation.fd_cache_utils import query_key
+from projects.foundation.fd_status_utils import (
+    compact_statuses,
+    eins_with_status,
+    known_empty,
+    read_statuses,
+    record_status,
+    start_status_store,
+)
+
+CONFIG_INFO = {
+    "target_url": "https://fd/search/?year_min=2003",
+    "status_store": "status.jsonl",
+}
+
+
+def test_status_store(tmp_path, monkeypatch):
+    monkeypatch.setitem(fd_status_utils._STORE, "path", None)
+    record_status(111, "scraped")  # not started: nothing is recorded
+    assert list(tmp_path.iterdir()) == []
+
+    assert start_status_store(CONFIG_INFO, str(tmp_path)) == {}
+    record_status(111, "no_results")
+    record_status(222, "more_than_100")
+    record_status(111, "scraped")  # the latest status wins
+
+    status_path = tmp_path / "status.jsonl"
+    statuses = read_statuses(status_path, query_key(CONFIG_INFO["target_url"]))
+    assert {ein: latest["status"] for ein, latest in statuses.items()} == {
+        "111": "scraped",
+        "222": "more_than_100",
+    }
+    assert read_statuses(status_path, query_key("https://fd/other")) == {}
+
+    # compacting keeps only the latest line for each EIN
+    assert compact_statuses(status_path) == 2
+    assert len(status_path.read_text().splitlines()) == 2
+    assert read_statuses(status_path) == statuses
+
+
+def test_known_empty():
+    now = time.time()
+    statuses = {
+        "111": {"status": "no_results", "time": now - 86400},
+        "222": {"status": "no_results", "time": now - 30 * 86400},
+        "333": {"status": "scraped", "time": now},
+    }
+    assert known_empty(statuses) == {"111", "222"}
+    # EINs found empty longer ago than recheck_days are searched again
+    assert known_empty(statuses, recheck_days=7) == {"111"}
+    assert known_empty({}) == set()
+
+
+def test_eins_with_status():
+    statuses = {
+        "333": {"status": "more_than_100", "time": 3.0},
+        "111": {"status": "scraped", "time": 1.0},
+        "222": {"status": "more_than_100", "time": 2.0},
+    }
+    assert eins_with_status(statuses, "more_than_100") == ["333", "222"]
+    assert eins_with_status(statuses, "no_results") == []
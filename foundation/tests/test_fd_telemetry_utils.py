@@ -0,0 +1,53 @@
+import pytest
+
+from projects.foundation.fd_telemetry_utils import (
+    PAGE_PHASE,
+    note_captcha,
+    read_telemetry,
+    record_event,
+    start_telemetry,
+    summarize_telemetry,
+    timed,
+)
+
+
+@pytest.fixture
+def telemetry_path(tmp_path):
+    yield start_telemetry({"telemetry": "telemetry.jsonl"}, str(tmp_path))
+    start_telemetry({}, str(tmp_path))  # telemetry off again for other tests
+
+
+def test_timed(telemetry_path):
+    with timed("page_wait", ein=111, page=2):
+        note_captcha()
+    with timed(PAGE_PHASE, ein=111, page=2, skipped=None):
+        pass
+    # last line of a file cut off by a crash
+    with open(telemetry_path, "a", encoding="utf-8") as telemetry_file:
+        telemetry_file.write('{"time": 1, "pha')
+
+    events = read_telemetry(telemetry_path)
+    assert list(events["phase"]) == ["page_wait", PAGE_PHASE]
+    assert list(events["captchas"]) == [1, 0]
+    assert list(events["page"]) == [2, 2]
+    assert "skipped" not in events.columns
+
+
+def test_telemetry_off(tmp_path):
+    assert start_telemetry({}, str(tmp_path)) is None
+    record_event("page_wait", 1.0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_summarize_telemetry(telemetry_path):
+    for seconds in [1.0, 2.0, 3.0]:
+        record_event("page_wait", seconds, captchas=1)
+    record_event("parse", 0.5)
+
+    summary = summarize_telemetry(read_telemetry(telemetry_path))
+    assert summary.loc["page_wait", "count"] == 3
+    assert summary.loc["page_wait", "p50"] == 2.0
+    assert summary.loc["page_wait", "max"] == 3.0
+    assert summary.loc["page_wait", "total"] == 6.0
+    assert summary.loc["page_wait", "captchas"] == 3
+    assert summary.loc["parse", "captchas"] == 0
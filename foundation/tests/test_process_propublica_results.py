@@ -0,0 +1,40 @@
+import pandas as pd
+from click.testing import CliRunner
+
+from projects.foundation.fd_cache_utils import query_key
+from projects.foundation.fd_schedule_utils import append_to_manifest
+from projects.foundation.process_propublica_results import process_ein
+from utils.io import dict_to_yaml, yaml_to_dict
+
+TARGET_URL = "https://fd/search/?_new_search=1&year_min=2003"
+
+
+def test_shards_use_the_config_search(tmp_path):
+    input_path = tmp_path / "eins.csv"
+    pd.DataFrame(
+        {
+            "ein": ["111111111", "222222222", "333333333"],
+            "search_term": ["Alpha", "Beta", "Gamma"],
+        }
+    ).to_csv(input_path, index=False)
+    fd_config = tmp_path / "fd_config.yml"
+    dict_to_yaml({"target_url": TARGET_URL, "page_limit": 100}, fd_config)
+
+    # EIN 111111111 is big in this search, but not in another one
+    manifest = tmp_path / "fd_page_manifest.jsonl"
+    append_to_manifest(manifest, "111111111", query_key(TARGET_URL), 90)
+    append_to_manifest(manifest, "222222222", query_key(TARGET_URL), 5)
+    append_to_manifest(manifest, "333333333", query_key(TARGET_URL), 5)
+    append_to_manifest(manifest, "111111111", query_key(TARGET_URL + "&x=1"), 1)
+
+    args = ["--input", str(input_path), "--output_dir", str(tmp_path)]
+    args += ["--shards", "2", "--manifest", str(manifest)]
+    assert CliRunner().invoke(process_ein, args).exit_code != 0  # needs --fd_config
+
+    result = CliRunner().invoke(process_ein, args + ["--fd_config", str(fd_config)])
+    assert result.exit_code == 0, result.output
+    shards = [
+        yaml_to_dict(tmp_path / f"eins_for_fdo_query_shard_{k}.yml") for k in [1, 2]
+    ]
+    assert [len(shard["eins"]) for shard in shards] == [1, 2]
+    assert shards[0]["page_limit"] == 100
@@ -0,0 +1,57 @@
+import time
+
+from projects.foundation.propublica_cache_utils import (
+    cache_response,
+    normalize_query,
+    read_cached_response,
+    request_key,
+)
+
+API_ROOT = "https://projects.propublica.org/nonprofits/api/v2/search.json"
+
+
+def test_normalize_query():
+    assert (
+        normalize_query('"Acme Corp"   Foundation  -Habitat -Credit -Habitat')
+        == '"Acme Corp" Foundation -Credit -Habitat'
+    )
+    # quoted -terms are kept together
+    assert normalize_query('"Acme" -"Lions Club" -Life') == '"Acme" -"Lions Club" -Life'
+
+
+def test_request_key():
+    key = request_key(API_ROOT, {"q": '"Acme" -Life -Credit', "c_code[id]": "3"})
+
+    # spacing, -term order, parameter order and a trailing slash don't change the answer
+    assert key == request_key(
+        API_ROOT + "/", {"c_code[id]": 3, "q": '"Acme"  -Credit -Life'}
+    )
+    assert key != request_key(
+        API_ROOT, {"q": '"Acme" -Life -Credit', "c_code[id]": "6"}
+    )
+    assert key != request_key(API_ROOT, {"q": '"Acme" Foundation', "c_code[id]": "3"})
+
+
+def test_cache_response(tmp_path, monkeypatch):
+    params = {"q": '"Acme" -Life -Credit', "c_code[id]": "3"}
+    assert read_cached_response(tmp_path, API_ROOT, params) == (False, None)
+
+    cache_response(tmp_path, API_ROOT, params, {"total_results": 1})
+    cache_response(tmp_path, API_ROOT, dict(params, q='"Initech"'))  # no results
+    assert read_cached_response(tmp_path, API_ROOT, params) == (
+        True,
+        {"total_results": 1},
+    )
+    assert read_cached_response(tmp_path, API_ROOT, dict(params, q='"Initech"')) == (
+        True,
+        None,
+    )
+
+    # answers older than the ttl are ignored
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3600)
+    assert read_cached_response(tmp_path, API_ROOT, params, ttl_seconds=60) == (
+        False,
+        None,
+    )
+    assert read_cached_response(tmp_path, API_ROOT, params, ttl_seconds=86400)[0]
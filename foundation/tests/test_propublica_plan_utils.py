@@ -0,0 +1,63 @@
+from projects.foundation.propublica_plan_utils import (
+    drop_ignored,
+    ignore_pattern,
+    plan_searches,
+)
+
+CONFIG_INFO = {
+    "api_root": "https://projects.propublica.org/nonprofits/api/v2/search.json",
+    "501c_6": True,
+    "test_just_foundation_first": True,
+    "ignore_results_with": ["Employees", "Retirees"],
+}
+
+
+def test_plan_searches():
+    uses = plan_searches(["Acme", "Initech", "Acme"], CONFIG_INFO)
+    # three variants of each distinct search string, the repeated one's used twice
+    assert len(uses) == 6
+    assert sorted(uses.values()) == [1, 1, 1, 2, 2, 2]
+
+    uses = plan_searches(["Acme"], dict(CONFIG_INFO, **{"501c_6": False}))
+    assert sum(uses.values()) == 2
+
+
+def test_ignore_pattern():
+    pattern = ignore_pattern(["Life", '"Lions Club"', '""'])
+    assert pattern.search("ACME LIFE FOUNDATION") is not None
+    assert pattern.search("Greater Lions  Club of Acme") is not None
+    # whole words only
+    assert pattern.search("ACME LIFELONG LEARNING") is None
+    assert pattern.search("LIONS OF ACME CLUB") is None
+
+    # no terms: nothing is ignored
+    assert ignore_pattern([]).search("anything") is None
+
+
+def test_drop_ignored():
+    pattern = ignore_pattern(["Life"])
+    data = {
+        "total_results": 4,
+        "organizations": [
+            {"name": "ACME FOUNDATION", "sub_name": ""},
+            {"name": "ACME LIFE FOUNDATION", "sub_name": ""},
+            {"name": "ACME TRUST", "sub_name": "ACME LIFE TRUST"},
+        ],
+        "num_pages": 1,
+    }
+
+    kept = drop_ignored(data, pattern)
+    assert [org["name"] for org in kept["organizations"]] == ["ACME FOUNDATION"]
+    # the organization on the page that couldn't be fetched still counts
+    assert kept["total_results"] == 2
+    assert len(data["organizations"]) == 3
+
+    # nothing left: answered as a search without results
+    assert (
+        drop_ignored(
+            dict(data, total_results=2, organizations=data["organizations"][1:]),
+            pattern,
+        )
+        is None
+    )
+    assert drop_ignored(None, pattern) is None
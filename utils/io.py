@@ -2,7 +2,8 @@
 
 import logging
 import os
-from pathlib import PosixPath
+import tempfile
+from pathlib import Path, PosixPath
 from typing import Union
 
 import pandas as pd
@@ -55,6 +56,21 @@ def dict_to_yaml(dictionary: dict, yaml_filepath: Union[str, PosixPath]):
         yaml.dump(dictionary, outfile, default_flow_style=False)
 
 
+def write_atomically(path: Union[str, Path], data: bytes):
+    """Writes data to a file via a temporary file beside it, so readers never see a partial file
+    Args:
+        path: location of the file (its directory is created if missing)
+        data: bytes to be written
+    Returns:
+        None
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp_file:
+        tmp_file.write(data)
+    os.replace(tmp_file.name, path)
+
+
 def xls_to_csvs(xls_path: str, output_dir: str = "."):
     """Reads an excel file and outputs each subsheet to its own CSV
     Args:
@@ -1,6 +1,6 @@
 from unittest.mock import mock_open, patch
 
-from utils.io import yaml_to_dict
+from utils.io import write_atomically, yaml_to_dict
 
 
 def test_yaml_to_dict():
@@ -12,3 +12,13 @@ def test_yaml_to_dict():
 
         # does the result match what we expect?
         assert result == {"yams": "tasty"}
+
+
+def test_write_atomically(tmp_path):
+    path = tmp_path / "new_dir" / "data.bin"
+    write_atomically(path, b"first")
+    write_atomically(str(path), b"second")
+
+    # the file is replaced whole, and no temporary file is left beside it
+    assert path.read_bytes() == b"second"
+    assert list(path.parent.iterdir()) == [path]